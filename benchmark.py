@@ -0,0 +1,299 @@
+"""Synthetic-data benchmarks for each stage of the photo matching pipeline.
+
+Generates camera folders of small JPEGs with controlled EXIF times and an XLSX log
+with mixed time formats, runs every stage headlessly and reports throughput and
+peak memory. Results can be saved as a JSON baseline and later runs compared
+against it:
+
+    python benchmark.py --photos 3000 --rows 20000 --save baseline.json
+    python benchmark.py --photos 3000 --rows 20000 --compare baseline.json
+
+Caches are redirected into the work directory, so the user's EXIF, thumbnail and
+log caches are never touched.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+import photo_pipeline
+from photo_pipeline import (
+    CAMERA_MAP, COLORS, EXIF_IFD_POINTER, export_matches, get_exif_datetime,
+    iter_photo_files, load_log, load_thumbnail_image, match_log, matched_rows, parse_time_column,
+    parse_time_robust, scan_photo_dirs,
+)
+
+BASELINE_VERSION = 1
+START = datetime(2024, 3, 12, 8, 0, 0)
+PHOTO_INTERVAL = 7  # Seconds between photos of one camera
+
+def make_photo_fixture(root, photos, seed=0):
+    """Write photos JPEGs spread over the three camera folders; returns {color: folder}.
+
+    Most files carry DateTimeOriginal, some only DateTime (the fallback tag) and a
+    few no EXIF at all, so every reader path is exercised.
+    """
+    rng = random.Random(seed)
+    dirs = {}
+    for ci, color in enumerate(COLORS):
+        photo_dir = os.path.join(root, color)
+        os.makedirs(os.path.join(photo_dir, 'dive1'), exist_ok=True)
+        os.makedirs(os.path.join(photo_dir, 'dive2'), exist_ok=True)
+        dirs[color] = photo_dir
+    for i in range(photos):
+        ci = i % len(COLORS)
+        n = i // len(COLORS)
+        taken = START + timedelta(seconds=n * PHOTO_INTERVAL + ci)
+        image = Image.new('RGB', (160, 120), (n % 256, ci * 80, rng.randrange(256)))
+        exif = Image.Exif()
+        kind = rng.random()
+        if kind < 0.85:
+            exif.get_ifd(EXIF_IFD_POINTER)[0x9003] = taken.strftime('%Y:%m:%d %H:%M:%S')
+        elif kind < 0.97:
+            exif[0x0132] = taken.strftime('%Y:%m:%d %H:%M:%S')
+        subfolder = 'dive1' if n % 2 else 'dive2'
+        path = os.path.join(dirs[COLORS[ci]], subfolder, f'IMG_{n:05d}.JPG')
+        if kind < 0.97:
+            image.save(path, 'JPEG', quality=80, exif=exif)
+        else:
+            image.save(path, 'JPEG', quality=80)
+    return dirs
+
+def make_log_rows(rows, photos, seed=0):
+    """Raw log rows across PDP1-PDP3 with Excel serial, day-first string and partial times."""
+    rng = random.Random(seed)
+    cameras = list(CAMERA_MAP)
+    span = max(photos // len(COLORS), 1) * PHOTO_INTERVAL
+    records = []
+    for i in range(rows):
+        when = START + timedelta(seconds=rng.uniform(0, span))
+        kind = i % 4
+        if kind == 0:
+            value = (when - datetime(1899, 12, 30)).total_seconds() / 86400
+        elif kind == 1:
+            value = when.strftime('%d/%m/%Y %H:%M:%S')
+        elif kind == 2:
+            value = when.strftime('%d/%m/%Y %I:%M:%S %p')
+        else:
+            value = when.strftime('%d/%m/%Y %H:%M')
+        records.append({'Time': value, 'Camera': cameras[i % len(cameras)],
+                        'Lat': -27 + rng.random() / 100, 'Lon': 153 + rng.random() / 100})
+    return pd.DataFrame(records)
+
+class Stage:
+    """One timed benchmark stage: setup() is untimed, run() returns the items processed."""
+
+    def __init__(self, name, unit, run, setup=None):
+        self.name = name
+        self.unit = unit
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+def build_stages(workdir, dirs, log_file, args):
+    cache_dir = os.path.join(workdir, 'cache')
+    photo_paths = [os.path.join(root, f) for photo_dir in dirs.values() for root, f, _ in iter_photo_files(photo_dir)]
+    thumb_paths = photo_paths[:args.thumbnails]
+    raw_times = make_log_rows(args.rows, args.photos)['Time']
+    state = {}
+
+    def reset(name):
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+    def exif_read():
+        for path in photo_paths:
+            get_exif_datetime(path)
+        return len(photo_paths)
+
+    def scalar_parse():
+        sample = raw_times[:min(len(raw_times), 5000)]
+        for value in sample:
+            parse_time_robust(value)
+        return len(sample)
+
+    def column_parse():
+        parse_time_column(raw_times)
+        return len(raw_times)
+
+    def scan():
+        catalogs, photo_count, _ = scan_photo_dirs(dirs, args.workers)
+        state['catalogs'] = catalogs
+        return sum(photo_count.values())
+
+    def thumbnails():
+        for path in thumb_paths:
+            load_thumbnail_image(path, cache_dir=os.path.join(cache_dir, 'thumb'))
+        return len(thumb_paths)
+
+    def read_log(use_cache):
+        def run():
+            state['df'] = load_log(log_file, CAMERA_MAP, use_cache=use_cache)
+            return len(state['df'])
+        return run
+
+    def ensure_inputs():
+        if 'catalogs' not in state:
+            scan()
+        if 'df' not in state:
+            read_log(False)()
+
+    def match():
+        df = state['df']
+        match_log(df, state['catalogs'], CAMERA_MAP, args.threshold)
+        state['matched'] = matched_rows(df)
+        return len(df)
+
+    def export(fmt):
+        def run():
+            table = state['matched']
+            export_matches(table, os.path.join(workdir, f'export.{fmt}'))
+            return len(table)
+        return run
+
+    def ensure_matched():
+        ensure_inputs()
+        if 'matched' not in state:
+            match()
+
+    return [
+        Stage('exif_read', 'files', exif_read),
+        Stage('parse_time_scalar', 'rows', scalar_parse),
+        Stage('parse_time_column', 'rows', column_parse),
+        Stage('scan_cold', 'files', scan, lambda: reset('exif')),
+        Stage('scan_warm', 'files', scan, lambda: (reset('exif'), scan())),
+        Stage('thumbnail_cold', 'files', thumbnails, lambda: reset('thumb')),
+        Stage('thumbnail_warm', 'files', thumbnails, lambda: (reset('thumb'), thumbnails())),
+        Stage('load_log_cold', 'rows', read_log(False)),
+        Stage('load_log_cached', 'rows', read_log(True), lambda: read_log(True)()),
+        Stage('match', 'rows', match, ensure_inputs),
+        Stage('export_xlsx', 'rows', export('xlsx'), ensure_matched),
+        Stage('export_csv', 'rows', export('csv'), ensure_matched),
+    ]
+
+def measure(stage, repeat, memory):
+    """Best-of-repeat wall time and, optionally, the traced peak memory of one extra run."""
+    best = None
+    for _ in range(repeat):
+        stage.setup()
+        start = time.perf_counter()
+        items = stage.run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result = {'items': items, 'unit': stage.unit, 'seconds': round(best, 4),
+              'throughput': round(items / best, 1) if best > 0 else None}
+    if memory:
+        # A separate run: tracemalloc slows allocation-heavy code too much to time under it
+        stage.setup()
+        tracemalloc.start()
+        try:
+            stage.run()
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+def compare(results, baseline, tolerance):
+    """Return [(stage, baseline throughput, current throughput, change)] of regressed stages."""
+    regressions = []
+    for name, result in results['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if not base or not base.get('throughput') or not result.get('throughput'):
+            continue
+        change = result['throughput'] / base['throughput'] - 1
+        if change < -tolerance:
+            regressions.append((name, base['throughput'], result['throughput'], change))
+    return regressions
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic photos and logs.")
+    parser.add_argument('--photos', type=int, default=1500, help="Synthetic JPEGs across the three cameras (default 1500)")
+    parser.add_argument('--rows', type=int, default=20000, help="Synthetic log rows (default 20000)")
+    parser.add_argument('--thumbnails', type=int, default=300, help="Photos to thumbnail (default 300)")
+    parser.add_argument('--threshold', type=float, default=5.0, help="Match threshold in seconds (default 5)")
+    parser.add_argument('--workers', type=int, help="EXIF reader threads for the scan (default: CPU count)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the fastest counts (default 3)")
+    parser.add_argument('--stages', help="Comma-separated stage names to run (default: all)")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="Skip the peak memory runs")
+    parser.add_argument('--workdir', help="Where to build fixtures (default: a temporary directory, removed afterwards)")
+    parser.add_argument('--save', metavar='JSON', help="Write the results as a baseline")
+    parser.add_argument('--compare', metavar='JSON', help="Compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed throughput drop before a stage counts as regressed (default 0.2 = 20%%)")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='photo_matcher_bench_')
+    os.makedirs(workdir, exist_ok=True)
+
+    # Keep every cache inside the work directory
+    cache_dir = os.path.join(workdir, 'cache')
+    photo_pipeline.EXIF_CACHE_DIR = os.path.join(cache_dir, 'exif')
+    photo_pipeline.THUMB_CACHE_DIR = os.path.join(cache_dir, 'thumb')
+    photo_pipeline.LOG_CACHE_DIR = os.path.join(cache_dir, 'log')
+
+    try:
+        print(f"Building fixtures in {workdir} ({args.photos} photos, {args.rows} rows)...")
+        dirs = make_photo_fixture(os.path.join(workdir, 'photos'), args.photos)
+        log_file = os.path.join(workdir, 'log.xlsx')
+        make_log_rows(args.rows, args.photos).to_excel(log_file, index=False)
+
+        stages = build_stages(workdir, dirs, log_file, args)
+        if args.stages:
+            wanted = {name.strip() for name in args.stages.split(',')}
+            unknown = wanted - {stage.name for stage in stages}
+            if unknown:
+                print(f"Unknown stages: {', '.join(sorted(unknown))}", file=sys.stderr)
+                return 2
+            stages = [stage for stage in stages if stage.name in wanted]
+
+        results = {
+            'version': BASELINE_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'params': {'photos': args.photos, 'rows': args.rows, 'thumbnails': args.thumbnails,
+                       'threshold': args.threshold, 'workers': args.workers, 'repeat': args.repeat},
+            'stages': {},
+        }
+        for stage in stages:
+            result = measure(stage, args.repeat, args.memory)
+            results['stages'][stage.name] = result
+            memory = f", peak {result['peak_mb']:.1f} MB" if 'peak_mb' in result else ''
+            print(f"{stage.name:<20} {result['seconds']:>9.3f}s  {result['throughput'] or 0:>12,.0f} {stage.unit}/s{memory}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != results['params']:
+            print("Warning: baseline was recorded with different parameters; throughputs may not be comparable.")
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:,.0f} -> {after:,.0f} /s ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No stage regressed by more than {args.tolerance:.0%} against {args.compare}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
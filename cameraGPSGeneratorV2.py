@@ -1,32 +1,532 @@
+import numpy as np
 import pandas as pd
-from PIL import Image, ImageTk
-from PIL.ExifTags import TAGS
+from PIL import ImageTk
 import os
-from datetime import datetime
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 import platform
 
-def get_exif_datetime(file_path):
-    try:
-        with Image.open(file_path) as image:
-            exifdata = image.getexif()
-            priority_tags = ['DateTimeOriginal', 'DateTimeDigitized', 'DateTime']
-            for tag_name in priority_tags:
-                tag_id = next((tid for tid, tn in TAGS.items() if tn == tag_name), None)
-                if tag_id is None:
-                    continue
-                data = exifdata.get(tag_id)
-                if data:
-                    dt_str = str(data).strip()
-                    if ' ' in dt_str:
-                        return datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S'), tag_name
-                    else:
-                        return datetime.strptime(dt_str[:10] + ' 00:00:00', '%Y:%m:%d %H:%M:%S'), tag_name
-    except Exception as e:
-        pass  # Silent error handling
-    
-    return None, None
+import photo_pipeline
+from photo_pipeline import (
+    CAMERA_MAP, COLORS, EXPORT_FORMATS, MAX_FIX_GAP, WATCH_INTERVAL_S, IncrementalMatcher, PhotoCatalog,
+    PhotoSelection, PhotoWatcher, RunMetrics, TaskCancelled, TaskProgress, append_watch_rows, clear_exif_cache,
+    clear_log_cache, default_output_path, default_positions_path, default_watch_path, default_worker_count,
+    estimate_clock_offsets, export_matches, export_sweep, gps_report_path, interpolate_photo_positions, load_log,
+    load_selection_session, load_thumbnail_image, match_log, matched_rows, nearest_photos, parse_columns,
+    parse_thresholds, parse_time_column, prune_thumbnail_cache, read_new_photos, run_report_path,
+    save_selection_session, scan_photo_dirs, threshold_sweep, view_rows, watch_known_paths, write_gps_tags,
+)
+
+class BackgroundTask(TaskProgress):
+    """Runs work(task) on a worker thread and relays its progress to Tk.
+    
+    The worker only ever touches a queue; the Tk thread drains it with
+    root.after, so callbacks run on the Tk thread. Progress messages are
+    throttled by time rather than sent for every item.
+    """
+    
+    POLL_MS = 50
+    PROGRESS_INTERVAL = 0.1  # Seconds between progress updates
+    
+    def __init__(self, root, work, on_progress=None, on_done=None, on_error=None, on_cancel=None):
+        self.root = root
+        self.work = work
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self._queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._last_report = 0.0
+    
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self.root.after(self.POLL_MS, self._poll)
+    
+    def cancel(self):
+        self._cancel.set()
+    
+    def report(self, done, total, text=None):
+        now = time.monotonic()
+        if text is None and done < total and now - self._last_report < self.PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        self._queue.put(('progress', (done, total, text)))
+    
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+    
+    def _run(self):
+        try:
+            result = self.work(self)
+        except TaskCancelled:
+            self._queue.put(('cancelled', None))
+        except Exception as e:
+            self._queue.put(('error', e))
+        else:
+            self._queue.put(('done', result))
+    
+    def _poll(self):
+        while True:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                if self.on_progress:
+                    self.on_progress(*payload)
+                continue
+            if kind == 'done' and self.on_done:
+                self.on_done(payload)
+            elif kind == 'error' and self.on_error:
+                self.on_error(payload)
+            elif kind == 'cancelled' and self.on_cancel:
+                self.on_cancel()
+            return
+        self.root.after(self.POLL_MS, self._poll)
+
+class WatchPoller:
+    """Polls a PhotoWatcher every interval and hands the new photos to Tk.
+    
+    Polling and EXIF reading run on a worker thread, one poll at a time; on_photos
+    ({color: PhotoCatalog}) and on_error(exception) run on the Tk thread.
+    """
+    
+    POLL_MS = 100
+    
+    def __init__(self, root, watcher, on_photos, on_error, workers=None, metrics=None, interval=WATCH_INTERVAL_S):
+        self.root = root
+        self.watcher = watcher
+        self.on_photos = on_photos
+        self.on_error = on_error
+        self.workers = workers
+        self.metrics = metrics or RunMetrics()
+        self.interval = interval
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._after = None
+    
+    def start(self):
+        self._after = self.root.after(int(self.interval * 1000), self._poll)
+    
+    def stop(self):
+        if self._after is not None:
+            self.root.after_cancel(self._after)
+            self._after = None
+        self._pool.shutdown(wait=False)
+    
+    def _read(self):
+        with self.metrics.stage('watch_poll'):
+            found = self.watcher.poll()
+        photos = {}
+        for color, files in found.items():
+            if files:
+                with self.metrics.stage('watch_read'):
+                    photos[color] = read_new_photos(self.watcher.dirs[color], files, self.workers, self.metrics)
+        return {color: catalog for color, catalog in photos.items() if len(catalog)}
+    
+    def _poll(self):
+        self._wait(self._pool.submit(self._read))
+    
+    def _wait(self, future):
+        if not future.done():
+            self._after = self.root.after(self.POLL_MS, lambda: self._wait(future))
+            return
+        self._after = self.root.after(int(self.interval * 1000), self._poll)
+        try:
+            photos = future.result()
+        except Exception as e:
+            self.on_error(e)
+            return
+        if photos:
+            self.on_photos(photos)
+
+class PhotoGrid:
+    """Virtualized thumbnail grid with a checkbox per photo.
+    
+    Only the rows in or near the viewport exist as widgets; they are recycled as
+    the canvas scrolls. Thumbnails load on demand in worker threads and the most
+    recently used PhotoImages are kept in an LRU.
+    """
+    
+    COLUMNS = 3
+    ROW_HEIGHT = 230
+    OVERSCAN = 2  # Extra rows kept live above and below the viewport
+    
+    def __init__(self, parent, workers=None, cache_size=300):
+        self.catalog = PhotoCatalog.empty()
+        self.selected = PhotoSelection(self.catalog)
+        self.metrics = None
+        self.cache_size = cache_size
+        self._thumbs = OrderedDict()  # path -> PhotoImage
+        self._pending = set()
+        self._ready = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=workers or default_worker_count())
+        self._live = {}  # grid row -> row widgets
+        self._spare = []
+        self._polling = False
+        
+        self.frame = tk.Frame(parent)
+        self.canvas = tk.Canvas(self.frame, bg='white')
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", self._on_resize)
+        
+        # Scrolling is bound once on a bind tag shared by the canvas and every pooled widget
+        self._scroll_tag = f"PhotoGridScroll{id(self)}"
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind_class(self._scroll_tag, sequence, self._on_mousewheel)
+        self._add_scroll_tag(self.canvas)
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def set_photos(self, catalog, selected, metrics=None):
+        """Show the photos of a PhotoCatalog with checkboxes bound to its PhotoSelection.
+        
+        Thumbnail cache hits and failures are counted in metrics.
+        """
+        self.metrics = metrics
+        self.canvas.yview_moveto(0)
+        self.extend(catalog, selected)
+    
+    def extend(self, catalog, selected):
+        """Show a catalog that grew through PhotoCatalog.insert() without moving the view."""
+        self.catalog = catalog
+        self.selected = selected
+        for row in list(self._live):
+            self._release_row(row)
+        rows = (len(catalog) + self.COLUMNS - 1) // self.COLUMNS
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), rows * self.ROW_HEIGHT))
+        self._render()
+    
+    def refresh(self):
+        """Re-sync the visible checkboxes after the selection changed in bulk."""
+        for widgets in self._live.values():
+            for cell in widgets['cells']:
+                if cell['index'] is not None:
+                    cell['var'].set(self.selected[cell['index']])
+    
+    def scroll_to(self, i):
+        """Scroll so the row of photo i is at the top of the view."""
+        rows = (len(self.catalog) + self.COLUMNS - 1) // self.COLUMNS
+        self.canvas.yview_moveto((i // self.COLUMNS) / max(rows, 1))
+    
+    def close(self):
+        self._pool.shutdown(wait=False)
+    
+    def _add_scroll_tag(self, widget):
+        widget.bindtags((self._scroll_tag,) + widget.bindtags())
+    
+    def _on_mousewheel(self, event):
+        if hasattr(event, 'delta') and event.delta != 0:
+            delta = int(-1 * (event.delta / 120))
+        elif event.num == 4:
+            delta = -1
+        elif event.num == 5:
+            delta = 1
+        else:
+            return
+        self.canvas.yview_scroll(delta, "units")
+    
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._render()
+    
+    def _on_resize(self, event):
+        rows = (len(self.catalog) + self.COLUMNS - 1) // self.COLUMNS
+        self.canvas.configure(scrollregion=(0, 0, event.width, rows * self.ROW_HEIGHT))
+        for widgets in self._live.values():
+            self.canvas.itemconfigure(widgets['window'], width=event.width)
+        self._render()
+    
+    def _visible_rows(self):
+        rows = (len(self.catalog) + self.COLUMNS - 1) // self.COLUMNS
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), self.ROW_HEIGHT)
+        first = max(0, int(top // self.ROW_HEIGHT) - self.OVERSCAN)
+        last = min(rows - 1, int(bottom // self.ROW_HEIGHT) + self.OVERSCAN)
+        return range(first, last + 1)
+    
+    def _render(self):
+        wanted = self._visible_rows()
+        for row in [r for r in self._live if r not in wanted]:
+            self._release_row(row)
+        for row in wanted:
+            if row not in self._live:
+                self._bind_row(row)
+    
+    def _new_row(self):
+        frame = tk.Frame(self.canvas, height=self.ROW_HEIGHT)
+        frame.grid_propagate(False)
+        for j in range(self.COLUMNS * 2):
+            frame.grid_columnconfigure(j, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+        self._add_scroll_tag(frame)
+        cells = []
+        for col in range(self.COLUMNS):
+            cell = {'index': None, 'var': tk.BooleanVar(value=False)}
+            cell['label'] = tk.Label(frame, borderwidth=1, relief="solid")
+            cell['check'] = tk.Checkbutton(frame, variable=cell['var'], anchor='w',
+                                           command=lambda c=cell: self._on_toggle(c))
+            self._add_scroll_tag(cell['label'])
+            self._add_scroll_tag(cell['check'])
+            cells.append(cell)
+        window = self.canvas.create_window(0, 0, window=frame, anchor="nw",
+                                           width=self.canvas.winfo_width(), height=self.ROW_HEIGHT)
+        return {'frame': frame, 'window': window, 'cells': cells}
+    
+    def _bind_row(self, row):
+        widgets = self._spare.pop() if self._spare else self._new_row()
+        self.canvas.coords(widgets['window'], 0, row * self.ROW_HEIGHT)
+        self.canvas.itemconfigure(widgets['window'], state='normal', width=self.canvas.winfo_width())
+        for col, cell in enumerate(widgets['cells']):
+            i = row * self.COLUMNS + col
+            if i >= len(self.catalog):
+                cell['index'] = None
+                cell['label'].grid_remove()
+                cell['check'].grid_remove()
+                continue
+            cell['index'] = i
+            filename = self.catalog.filename(i)
+            short_name = filename[:30] + '...' if len(filename) > 30 else filename
+            cell['var'].set(self.selected[i])
+            cell['check'].configure(text=short_name)
+            cell['label'].configure(image=self._thumbnail(i) or '')
+            cell['label'].grid(row=0, column=col * 2, padx=10, pady=10)
+            cell['check'].grid(row=0, column=col * 2 + 1, sticky='ew', padx=10, pady=10)
+        self._live[row] = widgets
+    
+    def _release_row(self, row):
+        widgets = self._live.pop(row)
+        self.canvas.itemconfigure(widgets['window'], state='hidden')
+        for cell in widgets['cells']:
+            cell['index'] = None
+        self._spare.append(widgets)
+    
+    def _on_toggle(self, cell):
+        if cell['index'] is not None:
+            self.selected[cell['index']] = cell['var'].get()
+    
+    def _thumbnail(self, i):
+        """Cached PhotoImage for photo i, or None while it is being generated."""
+        path = self.catalog.path(i)
+        thumb = self._thumbs.get(path)
+        if thumb is not None:
+            self._thumbs.move_to_end(path)
+            return thumb
+        if path not in self._pending:
+            self._pending.add(path)
+            future = self._pool.submit(load_thumbnail_image, path, metrics=self.metrics)
+            future.add_done_callback(lambda f, p=path: self._ready.put((p, f)))
+            if not self._polling:
+                self._polling = True
+                self.canvas.after(50, self._poll_thumbnails)
+        return None
+    
+    def _poll_thumbnails(self):
+        while True:
+            try:
+                path, future = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(path)
+            img = future.result()
+            if img is None:
+                continue
+            self._thumbs[path] = ImageTk.PhotoImage(img)
+            while len(self._thumbs) > self.cache_size:
+                self._thumbs.popitem(last=False)
+            for widgets in self._live.values():
+                for cell in widgets['cells']:
+                    if cell['index'] is not None and self.catalog.path(cell['index']) == path:
+                        cell['label'].configure(image=self._thumbs[path])
+        if self._pending:
+            self.canvas.after(50, self._poll_thumbnails)
+        else:
+            self._polling = False
+
+class MatchTable:
+    """Virtualized table of DataFrame rows in a ttk.Treeview.
+    
+    The Treeview only ever holds one screenful of items; scrolling rewrites their
+    values from the frame, so building and scrolling cost the same for ten matches
+    or a million. The rows shown are an array of positions into the frame, filtered
+    and sorted by view_rows().
+    """
+    
+    WHEEL_ROWS = 3
+    
+    def __init__(self, parent, on_activate=None):
+        self.df = pd.DataFrame()
+        self.rows = np.zeros(0, dtype=np.int64)  # Candidate positions into df
+        self.view = self.rows  # The candidates left after filtering, in display order
+        self.filters = {}
+        self.sort_by = None
+        self.ascending = True
+        self.on_activate = on_activate
+        self._first = 0
+        self._page = 1
+        self._items = []
+        
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, show='headings', selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        h_scroll = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scroll.set)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.bind("<Configure>", self._on_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_mousewheel)
+        self.tree.bind("<Up>", lambda e: self._on_key(-1))
+        self.tree.bind("<Down>", lambda e: self._on_key(1))
+        self.tree.bind("<Prior>", lambda e: self._on_key(-self._page))
+        self.tree.bind("<Next>", lambda e: self._on_key(self._page))
+        self.tree.bind("<Double-1>", self._on_activate)
+        self.tree.bind("<Return>", self._on_activate)
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def set_frame(self, df, rows=None):
+        """Show the rows of df at the given positions (default: all), keeping the sort and filters."""
+        columns = list(df.columns)
+        if columns != list(self.tree['columns']):
+            self.tree['columns'] = columns
+            for col in columns:
+                self.tree.heading(col, command=lambda c=col: self.sort(c))
+                self.tree.column(col, width=120, minwidth=50, stretch=False)
+            if self.sort_by not in columns:
+                self.sort_by = None
+        self.df = df
+        self._update_headings()
+        self._first = 0
+        self.refresh(rows)
+    
+    def refresh(self, rows=None):
+        """Re-apply the sort and filters after df changed, optionally with new candidate rows."""
+        if rows is not None:
+            self.rows = np.asarray(rows, dtype=np.int64)
+        if len(self.tree['columns']) == 0:
+            self.view = self.rows[:0]
+        else:
+            self.view = view_rows(self.df, self.rows, sort_by=self.sort_by, ascending=self.ascending, **self.filters)
+        self._render()
+    
+    def set_filters(self, **filters):
+        """Show only rows passing view_rows() with these filters (None or '' switches one off)."""
+        self.filters = {key: value for key, value in filters.items() if value not in (None, '')}
+        self._first = 0
+        self.refresh()
+    
+    def sort(self, column):
+        """Sort on a column, or flip the order when it is already the sort column."""
+        self.ascending = not self.ascending if column == self.sort_by else True
+        self.sort_by = column
+        self._update_headings()
+        self._first = 0
+        self.refresh()
+    
+    def selected_label(self):
+        """Index label of the row in df that is selected, or None."""
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        pos = self._first + self._items.index(selection[0])
+        return self.df.index[self.view[pos]] if pos < len(self.view) else None
+    
+    def scroll(self, first):
+        self._first = int(max(0, min(first, len(self.view) - self._page)))
+        self._render()
+    
+    def _update_headings(self):
+        for col in self.df.columns:
+            arrow = (' \u25b2' if self.ascending else ' \u25bc') if col == self.sort_by else ''
+            self.tree.heading(col, text=f"{col}{arrow}")
+    
+    def _render(self):
+        self._first = max(0, min(self._first, len(self.view) - self._page))
+        while len(self._items) < self._page:
+            self._items.append(self.tree.insert('', tk.END))
+        while len(self._items) > self._page:
+            self.tree.delete(self._items.pop())
+        
+        shown = self.view[self._first:self._first + self._page]
+        block = self.df.iloc[shown].astype(str).to_numpy().tolist() if len(shown) else []
+        for i, item in enumerate(self._items):
+            if i < len(block):
+                self.tree.move(item, '', i)
+                self.tree.item(item, values=block[i])
+            else:
+                self.tree.detach(item)
+        
+        total = len(self.view)
+        if total > self._page:
+            self.scrollbar.set(self._first / total, (self._first + self._page) / total)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _on_resize(self, event):
+        header, row_height = 25, 20
+        if self._items and self.tree.exists(self._items[0]) and self.tree.bbox(self._items[0]):
+            _, header, _, row_height = self.tree.bbox(self._items[0])
+        page = max(1, (event.height - header) // max(row_height, 1))
+        if page != self._page:
+            self._page = page
+            self._render()
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll(round(float(amount) * len(self.view)))
+        elif unit == 'pages':
+            self.scroll(self._first + int(amount) * self._page)
+        else:
+            self.scroll(self._first + int(amount))
+    
+    def _on_mousewheel(self, event):
+        if hasattr(event, 'delta') and event.delta != 0:
+            delta = int(-1 * (event.delta / 120))
+        elif event.num == 4:
+            delta = -1
+        elif event.num == 5:
+            delta = 1
+        else:
+            return "break"
+        self.scroll(self._first + delta * self.WHEEL_ROWS)
+        return "break"
+    
+    def _on_key(self, step):
+        """Move the selection by step rows, scrolling the window along when it leaves the screen."""
+        if len(self.view) == 0:
+            return "break"
+        selection = self.tree.selection()
+        current = self._first + (self._items.index(selection[0]) if selection else -1)
+        pos = max(0, min(current + step, len(self.view) - 1))
+        if pos < self._first:
+            self.scroll(pos)
+        elif pos >= self._first + self._page:
+            self.scroll(pos - self._page + 1)
+        item = self._items[pos - self._first]
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+        return "break"
+    
+    def _on_activate(self, event):
+        if event.type == tk.EventType.ButtonPress and self.tree.identify_region(event.x, event.y) != 'cell':
+            return
+        label = self.selected_label()
+        if label is not None and self.on_activate is not None:
+            self.on_activate(label)
 
 class PhotoMatcherGUI:
     def __init__(self, root):
@@ -37,29 +537,60 @@ class PhotoMatcherGUI:
         self.xlsx_path = tk.StringVar()
         self.threshold_var = tk.StringVar(value="0")
         self.threshold = 0.0
+        self.one_to_one_var = tk.BooleanVar(value=False)
+        self.export_format_var = tk.StringVar(value=EXPORT_FORMATS[0])
+        self.export_all_var = tk.BooleanVar(value=False)
+        self.workers_var = tk.StringVar(value=str(default_worker_count()))
+        self.columns_var = tk.StringVar()
+        self.profile_var = tk.BooleanVar(value=False)
+        self.workers = default_worker_count()
         self.output_base = tk.StringVar()
-        self.camera_map = {'PDP1': 'Green', 'PDP2': 'White', 'PDP3': 'Third'}
-        self.colors = ['Green', 'White', 'Third']
+        self.camera_map = dict(CAMERA_MAP)
+        self.colors = list(COLORS)
         self.dir_vars = {color: tk.StringVar() for color in self.colors}
-        self.photos = {color: [] for color in self.colors}
-        self.photo_paths = {color: [] for color in self.colors}
-        self.selected = {color: {} for color in self.colors}
+        self.photos = {color: PhotoCatalog.empty() for color in self.colors}
+        self.selected = {color: PhotoSelection(self.photos[color]) for color in self.colors}
         self.df = None
         self.matched_df = None
         self.matched_photos = {}
+        self.clock_offsets = None  # {color: seconds} once estimated for the loaded photos
+        self.photo_counts = {}
+        self.metrics = RunMetrics()  # Timings and counters since the photos were loaded
+        self.watch = None  # WatchPoller while the photo folders are watched
+        self.watch_matcher = None
+        self.watch_file = None
         
         self.initial_frame = None
         self.photo_select_frame = None
         self.preview_frame = None
-        self.tree = None
-        self.selectable_frames = {}
-        self.canvases = {}
+        self.preview_title = None
+        self.match_table = None
+        self.camera_filter_var = tk.StringVar(value="All")
+        self.distance_filter_var = tk.StringVar()
+        self.name_filter_var = tk.StringVar()
+        self.camera_filter = None
+        self.photo_pool = ThreadPoolExecutor(max_workers=1)  # Loads photos opened from the preview
+        self.photo_grids = {}
+        self.camera_titles = {}
         self.camera_frames = {}
         self.current_camera = None
         self.camera_container = None
         self.button_frame = None
         self.camera_label = None
         self.match_progress = None
+        self.match_button = None
+        self.sweep_button = None
+        self.offset_button = None
+        self.positions_button = None
+        self.preview_progress = None
+        self.gps_button = None
+        self.export_button = None
+        self.watch_button = None
+        self.preview_cancel_button = None
+        self.match_cancel_button = None
+        self.load_button = None
+        self.cancel_button = None
+        self.task = None
         
         self.sys_platform = platform.system()
         
@@ -69,11 +600,11 @@ class PhotoMatcherGUI:
         self.initial_frame = tk.Frame(self.root)
         self.initial_frame.pack(fill=tk.BOTH, expand=True)
         
-        tk.Label(self.initial_frame, text="Select XLSX File:", font=("Arial", 10, "bold")).pack(pady=10)
+        tk.Label(self.initial_frame, text="Select Log File (XLSX, CSV or Parquet):", font=("Arial", 10, "bold")).pack(pady=10)
         entry_frame1 = tk.Frame(self.initial_frame)
         entry_frame1.pack(pady=5)
         tk.Entry(entry_frame1, textvariable=self.xlsx_path, width=50, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True)
-        tk.Button(entry_frame1, text="Browse XLSX", command=self.select_xlsx).pack(side=tk.RIGHT, padx=5)
+        tk.Button(entry_frame1, text="Browse Log", command=self.select_xlsx).pack(side=tk.RIGHT, padx=5)
         
         for color in self.colors:
             tk.Label(self.initial_frame, text=f"Select {color} Photo Directory:", font=("Arial", 10, "bold")).pack(pady=10)
@@ -87,6 +618,20 @@ class PhotoMatcherGUI:
         entry_frame3.pack(pady=5)
         tk.Entry(entry_frame3, textvariable=self.threshold_var, width=10).pack(side=tk.LEFT)
         tk.Label(entry_frame3, text="seconds (0 for exact match)").pack(side=tk.LEFT, padx=(5, 0))
+        tk.Checkbutton(self.initial_frame, text="Use each photo for at most one row (one-to-one matching)",
+                       variable=self.one_to_one_var).pack()
+        
+        tk.Label(self.initial_frame, text="Photo Loading Workers:", font=("Arial", 10, "bold")).pack(pady=10)
+        entry_frame5 = tk.Frame(self.initial_frame)
+        entry_frame5.pack(pady=5)
+        tk.Entry(entry_frame5, textvariable=self.workers_var, width=10).pack(side=tk.LEFT)
+        tk.Label(entry_frame5, text="parallel EXIF readers (defaults to CPU count)").pack(side=tk.LEFT, padx=(5, 0))
+        
+        tk.Label(self.initial_frame, text="Log Columns:", font=("Arial", 10, "bold")).pack(pady=10)
+        entry_frame6 = tk.Frame(self.initial_frame)
+        entry_frame6.pack(pady=5)
+        tk.Entry(entry_frame6, textvariable=self.columns_var, width=30).pack(side=tk.LEFT)
+        tk.Label(entry_frame6, text="besides Time and Camera, comma separated (empty loads all)").pack(side=tk.LEFT, padx=(5, 0))
         
         tk.Label(self.initial_frame, text="Output Base Name:", font=("Arial", 10, "bold")).pack(pady=10)
         tk.Label(self.initial_frame, text="(threshold & .xlsx will be appended; leave empty for default)", font=("Arial", 9)).pack(pady=(0,5))
@@ -94,18 +639,27 @@ class PhotoMatcherGUI:
         entry_frame4.pack(pady=5)
         tk.Entry(entry_frame4, textvariable=self.output_base, width=50).pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        tk.Button(self.initial_frame, text="Load Photos for Selection", command=self.load_photos, bg="lightgreen", font=("Arial", 12, "bold")).pack(pady=20)
+        tk.Checkbutton(self.initial_frame, text="Profile this session (cProfile, saved with the run report)",
+                       variable=self.profile_var).pack()
+        
+        self.load_button = tk.Button(self.initial_frame, text="Load Photos for Selection", command=self.load_photos, bg="lightgreen", font=("Arial", 12, "bold"))
+        self.load_button.pack(pady=20)
+        tk.Button(self.initial_frame, text="Clear EXIF Cache", command=self.clear_cache, bg="lightgray", font=("Arial", 10)).pack()
         
         self.progress = ttk.Progressbar(self.initial_frame, orient='horizontal', length=400, mode='determinate')
         self.progress.pack(pady=10)
+        self.cancel_button = tk.Button(self.initial_frame, text="Cancel", command=self.cancel_task, state=tk.DISABLED)
+        self.cancel_button.pack()
         
-        self.status_label = tk.Label(self.initial_frame, text="", font=("Arial", 9))
-        self.status_label.pack(pady=5)
+        # Below every screen, so run summaries stay visible after leaving the initial screen
+        self.status_label = tk.Label(self.root, text="", font=("Arial", 9), wraplength=1150)
+        self.status_label.pack(side=tk.BOTTOM, pady=5, before=self.initial_frame)
     
     def select_xlsx(self):
         filename = filedialog.askopenfilename(
-            title="Select XLSX File",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            title="Select Log File",
+            filetypes=[("Log files", "*.xlsx *.csv *.parquet"), ("Excel files", "*.xlsx"), ("CSV files", "*.csv"),
+                       ("Parquet files", "*.parquet"), ("All files", "*.*")]
         )
         if filename:
             self.xlsx_path.set(filename)
@@ -117,109 +671,92 @@ class PhotoMatcherGUI:
         if directory:
             self.dir_vars[color].set(directory)
     
-    def bind_mousewheel(self, widget, canvas):
-        """Recursively bind mousewheel to widget and all its children"""
-        def on_mousewheel(event):
-            if hasattr(event, 'delta') and event.delta != 0:
-                delta = int(-1 * (event.delta / 120))
-            elif event.num == 4:
-                delta = -1
-            elif event.num == 5:
-                delta = 1
-            else:
-                return
-            canvas.yview_scroll(delta, "units")
-        
-        widget.bind("<MouseWheel>", on_mousewheel)
-        widget.bind("<Button-4>", on_mousewheel)
-        widget.bind("<Button-5>", on_mousewheel)
-        
-        # Recursively bind to all children
-        for child in widget.winfo_children():
-            self.bind_mousewheel(child, canvas)
+    def clear_cache(self):
+        dirs = [self.dir_vars[color].get() for color in self.colors if self.dir_vars[color].get()]
+        if not dirs and not messagebox.askyesno("Clear EXIF Cache", "No photo directories selected. Clear the cached EXIF times for all directories?"):
+            return
+        try:
+            removed = sum(clear_exif_cache(d) for d in dirs) if dirs else clear_exif_cache()
+            removed_logs = clear_log_cache()
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not clear the EXIF cache: {str(e)}")
+            return
+        self.status_label.config(text=f"Cleared {removed} EXIF cache file(s) and {removed_logs} cached log(s).")
     
     def select_all(self, color):
-        for var in self.selected[color].values():
-            var.set(True)
+        self.selected[color].set_all(True)
+        self.photo_grids[color].refresh()
     
     def deselect_all(self, color):
-        for var in self.selected[color].values():
-            var.set(False)
+        self.selected[color].set_all(False)
+        self.photo_grids[color].refresh()
     
-    def make_thumbnail(self, file_path, size=(200, 200)):
-        try:
-            with Image.open(file_path) as img:
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                return ImageTk.PhotoImage(img)
-        except:
-            return None
+    def invert_selection(self, color):
+        self.selected[color].invert()
+        self.photo_grids[color].refresh()
     
-    def parse_time_robust(self, raw_value):
-        """Try multiple parsing methods and return best datetime or error info."""
-        if pd.isna(raw_value):
-            return None, "Empty/NaN value"
-        
-        raw_str = str(raw_value).strip()
-        
-        if isinstance(raw_value, (pd.Timestamp, datetime)):
-            return raw_value, None
-        
-        try:
-            num = float(raw_value)  # More aggressive
-            dt = pd.to_datetime(num, origin=pd.Timestamp('1899-12-30'), unit='D', errors='coerce')
-            if pd.notna(dt):
-                return dt, None
-        except:
-            pass
-        
-        # Method 3: String formats (AU-specific, including partial times)
-        formats_to_try = [
-            '%d/%m/%Y %H:%M:%S',      # Full 24h
-            '%d/%m/%Y %I:%M:%S %p',   # Full 12h AM/PM
-            '%d/%m/%Y %H:%M',         # Partial 24h (adds :00)
-            '%d/%m/%Y %I:%M %p',      # Partial 12h (adds :00)
-            '%d/%m/%Y %H:%M:%S.%f',   # With microseconds if any
-            '%d/%m/%Y %I:%M:%S.%f %p',
-            '%d/%m/%Y',               # Date only (00:00:00)
-            '%d/%m/%y %H:%M:%S',
-            '%d/%m/%y %I:%M:%S %p',
-            '%d/%m/%y %H:%M',
-            '%d/%m/%y %I:%M %p'
-        ]
-        for fmt in formats_to_try:
-            try:
-                dt = pd.to_datetime(raw_str, format=fmt, dayfirst=True, errors='coerce')
-                if pd.notna(dt):
-                    return dt, None
-            except:
-                pass
-        
+    def select_time_range(self, color):
+        start = simpledialog.askstring("Select Time Range", "Start time (e.g. 12/03/2024 10:30:00):", parent=self.root)
+        if not start:
+            return
+        end = simpledialog.askstring("Select Time Range", "End time (e.g. 12/03/2024 11:00:00):", parent=self.root)
+        if not end:
+            return
+        times, errors = parse_time_column(pd.Series([start, end], dtype=object))
+        if times.isna().any():
+            messagebox.showerror("Error", "Could not parse the start or end time.")
+            return
+        count = self.selected[color].set_time_range(times[0], times[1])
+        self.photo_grids[color].refresh()
+        self.status_label.config(text=f"Selected {count} {color} photos in time range.")
+    
+    def select_subfolder(self, color):
+        subfolder = simpledialog.askstring("Select Subfolder", "Subfolder (leave empty for the top folder):", parent=self.root)
+        if subfolder is None:
+            return
+        count = self.selected[color].set_subfolder(subfolder.strip().strip('/\\'))
+        self.photo_grids[color].refresh()
+        self.status_label.config(text=f"Selected {count} {color} photos in subfolder.")
+    
+    def select_glob(self, color):
+        pattern = simpledialog.askstring("Select by Filename", "Filename pattern (e.g. GOPR*.JPG):", parent=self.root)
+        if not pattern:
+            return
+        count = self.selected[color].set_glob(pattern.strip())
+        self.photo_grids[color].refresh()
+        self.status_label.config(text=f"Selected {count} {color} photos matching pattern.")
+    
+    def save_selection(self):
+        filename = filedialog.asksaveasfilename(
+            title="Save Selection",
+            defaultextension=".json",
+            filetypes=[("Selection files", "*.json"), ("All files", "*.*")]
+        )
+        if filename:
+            dirs = {color: self.dir_vars[color].get() for color in self.colors}
+            save_selection_session(filename, self.selected, dirs)
+    
+    def load_selection(self):
+        filename = filedialog.askopenfilename(
+            title="Load Selection",
+            filetypes=[("Selection files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
         try:
-            dt = pd.to_datetime(raw_str, dayfirst=True, infer_datetime_format=True, errors='coerce')
-            if pd.notna(dt):
-                return dt, None
-        except:
-            pass
-        
-        if ':' in raw_str and len(raw_str.split(':')) == 2:  # HH:MM only
-            try:
-                parts = raw_str.split()
-                date_part = parts[0]
-                time_part = parts[1] + ':00'
-                full_str = f"{date_part} {time_part}"
-                dt = pd.to_datetime(full_str, dayfirst=True, errors='coerce')
-                if pd.notna(dt):
-                    return dt, None
-            except:
-                pass
-        
-        error_msg = f"Failed all parses (raw: '{raw_str}') | Type: {type(raw_value)}"
-        return None, error_msg
-
+            counts = load_selection_session(filename, self.selected)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not load selection: {str(e)}")
+            return
+        for color in self.colors:
+            self.photo_grids[color].refresh()
+        summary = ", ".join(f"{color}: {count}" for color, count in counts.items())
+        messagebox.showinfo("Selection Loaded", f"Selected photos per camera:\n{summary}")
+    
     def load_photos(self):
         xlsx_file = self.xlsx_path.get()
         if not xlsx_file:
-            messagebox.showerror("Error", "Please select XLSX file.")
+            messagebox.showerror("Error", "Please select a log file.")
             return
         
         dirs = {color: self.dir_vars[color].get() for color in self.colors}
@@ -235,188 +772,171 @@ class PhotoMatcherGUI:
             return
         
         try:
-            self.df = pd.read_excel(xlsx_file, sheet_name=0, engine='openpyxl')
-            if 'Time' not in self.df.columns or 'Camera' not in self.df.columns:
-                raise ValueError("Column 'Time' or 'Camera' not found in the XLSX file.")
-            
-            # Strip whitespace from Camera column
-            self.df['Camera'] = self.df['Camera'].astype(str).str.strip()
-            
-            self.status_label.config(text="Parsing times...")
-            self.root.update()
+            workers = int(self.workers_var.get().strip())
+            if workers < 1:
+                raise ValueError
+            self.workers = workers
+        except ValueError:
+            messagebox.showerror("Error", "Invalid worker count. Please enter a whole number of at least 1.")
+            return
+        
+        if self.task is not None:
+            return
+        
+        columns = parse_columns(self.columns_var.get())
+        metrics = RunMetrics(self.profile_var.get())
+        
+        def work(task):
+            with metrics.profiled():
+                df = load_log(xlsx_file, self.camera_map, task, columns, metrics=metrics)
+                with metrics.stage('scan_photos'):
+                    catalogs, photo_count, skipped_count = scan_photo_dirs(dirs, workers, task, metrics)
+                # Evicting old thumbnails walks the whole cache, so keep it off the Tk thread
+                with metrics.stage('prune_thumbnails'):
+                    prune_thumbnail_cache()
+            return df, catalogs, photo_count, skipped_count, metrics
+        
+        self.progress['value'] = 0
+        self.run_task(work, self.progress, self.show_photo_selection,
+                      busy_buttons=[self.load_button], cancel_button=self.cancel_button)
+    
+    def run_task(self, work, progress_bar, on_done, busy_buttons=(), cancel_button=None):
+        """Run work(task) in the background, driving progress_bar and the status label."""
+        def on_progress(done, total, text):
+            progress_bar['maximum'] = max(total, 1)
+            progress_bar['value'] = done
+            if text:
+                self.status_label.config(text=text)
+        
+        def finish():
+            self.task = None
+            for button in busy_buttons:
+                button.config(state=tk.NORMAL)
+            if cancel_button is not None:
+                cancel_button.config(state=tk.DISABLED)
+        
+        def on_success(result):
+            finish()
+            progress_bar['value'] = progress_bar['maximum']
+            try:
+                on_done(result)
+            except Exception as e:
+                on_error(e)
+        
+        def on_error(e):
+            finish()
+            self.status_label.config(text="Error occurred!")
+            messagebox.showerror("Error", f"An error occurred: {str(e)}\nCheck console for details.")
+        
+        def on_cancel():
+            finish()
+            progress_bar['value'] = 0
+            self.status_label.config(text="Cancelled.")
+        
+        for button in busy_buttons:
+            button.config(state=tk.DISABLED)
+        if cancel_button is not None:
+            cancel_button.config(state=tk.NORMAL)
+        self.task = BackgroundTask(self.root, work, on_progress, on_success, on_error, on_cancel)
+        self.task.start()
+    
+    def cancel_task(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.status_label.config(text="Cancelling...")
+    
+    def show_photo_selection(self, result):
+        self.df, self.photos, photo_count, skipped_count, self.metrics = result
+        
+        # Build photo selection frame
+        if self.photo_select_frame is None:
+            self.photo_select_frame = tk.Frame(self.root)
             
-            self.df['Time_parsed'] = None
-            self.df['Parse_Error'] = ''
-            invalid_count = 0
-            for idx, row in self.df.iterrows():
-                dt, error = self.parse_time_robust(row['Time'])
-                self.df.at[idx, 'Time_parsed'] = dt
-                self.df.at[idx, 'Parse_Error'] = error if error else ''
-                if error:
-                    invalid_count += 1
+            # Instructions
+            instr_label = tk.Label(self.photo_select_frame, text="Select photos with yellow tags (none selected by default). Navigate between cameras using the buttons below.", 
+                                   font=("Arial", 10), wraplength=1100)
+            instr_label.pack(pady=10)
             
-            self.df['Time'] = pd.to_datetime(self.df['Time_parsed'], errors='coerce')
-            self.df.drop('Time_parsed', axis=1, inplace=True)
+            # Camera container
+            self.camera_container = tk.Frame(self.photo_select_frame)
+            self.camera_container.pack(fill=tk.BOTH, expand=True)
             
-            cameras = self.df['Camera'].dropna().unique()
-            invalid_cameras = [cam for cam in cameras if cam not in self.camera_map]
-            if invalid_cameras:
-                raise ValueError(f"Unknown cameras found: {invalid_cameras}. Expected PDP1, PDP2, PDP3.")
+            # Create camera frames
+            self.camera_frames = {}
+            self.camera_titles = {}
+            self.photo_grids = {}
+            for color in self.colors:
+                camera_frame = tk.Frame(self.camera_container)
+                
+                title_label = tk.Label(camera_frame, font=("Arial", 12, "bold"))
+                title_label.pack(pady=10)
+                
+                toggle_frame = tk.Frame(camera_frame)
+                toggle_frame.pack(pady=5)
+                tk.Button(toggle_frame, text="Select All", command=lambda c=color: self.select_all(c)).pack(side=tk.LEFT, padx=5)
+                tk.Button(toggle_frame, text="Deselect All", command=lambda c=color: self.deselect_all(c)).pack(side=tk.LEFT, padx=5)
+                tk.Button(toggle_frame, text="Invert", command=lambda c=color: self.invert_selection(c)).pack(side=tk.LEFT, padx=5)
+                tk.Button(toggle_frame, text="Time Range...", command=lambda c=color: self.select_time_range(c)).pack(side=tk.LEFT, padx=5)
+                tk.Button(toggle_frame, text="Subfolder...", command=lambda c=color: self.select_subfolder(c)).pack(side=tk.LEFT, padx=5)
+                tk.Button(toggle_frame, text="Filename Pattern...", command=lambda c=color: self.select_glob(c)).pack(side=tk.LEFT, padx=5)
+                
+                photo_grid = PhotoGrid(camera_frame, self.workers)
+                photo_grid.pack(fill=tk.BOTH, expand=True)
+                
+                self.camera_titles[color] = title_label
+                self.photo_grids[color] = photo_grid
+                self.camera_frames[color] = camera_frame
             
-            self.progress['maximum'] = 1
-            self.root.update()
-            self.status_label.config(text="Loading photos...")
-            self.root.update()
+            # Button frame
+            self.button_frame = tk.Frame(self.photo_select_frame)
+            self.button_frame.pack(fill=tk.X, pady=10)
             
-            # Calculate total files
-            total_files = 0
-            photo_count = {color: 0 for color in self.colors}
-            skipped_count = {color: 0 for color in self.colors}
-            for color in self.colors:
-                photo_dir = dirs[color]
-                count = sum(1 for _, _, files in os.walk(photo_dir) for f in files if f.lower().endswith(('.jpg', '.jpeg')))
-                total_files += count
+            tk.Button(self.button_frame, text="Back to Initial", command=lambda: self.show_frame('initial'), 
+                      bg="lightgray", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
             
-            processed = 0
-            self.progress['maximum'] = total_files
-            self.progress['value'] = 0
+            tk.Button(self.button_frame, text="Previous Camera", command=self.prev_camera).pack(side=tk.LEFT, padx=5)
             
-            self.photos = {color: [] for color in self.colors}
-            self.photo_paths = {color: [] for color in self.colors}
+            self.camera_label = tk.Label(self.button_frame, text="", font=("Arial", 10, "bold"))
+            self.camera_label.pack(side=tk.LEFT, padx=10)
             
-            for color in self.colors:
-                photo_dir = dirs[color]
-                for root, _, files in os.walk(photo_dir):
-                    for file in files:
-                        if file.lower().endswith(('.jpg', '.jpeg')):
-                            full_path = os.path.join(root, file)
-                            photo_time, source = get_exif_datetime(full_path)
-                            if photo_time:
-                                subfolder = os.path.relpath(root, photo_dir)
-                                if subfolder == '.':
-                                    subfolder = ''
-                                self.photos[color].append((photo_time, subfolder, file, source))
-                                self.photo_paths[color].append(full_path)
-                                photo_count[color] += 1
-                            else:
-                                skipped_count[color] += 1
-                            
-                            processed += 1
-                            self.progress['value'] = processed
-                            self.root.update_idletasks()
+            tk.Button(self.button_frame, text="Next Camera", command=self.next_camera).pack(side=tk.LEFT, padx=5)
             
-            self.progress['value'] = self.progress['maximum']
-            self.root.update()
+            tk.Button(self.button_frame, text="Save Selection...", command=self.save_selection).pack(side=tk.LEFT, padx=(20, 5))
+            tk.Button(self.button_frame, text="Load Selection...", command=self.load_selection).pack(side=tk.LEFT, padx=5)
             
-            # Sort photos by time
+            self.match_button = tk.Button(self.button_frame, text="Proceed to Matching", command=self.match_photos, 
+                                          bg="lightblue", font=("Arial", 12, "bold"))
+            self.match_button.pack(side=tk.RIGHT, padx=10)
+            self.match_cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.cancel_task, state=tk.DISABLED)
+            self.match_cancel_button.pack(side=tk.RIGHT, padx=5)
+            self.sweep_button = tk.Button(self.button_frame, text="Threshold Sweep...", command=self.sweep_thresholds)
+            self.sweep_button.pack(side=tk.RIGHT, padx=5)
+            self.offset_button = tk.Button(self.button_frame, text="Estimate Clock Offsets", command=self.estimate_offsets)
+            self.offset_button.pack(side=tk.RIGHT, padx=5)
+            self.positions_button = tk.Button(self.button_frame, text="Photo Positions...", command=self.export_positions)
+            self.positions_button.pack(side=tk.RIGHT, padx=5)
+        
+        # Grids are rebuilt cheaply, so every load shows the current photos
+        self.clock_offsets = None
+        with self.metrics.stage('build_grids'):
             for color in self.colors:
-                self.photos[color].sort(key=lambda x: x[0])
-            
-            # Build photo selection frame
-            if self.photo_select_frame is None:
-                self.photo_select_frame = tk.Frame(self.root)
-                
-                # Instructions
-                instr_label = tk.Label(self.photo_select_frame, text="Select photos with yellow tags (none selected by default). Navigate between cameras using the buttons below.", 
-                                       font=("Arial", 10), wraplength=1100)
-                instr_label.pack(pady=10)
-                
-                # Camera container
-                self.camera_container = tk.Frame(self.photo_select_frame)
-                self.camera_container.pack(fill=tk.BOTH, expand=True)
-                
-                # Create camera frames
-                self.camera_frames = {}
-                self.selectable_frames = {}
-                self.canvases = {}
-                for color in self.colors:
-                    camera_frame = tk.Frame(self.camera_container)
-                    
-                    title_label = tk.Label(camera_frame, text=f"{color} Photos ({photo_count[color]} images, {skipped_count[color]} skipped)", 
-                                           font=("Arial", 12, "bold"))
-                    title_label.pack(pady=10)
-                    
-                    toggle_frame = tk.Frame(camera_frame)
-                    toggle_frame.pack(pady=5)
-                    tk.Button(toggle_frame, text="Select All", command=lambda c=color: self.select_all(c)).pack(side=tk.LEFT, padx=5)
-                    tk.Button(toggle_frame, text="Deselect All", command=lambda c=color: self.deselect_all(c)).pack(side=tk.LEFT, padx=5)
-                    
-                    scroll_frame = tk.Frame(camera_frame)
-                    scroll_frame.pack(fill=tk.BOTH, expand=True)
-                    
-                    canvas = tk.Canvas(scroll_frame, bg='white')
-                    v_scrollbar = ttk.Scrollbar(scroll_frame, orient="vertical", command=canvas.yview)
-                    canvas.configure(yscrollcommand=v_scrollbar.set)
-                    
-                    canvas.pack(side="left", fill="both", expand=True)
-                    v_scrollbar.pack(side="right", fill="y")
-                    
-                    inner_frame = tk.Frame(canvas)
-                    canvas.create_window((0, 0), window=inner_frame, anchor="nw")
-                    
-                    inner_frame.bind("<Configure>", lambda e, c=canvas: c.configure(scrollregion=c.bbox("all")))
-                    
-                    self.canvases[color] = canvas
-                    self.selectable_frames[color] = inner_frame
-                    
-                    self.selected[color] = {}
-                    grid_row = 0
-                    col = 0
-                    for i, path in enumerate(self.photo_paths[color]):
-                        var = tk.BooleanVar(value=False)
-                        self.selected[color][path] = var
-                        
-                        thumb = self.make_thumbnail(path)
-                        if thumb:
-                            img_label = tk.Label(inner_frame, image=thumb, borderwidth=1, relief="solid")
-                            img_label.image = thumb  # Keep reference
-                            img_label.grid(row=grid_row, column=col * 2, padx=10, pady=10)
-                        
-                        filename = os.path.basename(path)
-                        short_name = filename[:30] + '...' if len(filename) > 30 else filename
-                        chk = tk.Checkbutton(inner_frame, variable=var, text=short_name, anchor='w')
-                        chk.grid(row=grid_row, column=col * 2 + 1, sticky='ew', padx=10, pady=10)
-                        
-                        col += 1
-                        if col == 3:  # 3 images per row
-                            col = 0
-                            grid_row += 1
-                    
-                    # Configure columns for even spacing
-                    for j in range(6):
-                        inner_frame.grid_columnconfigure(j, weight=1)
-                    
-                    # Bind mousewheel to camera_frame and all its children
-                    self.bind_mousewheel(camera_frame, canvas)
-                    
-                    self.camera_frames[color] = camera_frame
-                
-                # Button frame
-                self.button_frame = tk.Frame(self.photo_select_frame)
-                self.button_frame.pack(fill=tk.X, pady=10)
-                
-                tk.Button(self.button_frame, text="Back to Initial", command=lambda: self.show_frame('initial'), 
-                          bg="lightgray", font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
-                
-                tk.Button(self.button_frame, text="Previous Camera", command=self.prev_camera).pack(side=tk.LEFT, padx=5)
-                
-                self.camera_label = tk.Label(self.button_frame, text="", font=("Arial", 10, "bold"))
-                self.camera_label.pack(side=tk.LEFT, padx=10)
-                
-                tk.Button(self.button_frame, text="Next Camera", command=self.next_camera).pack(side=tk.LEFT, padx=5)
-                
-                tk.Button(self.button_frame, text="Proceed to Matching", command=self.match_photos, 
-                          bg="lightblue", font=("Arial", 12, "bold")).pack(side=tk.RIGHT, padx=10)
+                self.photo_counts[color] = (photo_count[color], skipped_count[color])
+                self.update_camera_title(color)
+                self.selected[color] = PhotoSelection(self.photos[color])
+                self.photo_grids[color].set_photos(self.photos[color], self.selected[color], self.metrics)
             
             self.initial_frame.pack_forget()
             self.photo_select_frame.pack(fill=tk.BOTH, expand=True)
             self.current_camera = 'Green'
             self.show_camera(self.current_camera)
-            self.status_label.config(text="")
-            
-        except Exception as e:
-            self.status_label.config(text="Error occurred!")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}\nCheck console for details.")
+        self.show_run_summary()
+    
+    def update_camera_title(self, color):
+        count, skipped = self.photo_counts[color]
+        text = f"{color} Photos ({count} images, {skipped} skipped)"
+        if self.clock_offsets is not None:
+            text += f" - clock offset {self.clock_offsets[color]:+.3f}s"
+        self.camera_titles[color].config(text=text)
     
     def show_camera(self, color):
         for c in self.colors:
@@ -437,139 +957,528 @@ class PhotoMatcherGUI:
         self.show_camera(self.current_camera)
     
     def match_photos(self):
+        if self.task is not None:
+            return
+        self.stop_watch()
+        
         # Filter selected photos
-        self.matched_photos = {}
-        for color in self.colors:
-            self.matched_photos[color] = []
-            for i, (p_time, subfolder, filename, source) in enumerate(self.photos[color]):
-                path = self.photo_paths[color][i]
-                if self.selected[color][path].get():
-                    self.matched_photos[color].append((p_time, subfolder, filename, source))
+        self.matched_photos = self.selected_catalogs()
+        self.reset_match_progress()
+        self.status_label.config(text=f"Matching photos (Threshold: {self.threshold}s)...")
+        
+        df = self.df
+        matched_photos = self.matched_photos
+        threshold = self.threshold
+        offsets = self.clock_offsets
+        one_to_one = self.one_to_one_var.get()
+        metrics = self.metrics
+        
+        def work(task):
+            with metrics.profiled(), metrics.stage('match'):
+                matched_count = match_log(df, matched_photos, self.camera_map, threshold, task, offsets, one_to_one)
+                matched_df = matched_rows(df)
+            metrics.count('rows_matched', matched_count)
+            return matched_df
+        
+        self.run_task(work, self.match_progress, self.show_matches,
+                      busy_buttons=self.match_buttons(), cancel_button=self.match_cancel_button)
+    
+    def match_buttons(self):
+        return [self.match_button, self.sweep_button, self.offset_button, self.positions_button]
+    
+    def show_run_summary(self, prefix=""):
+        """Show the session's stage timings and main counters in the status area."""
+        self.status_label.config(text=prefix + self.metrics.summary())
+    
+    def save_run_report(self, output_file, mode, **results):
+        """Write the session's run report next to an export; returns its path, or None if it failed."""
+        try:
+            return self.metrics.write_report(
+                run_report_path(output_file), mode=mode,
+                inputs={'log': self.xlsx_path.get(), 'dirs': {color: self.dir_vars[color].get() for color in self.colors},
+                        'threshold': self.threshold, 'one_to_one': self.one_to_one_var.get()},
+                results=dict(results, output_file=output_file, clock_offsets=self.clock_offsets))
+        except OSError:
+            return None
+    
+    def export_positions(self):
+        if self.task is not None:
+            return
+        
+        max_gap = simpledialog.askfloat("Photo Positions", "Flag photos whose log rows are more than this many seconds apart:",
+                                        initialvalue=MAX_FIX_GAP, minvalue=0, parent=self.root)
+        if max_gap is None:
+            return
+        
+        self.reset_match_progress()
+        self.match_progress['maximum'] = max(sum(self.selected[color].count() for color in self.colors), 1)
+        self.status_label.config(text="Interpolating photo positions...")
+        
+        df = self.df
+        catalogs = self.selected_catalogs()
+        offsets = self.clock_offsets
+        output_file = default_positions_path(self.xlsx_path.get(), self.output_base.get())
+        metrics = self.metrics
+        
+        def work(task):
+            with metrics.profiled():
+                with metrics.stage('interpolate'):
+                    positions = interpolate_photo_positions(df, catalogs, self.camera_map, max_gap, offsets, task)
+                if len(positions):
+                    with metrics.stage('export'):
+                        export_matches(positions, output_file, task)
+            return positions
+        
+        def done(positions):
+            if not len(positions):
+                messagebox.showwarning("No Photos", "Select some photos first.")
+                return
+            flags = positions['Position_Flag'].value_counts()
+            self.save_run_report(output_file, 'positions', positions=len(positions), max_gap=max_gap,
+                                 flags={flag: int(flags.get(flag, 0)) for flag in ('ok', 'gap', 'outside')})
+            self.show_run_summary()
+            messagebox.showinfo("Success",
+                f"Exported positions of {len(positions)} photos to:\n{output_file}\n"
+                f"Interpolated: {flags.get('ok', 0)}, over {max_gap:g}s gap: {flags.get('gap', 0)}, "
+                f"outside the log: {flags.get('outside', 0)}")
+        
+        self.run_task(work, self.match_progress, done,
+                      busy_buttons=self.match_buttons(), cancel_button=self.match_cancel_button)
+    
+    def estimate_offsets(self):
+        if self.task is not None:
+            return
         
-        # Match
-        self.df['Subfolder'] = ''
-        self.df['Filename'] = ''
+        self.reset_match_progress()
+        self.match_progress['maximum'] = len(self.colors)
+        self.status_label.config(text="Estimating clock offsets...")
         
-        matched_count = 0
-        no_match_count = 0
-        total_rows = len(self.df)
+        df = self.df
+        catalogs = self.selected_catalogs()
+        threshold = self.threshold
+        metrics = self.metrics
         
+        def work(task):
+            with metrics.profiled(), metrics.stage('clock_offsets'):
+                return estimate_clock_offsets(df, catalogs, self.camera_map, threshold, task=task)
+        
+        self.run_task(work, self.match_progress, self.show_offsets,
+                      busy_buttons=self.match_buttons(), cancel_button=self.match_cancel_button)
+    
+    def show_offsets(self, estimates):
+        self.clock_offsets = {color: offset for color, (offset, _) in estimates.items()}
+        for color in self.colors:
+            self.update_camera_title(color)
+        lines = [f"{color}: {offset:+.3f}s ({matched} rows line up)" for color, (offset, matched) in estimates.items()]
+        self.show_run_summary("Clock offsets applied to matching. ")
+        messagebox.showinfo("Clock Offsets", "Camera clock minus GPS time:\n" + "\n".join(lines) +
+                            "\n\nThese offsets are applied when matching and recorded in the export.")
+    
+    def selected_catalogs(self):
+        return {color: self.photos[color].take(np.flatnonzero(self.selected[color].mask)) for color in self.colors}
+    
+    def reset_match_progress(self):
         if self.match_progress is None:
             self.match_progress = ttk.Progressbar(self.photo_select_frame, orient='horizontal', length=400, mode='determinate')
             self.match_progress.pack(in_=self.photo_select_frame, before=self.button_frame, fill=tk.X, padx=10, pady=5)
         
-        self.match_progress['maximum'] = total_rows
+        self.match_progress['maximum'] = max(len(self.df), 1)
         self.match_progress['value'] = 0
-        self.status_label.config(text=f"Matching photos (Threshold: {self.threshold}s)...")
-        self.root.update()
+    
+    def sweep_thresholds(self):
+        if self.task is not None:
+            return
         
-        for idx, row in self.df.iterrows():
-            gps_time = row['Time']
-            
-            if pd.isna(gps_time):
-                no_match_count += 1
+        text = simpledialog.askstring("Threshold Sweep", "Thresholds in seconds (comma separated):",
+                                      initialvalue="0, 5, 10, 30, 60", parent=self.root)
+        if not text:
+            return
+        try:
+            thresholds = parse_thresholds(text)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        self.reset_match_progress()
+        self.status_label.config(text="Finding nearest photos...")
+        
+        df = self.df
+        catalogs = self.selected_catalogs()
+        offsets = self.clock_offsets
+        metrics = self.metrics
+        
+        def work(task):
+            with metrics.profiled(), metrics.stage('match'):
+                return nearest_photos(df, catalogs, self.camera_map, task, offsets)
+        
+        self.run_task(work, self.match_progress, lambda nearest: self.show_sweep(df, nearest, thresholds),
+                      busy_buttons=self.match_buttons(), cancel_button=self.match_cancel_button)
+    
+    def show_sweep(self, df, nearest, thresholds):
+        # The nearest photos are found once; each threshold is just a cut over their offsets
+        table = threshold_sweep(nearest, thresholds)
+        self.show_run_summary()
+        window = tk.Toplevel(self.root)
+        window.title("Threshold Sweep")
+        
+        tree = ttk.Treeview(window, columns=list(table.columns), show='headings', height=min(len(table), 15))
+        for col in table.columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=110, anchor=tk.E)
+        for row in table.itertuples(index=False):
+            tree.insert('', tk.END, values=(f"{row.Threshold_s:g}", row.Matched, row.Unmatched, f"{row.Match_Rate:.1%}"))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        def export(workbook):
+            paths = export_sweep(df, nearest, thresholds, self.xlsx_path.get(), self.output_base.get(), workbook)
+            if paths:
+                messagebox.showinfo("Success", "Exported:\n" + "\n".join(paths), parent=window)
             else:
-                cam = str(row['Camera']).strip()
-                color = self.camera_map.get(cam)
-                if not color:
-                    no_match_count += 1
-                else:
-                    photos_list = self.matched_photos.get(color, [])
-                    if not photos_list:
-                        no_match_count += 1
-                    else:
-                        min_diff_seconds = float('inf')
-                        closest_subfolder = ''
-                        closest_filename = ''
-                        
-                        for p_time, subfolder, filename, source in photos_list:
-                            diff = abs((p_time - gps_time).total_seconds())
-                            if diff < min_diff_seconds:
-                                min_diff_seconds = diff
-                                closest_subfolder = subfolder
-                                closest_filename = filename
-                        
-                        if min_diff_seconds <= self.threshold:
-                            matched_count += 1
-                            self.df.at[idx, 'Subfolder'] = closest_subfolder
-                            self.df.at[idx, 'Filename'] = closest_filename
-                        else:
-                            no_match_count += 1
-            self.match_progress['value'] += 1
-            self.root.update_idletasks()
-        
-        self.match_progress['value'] = self.match_progress['maximum']
-        self.root.update()
-        
-        self.matched_df = self.df[self.df['Filename'] != ''].copy()
+                messagebox.showwarning("No Matches", "No threshold produced any matches.", parent=window)
+        
+        button_frame = tk.Frame(window)
+        button_frame.pack(fill=tk.X, pady=(0, 10))
+        tk.Button(button_frame, text="Export One File per Threshold", command=lambda: export(False)).pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Export Workbook", command=lambda: export(True)).pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Close", command=window.destroy).pack(side=tk.RIGHT, padx=10)
+    
+    def show_matches(self, matched_df):
+        self.matched_df = matched_df
         
         # Build preview frame if not exists
         if self.preview_frame is None:
             self.preview_frame = tk.Frame(self.root)
-            tk.Label(self.preview_frame, text=f"Preview: {len(self.matched_df)} matches found", 
-                     font=("Arial", 12, "bold")).pack(pady=10)
-            
-            tree_frame = tk.Frame(self.preview_frame)
-            tree_frame.pack(fill=tk.BOTH, expand=True)
+            self.preview_title = tk.Label(self.preview_frame, font=("Arial", 12, "bold"))
+            self.preview_title.pack(pady=10)
             
-            self.tree = ttk.Treeview(tree_frame)
-            v_scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-            h_scroll = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-            self.tree.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
+            filter_frame = tk.Frame(self.preview_frame)
+            filter_frame.pack(fill=tk.X, padx=10)
+            tk.Label(filter_frame, text="Camera:").pack(side=tk.LEFT)
+            self.camera_filter = ttk.Combobox(filter_frame, textvariable=self.camera_filter_var, state='readonly', width=10)
+            self.camera_filter.pack(side=tk.LEFT, padx=5)
+            self.camera_filter.bind("<<ComboboxSelected>>", lambda e: self.filter_preview())
+            tk.Label(filter_frame, text="Max distance (s):").pack(side=tk.LEFT, padx=(10, 0))
+            distance_entry = tk.Entry(filter_frame, textvariable=self.distance_filter_var, width=8)
+            distance_entry.pack(side=tk.LEFT, padx=5)
+            distance_entry.bind("<Return>", lambda e: self.filter_preview())
+            tk.Label(filter_frame, text="Filename contains:").pack(side=tk.LEFT, padx=(10, 0))
+            name_entry = tk.Entry(filter_frame, textvariable=self.name_filter_var, width=20)
+            name_entry.pack(side=tk.LEFT, padx=5)
+            name_entry.bind("<Return>", lambda e: self.filter_preview())
+            tk.Button(filter_frame, text="Filter", command=self.filter_preview).pack(side=tk.LEFT, padx=5)
+            tk.Button(filter_frame, text="Clear", command=self.clear_preview_filters).pack(side=tk.LEFT)
+            tk.Button(filter_frame, text="Show Photo", command=self.show_match_photo).pack(side=tk.RIGHT)
             
-            v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-            h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
-            self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            self.match_table = MatchTable(self.preview_frame, on_activate=self.show_match_photo)
+            self.match_table.pack(fill=tk.BOTH, expand=True)
             
             button_frame = tk.Frame(self.preview_frame)
             button_frame.pack(fill=tk.X, pady=10)
-            tk.Button(button_frame, text="Export Matches", command=self.export_matches, 
-                      bg="lightgreen", font=("Arial", 12, "bold")).pack(side=tk.LEFT, padx=10)
+            self.export_button = tk.Button(button_frame, text="Export Matches", command=self.export_matches, 
+                                           bg="lightgreen", font=("Arial", 12, "bold"))
+            self.export_button.pack(side=tk.LEFT, padx=10)
+            ttk.Combobox(button_frame, textvariable=self.export_format_var, values=EXPORT_FORMATS,
+                         state='readonly', width=8).pack(side=tk.LEFT)
+            tk.Checkbutton(button_frame, text="Include unmatched rows",
+                           variable=self.export_all_var).pack(side=tk.LEFT, padx=5)
+            self.gps_button = tk.Button(button_frame, text="Write GPS to Photos...", command=self.write_gps,
+                                        font=("Arial", 12, "bold"))
+            self.gps_button.pack(side=tk.LEFT, padx=10)
+            self.watch_button = tk.Button(button_frame, text="Watch for New Photos", command=self.toggle_watch)
+            self.watch_button.pack(side=tk.LEFT, padx=5)
+            self.preview_cancel_button = tk.Button(button_frame, text="Cancel", command=self.cancel_task, state=tk.DISABLED)
+            self.preview_cancel_button.pack(side=tk.LEFT, padx=5)
             tk.Button(button_frame, text="Back to Photo Selection", 
                       command=lambda: self.show_frame('select'), bg="lightgray", font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
             tk.Button(button_frame, text="Back to Initial", 
                       command=lambda: self.show_frame('initial'), bg="lightgray", font=("Arial", 10)).pack(side=tk.RIGHT, padx=10)
+            self.preview_progress = ttk.Progressbar(self.preview_frame, orient='horizontal', length=400, mode='determinate')
+            self.preview_progress.pack(in_=self.preview_frame, before=button_frame, fill=tk.X, padx=10, pady=5)
         
-        # Populate tree
-        self.tree.delete(*self.tree.get_children())
-        if len(self.matched_df) > 0:
-            columns = list(self.matched_df.columns)
-            self.tree['columns'] = columns
-            self.tree.heading('#0', text='')  # No tree column
-            for col in columns:
-                self.tree.heading(col, text=col)
-                self.tree.column(col, width=120, minwidth=50)
-            
-            for _, row_data in self.matched_df.iterrows():
-                self.tree.insert('', tk.END, values=[str(val) for val in row_data])
-        else:
-            self.tree['columns'] = ()
+        self.fill_preview()
+        if self.matched_df.empty:
             messagebox.showinfo("No Matches", "No matches found with the selected photos and threshold.")
         
         self.photo_select_frame.pack_forget()
         self.preview_frame.pack(fill=tk.BOTH, expand=True)
-        self.status_label.config(text="Review matches and export.")
+        self.show_run_summary("Review matches and export. ")
+    
+    def fill_preview(self):
+        """Show the matched rows of df, with their match distance, in the preview table.
+        
+        The table reads straight from df, so nothing is copied or converted up front.
+        """
+        with self.metrics.stage('build_preview'):
+            cameras = self.df['Camera'].astype(str).str.strip()
+            self.camera_filter['values'] = ["All"] + sorted(cameras[self.df['Filename'] != ''].unique())
+            if self.camera_filter_var.get() not in self.camera_filter['values']:
+                self.camera_filter_var.set("All")
+            self.match_table.set_frame(self.df, np.flatnonzero(self.df['Filename'] != ''))
+        self.update_preview_title()
+    
+    def update_preview_rows(self):
+        """Re-read the preview after rows of df were re-matched."""
+        self.match_table.refresh(np.flatnonzero(self.df['Filename'] != ''))
+        self.update_preview_title()
+    
+    def update_preview_title(self):
+        shown, total = len(self.match_table.view), len(self.match_table.rows)
+        text = f"Preview: {total} matches found"
+        if shown != total:
+            text += f" ({shown} shown)"
+        self.preview_title.config(text=text)
+    
+    def filter_preview(self):
+        distance = self.distance_filter_var.get().strip()
+        try:
+            max_distance = float(distance) if distance else None
+        except ValueError:
+            messagebox.showerror("Error", f"Invalid max distance: {distance}")
+            return
+        camera = self.camera_filter_var.get()
+        self.match_table.set_filters(camera=None if camera == "All" else camera, max_distance=max_distance,
+                                     contains=self.name_filter_var.get().strip())
+        self.update_preview_title()
+    
+    def clear_preview_filters(self):
+        self.camera_filter_var.set("All")
+        self.distance_filter_var.set("")
+        self.name_filter_var.set("")
+        self.filter_preview()
+    
+    def show_match_photo(self, label=None):
+        """Open the photo matched to a row of df (default: the selected preview row) in its own window."""
+        if label is None:
+            label = self.match_table.selected_label()
+        if label is None:
+            messagebox.showinfo("Show Photo", "Select a row in the preview first.")
+            return
+        row = self.df.loc[label]
+        color = self.camera_map.get(str(row['Camera']).strip())
+        if color is None or not row['Filename']:
+            return
+        subfolder, filename = row['Subfolder'], row['Filename']
+        path = os.path.join(self.dir_vars[color].get(), subfolder, filename)
+        
+        window = tk.Toplevel(self.root)
+        window.title(filename)
+        image_label = tk.Label(window, text="Loading...", width=60, height=20)
+        image_label.pack(padx=10, pady=10)
+        tk.Label(window, text=f"{color}: {os.path.join(subfolder, filename)}\n"
+                              f"Row time {row['Time']}, {row['Match_Distance_s']:.3f}s from the photo",
+                 justify=tk.LEFT).pack(padx=10)
+        button_frame = tk.Frame(window)
+        button_frame.pack(fill=tk.X, pady=10)
+        tk.Button(button_frame, text="Show in Photo Selection",
+                  command=lambda: (window.destroy(), self.reveal_photo(color, subfolder, filename))).pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Close", command=window.destroy).pack(side=tk.RIGHT, padx=10)
+        
+        future = self.photo_pool.submit(load_thumbnail_image, path, (640, 640), metrics=self.metrics)
+        
+        def wait():
+            if not window.winfo_exists():
+                return
+            if not future.done():
+                window.after(50, wait)
+                return
+            img = future.result()
+            if img is None:
+                image_label.config(text=f"Could not read {path}")
+                return
+            image_label.image = ImageTk.PhotoImage(img)  # Keep a reference for Tk
+            image_label.config(image=image_label.image, text='', width=img.width, height=img.height)
+        wait()
+    
+    def reveal_photo(self, color, subfolder, filename):
+        """Switch to the photo selection screen scrolled to one photo."""
+        self.show_frame('select')
+        self.current_camera = color
+        self.show_camera(color)
+        i = self.photos[color].find(subfolder, filename)
+        if i >= 0:
+            self.photo_grids[color].scroll_to(i)
+    
+    def toggle_watch(self):
+        if self.watch is not None:
+            self.stop_watch()
+            self.show_run_summary("Stopped watching. ")
+            return
+        
+        dirs = {color: self.dir_vars[color].get() for color in self.colors}
+        watch_file = default_watch_path(self.xlsx_path.get(), self.output_base.get(), self.threshold)
+        try:
+            append_watch_rows(self.df, self.matched_df.index, watch_file, start=True)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write {watch_file}: {e}")
+            return
+        self.watch_matcher = IncrementalMatcher(self.df, self.matched_photos, self.camera_map, self.threshold,
+                                                self.clock_offsets, self.one_to_one_var.get())
+        self.watch_file = watch_file
+        watcher = PhotoWatcher(dirs, watch_known_paths(self.photos, self.metrics))
+        self.watch = WatchPoller(self.root, watcher, self.add_watched_photos, self.on_watch_error, self.workers,
+                                 self.metrics)
+        self.watch.start()
+        self.watch_button.config(text="Stop Watching")
+        self.status_label.config(text=f"Watching the photo folders every {WATCH_INTERVAL_S:g}s. "
+                                      f"Changed rows are appended to {watch_file}")
+    
+    def stop_watch(self):
+        if self.watch is None:
+            return
+        self.watch.stop()
+        self.watch = None
+        self.watch_matcher = None
+        self.watch_button.config(text="Watch for New Photos")
+    
+    def add_watched_photos(self, photos):
+        """Take new photos into the catalogs, grids and selections, and re-match the rows they affect."""
+        changed = []
+        with self.metrics.stage('watch_match'):
+            for color, new in photos.items():
+                merged, _, rows = self.watch_matcher.add_photos(color, new)
+                self.matched_photos[color] = merged
+                changed.append(rows)
+                # New photos are selected, so the selection screen agrees with what was matched
+                full, positions = self.photos[color].insert(new)
+                self.photos[color] = full
+                self.selected[color].insert(full, positions, True)
+                self.photo_grids[color].extend(full, self.selected[color])
+                count, skipped = self.photo_counts[color]
+                self.photo_counts[color] = (count + len(new), skipped)
+                self.update_camera_title(color)
+            changed = changed[0].append(changed[1:])
+            self.matched_df = matched_rows(self.df)
+            self.update_preview_rows()
+        added = sum(len(new) for new in photos.values())
+        self.metrics.count('watch_new_photos', added)
+        self.metrics.count('watch_rows_updated', len(changed))
+        try:
+            append_watch_rows(self.df, changed, self.watch_file)
+        except OSError as e:
+            self.on_watch_error(e)
+            return
+        self.show_run_summary(f"Watching: {added} new photos, {len(changed)} rows updated, "
+                              f"{len(self.matched_df)} matched. ")
+    
+    def on_watch_error(self, e):
+        self.stop_watch()
+        self.status_label.config(text="Stopped watching after an error.")
+        messagebox.showerror("Error", f"Watching the photo folders failed: {e}")
     
     def export_matches(self):
-        if self.matched_df is None or self.matched_df.empty:
+        if self.task is not None:
+            return
+        all_rows = self.export_all_var.get()
+        if self.matched_df is None or (self.matched_df.empty and not all_rows):
             messagebox.showwarning("No Matches", "No matches to export.")
             return
         
-        output_base_input = self.output_base.get().strip()
-        input_base, input_ext = os.path.splitext(os.path.basename(self.xlsx_path.get()))
-        base = output_base_input if output_base_input else input_base
-        base, ext = os.path.splitext(base)
-        output_filename = f"{base}_threshold_{self.threshold}s{ext or '.xlsx'}"
-        output_file = os.path.join(os.path.dirname(self.xlsx_path.get()), output_filename)
+        # Snapshot the table so matching again cannot change it mid-export
+        table = self.df.copy() if all_rows else self.matched_df
+        fmt = self.export_format_var.get()
+        output_file = default_output_path(self.xlsx_path.get(), self.output_base.get(), self.threshold, fmt, all_rows)
+        self.preview_progress['maximum'] = max(len(table), 1)
+        self.preview_progress['value'] = 0
+        self.status_label.config(text="Exporting...")
+        metrics = self.metrics
         
-        self.matched_df.to_excel(output_file, index=False)
+        def work(task):
+            with metrics.profiled(), metrics.stage('export'):
+                export_matches(table, output_file, task)
+            metrics.count('rows_exported', len(table))
+            return output_file
         
-        messagebox.showinfo("Success", 
-            f"Exported {len(self.matched_df)} matches to:\n{output_file}\n"
-            f"Threshold used: {self.threshold} seconds"
-        )
+        def done(output_file):
+            exported = f"all {len(table)} rows" if all_rows else f"{len(table)} matches"
+            matched = len(self.matched_df)
+            report_file = self.save_run_report(output_file, 'match', rows=len(self.df), matched=matched,
+                                               unmatched=len(self.df) - matched, exported=len(table))
+            self.show_run_summary()
+            messagebox.showinfo("Success", 
+                f"Exported {exported} to:\n{output_file}\n"
+                f"Threshold used: {self.threshold} seconds"
+                + (f"\n\nRun report: {report_file}" if report_file else "")
+            )
+        
+        self.run_task(work, self.preview_progress, done,
+                      busy_buttons=[self.export_button, self.gps_button], cancel_button=self.preview_cancel_button)
+    
+    def write_gps(self):
+        if self.task is not None:
+            return
+        if self.matched_df is None or self.matched_df.empty:
+            messagebox.showwarning("No Matches", "No matches to write.")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Write GPS to Photos")
+        dialog.transient(self.root)
+        output_dir = tk.StringVar()
+        dry_run = tk.BooleanVar(value=False)
+        verify = tk.BooleanVar(value=True)
+        utc_offset = tk.StringVar()
+        
+        tk.Label(dialog, text="Output folder (leave empty to update the photos in place):").pack(anchor=tk.W, padx=10, pady=(10, 0))
+        folder_frame = tk.Frame(dialog)
+        folder_frame.pack(fill=tk.X, padx=10, pady=5)
+        tk.Entry(folder_frame, textvariable=output_dir, width=50).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(folder_frame, text="Browse", command=lambda: output_dir.set(
+            filedialog.askdirectory(title="Select Output Folder", parent=dialog) or output_dir.get())).pack(side=tk.RIGHT, padx=5)
+        tk.Checkbutton(dialog, text="Dry run (check every photo, change nothing)", variable=dry_run).pack(anchor=tk.W, padx=10)
+        tk.Checkbutton(dialog, text="Verify each new file before it replaces the old one", variable=verify).pack(anchor=tk.W, padx=10)
+        offset_frame = tk.Frame(dialog)
+        offset_frame.pack(fill=tk.X, padx=10, pady=5)
+        tk.Label(offset_frame, text="Log time zone, hours from UTC (leave empty to skip the GPS time stamp):").pack(side=tk.LEFT)
+        tk.Entry(offset_frame, textvariable=utc_offset, width=8).pack(side=tk.LEFT, padx=5)
+        
+        def start():
+            offset = utc_offset.get().strip()
+            try:
+                offset = float(offset) if offset else None
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid UTC offset: {offset}", parent=dialog)
+                return
+            options = (output_dir.get().strip() or None, dry_run.get(), verify.get(), offset)
+            dialog.destroy()
+            self.start_gps_write(*options)
+        
+        button_frame = tk.Frame(dialog)
+        button_frame.pack(fill=tk.X, pady=10)
+        tk.Button(button_frame, text="Write", command=start, bg="lightgreen").pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
+    
+    def start_gps_write(self, output_dir, dry_run, verify, utc_offset=None):
+        matched_df = matched_rows(self.df, distances=True)
+        dirs = {color: self.dir_vars[color].get() for color in self.colors}
+        report_file = gps_report_path(default_output_path(self.xlsx_path.get(), self.output_base.get(), self.threshold))
+        self.preview_progress['maximum'] = max(len(matched_df), 1)
+        self.preview_progress['value'] = 0
+        self.status_label.config(text="Checking GPS tags (dry run)..." if dry_run else "Writing GPS tags...")
+        metrics = self.metrics
+        
+        def work(task):
+            with metrics.profiled(), metrics.stage('write_gps'):
+                report = write_gps_tags(matched_df, dirs, self.camera_map, output_dir, dry_run, verify, self.workers, task,
+                                        utc_offset=utc_offset)
+            report.to_csv(report_file, index=False)
+            return report
+        
+        def done(report):
+            counts = report['Status'].value_counts()
+            self.show_run_summary()
+            message = (f"{'Checked' if dry_run else 'Wrote'} {counts.get('dry run' if dry_run else 'written', 0)} photos"
+                       f"{' into ' + output_dir if output_dir and not dry_run else ''}.\n"
+                       f"Skipped: {counts.get('skipped', 0)}, failed: {counts.get('failed', 0)}\n\nReport: {report_file}")
+            if counts.get('failed', 0):
+                messagebox.showwarning("GPS Tagging", message)
+            else:
+                messagebox.showinfo("GPS Tagging", message)
+        
+        self.run_task(work, self.preview_progress, done,
+                      busy_buttons=[self.export_button, self.gps_button], cancel_button=self.preview_cancel_button)
     
     def show_frame(self, frame_name):
+        self.stop_watch()
         if frame_name == 'initial':
             if self.preview_frame:
                 self.preview_frame.pack_forget()
@@ -597,6 +1506,8 @@ class PhotoMatcherGUI:
             self.show_camera(self.current_camera)
 
 if __name__ == "__main__":
+    if '--cli' in sys.argv[1:]:
+        sys.exit(photo_pipeline.main([arg for arg in sys.argv[1:] if arg != '--cli']))
     root = tk.Tk()
     app = PhotoMatcherGUI(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,2742 @@
+"""GUI-independent photo matching pipeline: load log, scan photos, select, match and export.
+
+PhotoMatcherGUI in cameraGPSGeneratorV2.py is a client of this module; main() runs the
+same steps headless.
+"""
+import argparse
+import cProfile
+import csv
+import fnmatch
+import hashlib
+import importlib.util
+import json
+import os
+import pstats
+import queue
+import re
+import shutil
+import sqlite3
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+CAMERA_MAP = {'PDP1': 'Green', 'PDP2': 'White', 'PDP3': 'Third'}
+COLORS = ['Green', 'White', 'Third']
+
+# String formats tried in order (AU-specific, including partial times)
+AU_TIME_FORMATS = [
+    '%d/%m/%Y %H:%M:%S',      # Full 24h
+    '%d/%m/%Y %I:%M:%S %p',   # Full 12h AM/PM
+    '%d/%m/%Y %H:%M',         # Partial 24h (adds :00)
+    '%d/%m/%Y %I:%M %p',      # Partial 12h (adds :00)
+    '%d/%m/%Y %H:%M:%S.%f',   # With microseconds if any
+    '%d/%m/%Y %I:%M:%S.%f %p',
+    '%d/%m/%Y',               # Date only (00:00:00)
+    '%d/%m/%y %H:%M:%S',
+    '%d/%m/%y %I:%M:%S %p',
+    '%d/%m/%y %H:%M',
+    '%d/%m/%y %I:%M %p'
+]
+
+# Strings starting with a year are ISO dates and never day-first
+ISO_DATE = re.compile(r'^\d{4}-\d{1,2}-\d{1,2}')
+
+# Excel serial day numbers that fit in datetime64[ns]; larger numbers are not serials
+SERIAL_ORIGIN = pd.Timestamp('1899-12-30')
+SERIAL_DAYS = tuple((bound.value - SERIAL_ORIGIN.value) / pd.Timedelta(days=1).value
+                    for bound in (pd.Timestamp.min, pd.Timestamp.max))
+
+def parse_time_robust(raw_value):
+    """Try multiple parsing methods and return best datetime or error info."""
+    if pd.isna(raw_value):
+        return None, "Empty/NaN value"
+    
+    raw_str = str(raw_value).strip()
+    
+    if isinstance(raw_value, (pd.Timestamp, datetime)):
+        return raw_value, None
+    
+    try:
+        num = float(raw_value)  # More aggressive
+        if SERIAL_DAYS[0] <= num <= SERIAL_DAYS[1]:
+            dt = pd.to_datetime(num, origin=SERIAL_ORIGIN, unit='D', errors='coerce')
+            if pd.notna(dt):
+                return dt, None
+    except:
+        pass
+    
+    # Method 3: String formats (AU-specific, including partial times)
+    for fmt in AU_TIME_FORMATS:
+        try:
+            dt = pd.to_datetime(raw_str, format=fmt, dayfirst=True, errors='coerce')
+            if pd.notna(dt):
+                return dt, None
+        except:
+            pass
+    
+    try:
+        dt = pd.to_datetime(raw_str, dayfirst=not ISO_DATE.match(raw_str), errors='coerce')
+        if pd.notna(dt):
+            return dt, None
+    except:
+        pass
+    
+    if ':' in raw_str and len(raw_str.split(':')) == 2:  # HH:MM only
+        try:
+            parts = raw_str.split()
+            date_part = parts[0]
+            time_part = parts[1] + ':00'
+            full_str = f"{date_part} {time_part}"
+            dt = pd.to_datetime(full_str, dayfirst=True, errors='coerce')
+            if pd.notna(dt):
+                return dt, None
+        except:
+            pass
+    
+    error_msg = f"Failed all parses (raw: '{raw_str}') | Type: {type(raw_value)}"
+    return None, error_msg
+
+def _to_datetime_each(strings):
+    """Parse every string on its own, day-first unless it is an ISO date; NaT where it fails.
+    
+    The result may hold time zone aware values (see _naive_times).
+    """
+    iso = strings.str.match(ISO_DATE)
+    result = pd.Series(pd.NaT, index=strings.index, dtype=object)
+    for rows, dayfirst in ((iso, False), (~iso, True)):
+        if not rows.any():
+            continue
+        try:
+            parsed = pd.to_datetime(strings[rows], format='mixed', dayfirst=dayfirst, errors='coerce')
+        except (TypeError, ValueError):
+            # pandas < 2.0 has no format='mixed', and mixed UTC offsets need one value at a time
+            parsed = strings[rows].apply(lambda v: pd.to_datetime(v, dayfirst=dayfirst, errors='coerce'))
+        result[rows] = parsed.astype(object)
+    return result
+
+def _naive_times(times, zone):
+    """Return (times as naive datetime64[ns], zone).
+    
+    Time zone aware values are converted to zone, the first such value's zone when
+    zone is None, and their wall-clock time kept. Values outside datetime64[ns] are NaT.
+    """
+    times = pd.Series(times)
+    if isinstance(times.dtype, pd.DatetimeTZDtype):
+        zone = zone or times.dt.tz
+        times = times.dt.tz_convert(zone).dt.tz_localize(None)
+    elif times.dtype == object:
+        values = []
+        for value in times:
+            if isinstance(value, datetime) and value.tzinfo is not None:
+                zone = zone or value.tzinfo
+                value = pd.Timestamp(value).tz_convert(zone).tz_localize(None)
+            values.append(value)
+        times = pd.Series(pd.to_datetime(values, errors='coerce'), index=times.index)
+    times = times.where((times >= pd.Timestamp.min) & (times <= pd.Timestamp.max))
+    return times.astype('datetime64[ns]'), zone
+
+def parse_time_column(values):
+    """Column-level version of parse_time_robust.
+    
+    Each parsing method runs vectorized over the rows still unparsed, in the same
+    order as the per-value parser. Returns (parsed datetimes, Parse_Error strings),
+    both aligned with the input index.
+    
+    Times with a time zone (e.g. '2024-03-12T10:00:00+10:00') are converted to the zone
+    of the first one and kept as naive wall-clock times like the rest of the column;
+    that zone is left in parsed.attrs['time_zone'] so they can still be turned into UTC.
+    """
+    values = pd.Series(values)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    errors = pd.Series('', index=values.index, dtype=object)
+    zone = None
+    
+    def store(rows, times):
+        nonlocal zone
+        parsed[rows], zone = _naive_times(times, zone)
+    
+    missing = values.isna()
+    errors[missing] = "Empty/NaN value"
+    if pd.api.types.is_datetime64_any_dtype(values):
+        store(~missing, values[~missing])
+        parsed.attrs['time_zone'] = zone
+        return parsed, errors
+    
+    def unparsed():
+        return parsed.isna() & ~missing
+    
+    # Method 1: native datetimes
+    if values.dtype == object:
+        native = ~missing & values.map(lambda v: isinstance(v, (pd.Timestamp, datetime)))
+        if native.any():
+            store(native, values[native])
+    
+    raw_str = values.astype(str).str.strip()
+    
+    # Method 2: Excel serial day numbers (also numeric strings)
+    todo = unparsed()
+    if todo.any():
+        if pd.api.types.is_numeric_dtype(values):
+            numbers = values[todo].astype(float)
+        else:
+            numbers = pd.to_numeric(raw_str[todo], errors='coerce')
+        numbers = numbers.where(numbers.between(*SERIAL_DAYS))
+        parsed[todo] = pd.to_datetime(numbers, origin=SERIAL_ORIGIN, unit='D', errors='coerce')
+    
+    # Method 3: String formats, each only on the rows still unparsed
+    for fmt in AU_TIME_FORMATS:
+        todo = unparsed()
+        if not todo.any():
+            break
+        store(todo, pd.to_datetime(raw_str[todo], format=fmt, errors='coerce'))
+    
+    # Method 4: per-value inference
+    todo = unparsed()
+    if todo.any():
+        store(todo, _to_datetime_each(raw_str[todo]))
+    
+    # Method 5: "date HH:MM" with seconds appended
+    todo = unparsed() & (raw_str.str.count(':') == 1)
+    if todo.any():
+        parts = raw_str[todo].str.split()
+        parts = parts[parts.str.len() >= 2]
+        if len(parts):
+            store(parts.index, _to_datetime_each(parts.str[0] + ' ' + parts.str[1] + ':00'))
+    
+    failed = unparsed()
+    errors[failed] = [f"Failed all parses (raw: '{r}') | Type: {type(v)}"
+                      for r, v in zip(raw_str[failed], values[failed])]
+    parsed.attrs['time_zone'] = zone
+    return parsed, errors
+
+# EXIF datetime tags in priority order; DateTime sits in IFD0, the others in the Exif sub-IFD
+_TAG_IDS = {tn: tid for tid, tn in TAGS.items()}
+EXIF_DATETIME_TAGS = [(_TAG_IDS[tn], tn) for tn in ('DateTimeOriginal', 'DateTimeDigitized', 'DateTime')]
+EXIF_IFD_POINTER = _TAG_IDS['ExifOffset']
+
+def _exif_value_to_datetime(data):
+    dt_str = str(data).strip()
+    if ' ' in dt_str:
+        return datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S')
+    else:
+        return datetime.strptime(dt_str[:10] + ' 00:00:00', '%Y:%m:%d %H:%M:%S')
+
+def _read_ifd_entries(tiff, offset, endian, wanted):
+    """Return {tag_id: value} for the wanted ASCII/LONG/RATIONAL tags of the IFD at offset."""
+    entries = {}
+    (count,) = struct.unpack_from(endian + 'H', tiff, offset)
+    for i in range(count):
+        tag, typ, n = struct.unpack_from(endian + 'HHI', tiff, offset + 2 + i * 12)
+        if tag not in wanted:
+            continue
+        value_pos = offset + 10 + i * 12
+        if typ == 2:  # ASCII, stored inline when it fits in 4 bytes
+            if n > 4:
+                (value_pos,) = struct.unpack_from(endian + 'I', tiff, value_pos)
+            raw = tiff[value_pos:value_pos + n]
+            if len(raw) < n:
+                raise ValueError("Truncated EXIF string")
+            if raw.endswith(b'\0'):
+                raw = raw[:-1]
+            entries[tag] = raw.decode('latin-1', 'replace')
+        elif typ in (4, 13):  # LONG / IFD pointer
+            (entries[tag],) = struct.unpack_from(endian + 'I', tiff, value_pos)
+        elif typ == 5:  # RATIONALs, always stored at an offset
+            (value_pos,) = struct.unpack_from(endian + 'I', tiff, value_pos)
+            parts = struct.unpack_from(endian + 'I' * (2 * n), tiff, value_pos)
+            entries[tag] = tuple(num / den if den else float('nan') for num, den in zip(parts[::2], parts[1::2]))
+    return entries
+
+def read_exif_datetime_values(file_path):
+    """Read the EXIF datetime tags straight from a JPEG's APP1 header.
+    
+    Only the marker segments before the image data are read and no pixels are
+    decoded. Returns {tag_id: string} of the datetime tags present (empty when
+    the Exif block has none), or None when the file has no Exif block or an
+    empty one. Raises ValueError if the file is not a JPEG this reader understands.
+    """
+    with open(file_path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            raise ValueError("Not a JPEG file")
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError("Corrupt JPEG marker")
+            code = marker[1]
+            if code == 0xFF:  # Fill byte before the real marker
+                f.seek(-1, os.SEEK_CUR)
+                continue
+            if code in (0xDA, 0xD9):  # Image data or end reached without Exif
+                return None
+            if code == 0x01 or 0xD0 <= code <= 0xD7:  # Markers without a length
+                continue
+            header = f.read(2)
+            if len(header) < 2:
+                raise ValueError("Truncated JPEG header")
+            (length,) = struct.unpack('>H', header)
+            if code != 0xE1:
+                f.seek(length - 2, os.SEEK_CUR)
+                continue
+            payload = f.read(length - 2)
+            if not payload.startswith(b'Exif\x00\x00'):
+                continue  # e.g. an XMP APP1 segment
+            return _parse_tiff_datetimes(payload[6:])
+
+def _parse_tiff_datetimes(tiff):
+    """{tag_id: string} of the datetime tags in a TIFF block, or None when IFD0 is empty."""
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        raise ValueError("Unknown TIFF byte order in EXIF block")
+    magic, ifd0 = struct.unpack_from(endian + 'HI', tiff, 2)
+    if magic != 42:
+        raise ValueError("Bad TIFF header in EXIF block")
+    if struct.unpack_from(endian + 'H', tiff, ifd0)[0] == 0:
+        return None  # PIL's getexif() is empty here too
+    wanted = {tid for tid, _ in EXIF_DATETIME_TAGS} | {EXIF_IFD_POINTER}
+    values = _read_ifd_entries(tiff, ifd0, endian, wanted)
+    exif_ifd = values.pop(EXIF_IFD_POINTER, None)
+    if isinstance(exif_ifd, int):
+        values.update(_read_ifd_entries(tiff, exif_ifd, endian, wanted))
+    return {tid: v for tid, v in values.items() if isinstance(v, str)}
+
+def _tag_datetime(values):
+    """(datetime, tag name) from the first datetime tag present in {tag_id: value}, else (None, reason)."""
+    for tag_id, tag_name in EXIF_DATETIME_TAGS:
+        data = values.get(tag_id)
+        if data:
+            try:
+                return _exif_value_to_datetime(data), tag_name
+            except ValueError:
+                return None, f"invalid EXIF time: {tag_name} '{str(data).strip()}'"
+    return None, "no EXIF time tag"
+
+def _get_exif_datetime_pil(file_path):
+    try:
+        with Image.open(file_path) as image:
+            exifdata = image.getexif()
+            if not exifdata:
+                return None, "no EXIF data"
+            exif_ifd = exifdata.get_ifd(EXIF_IFD_POINTER)
+            return _tag_datetime({tag_id: exif_ifd.get(tag_id) or exifdata.get(tag_id)
+                                  for tag_id, _ in EXIF_DATETIME_TAGS})
+    except Exception as e:
+        return None, f"unreadable: {type(e).__name__}: {e}"
+
+def _read_exif_datetime(file_path):
+    """get_exif_datetime() without the cache; the header parser and PIL give the same reasons."""
+    try:
+        values = read_exif_datetime_values(file_path)
+    except (OSError, ValueError, struct.error):
+        return _get_exif_datetime_pil(file_path)
+    if values is None:
+        return None, "no EXIF data"
+    return _tag_datetime(values)
+
+def get_exif_datetime(file_path, cache=None, st=None):
+    """Return (datetime, source tag) for a photo, or (None, reason) without a usable EXIF time.
+    
+    The reason is a short category such as "no EXIF data", optionally followed by ": "
+    and details. With an ExifCache for the photo's root, unchanged files are answered
+    from the cache; st may carry a stat result the caller already has.
+    """
+    if cache is not None:
+        return cache.get_exif_datetime(file_path, st)
+    return _read_exif_datetime(file_path)
+
+EXIF_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.photo_matcher', 'exif_cache')
+EXIF_CACHE_VERSION = 3  # Bump when the EXIF reader changes what it returns
+
+def exif_cache_path(photo_dir, cache_dir=None):
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(photo_dir)).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir or EXIF_CACHE_DIR, key + '.sqlite')
+
+def clear_exif_cache(photo_dir=None, cache_dir=None):
+    """Delete the cache of one photo root, or of every root when photo_dir is None."""
+    cache_dir = cache_dir or EXIF_CACHE_DIR
+    if photo_dir is not None:
+        paths = [exif_cache_path(photo_dir, cache_dir)]
+    elif os.path.isdir(cache_dir):
+        paths = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.sqlite')]
+    else:
+        paths = []
+    removed = 0
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+class ExifCache:
+    """SQLite-backed EXIF time cache for one photo root.
+    
+    Entries are keyed by the path relative to the root and are only trusted while
+    the file's size and mtime are unchanged. Lookups are served from memory so
+    loader threads can share one instance; save() writes back new and modified
+    entries and drops those for files not seen since the cache was opened, so it
+    should follow a full scan of the root.
+    """
+    
+    def __init__(self, photo_dir, cache_dir=None):
+        self.photo_dir = photo_dir
+        self.path = exif_cache_path(photo_dir, cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # Guards the counters and _seen across loader threads
+        self._stored = {}  # relpath -> (size, mtime_ns, iso time or None, source tag or skip reason)
+        self._seen = {}
+        try:
+            if os.path.exists(self.path):
+                with closing(sqlite3.connect(self.path)) as conn:
+                    if conn.execute('PRAGMA user_version').fetchone()[0] == EXIF_CACHE_VERSION:
+                        for relpath, size, mtime_ns, taken, source in conn.execute(
+                                'SELECT relpath, size, mtime_ns, taken, source FROM exif'):
+                            self._stored[relpath] = (size, mtime_ns, taken, source)
+        except sqlite3.Error:
+            self._stored = {}  # Unreadable cache, rebuild it from scratch
+    
+    def get_exif_datetime(self, file_path, st=None):
+        try:
+            st = st or os.stat(file_path)
+        except OSError as e:
+            return None, f"unreadable: {e}"
+        relpath = os.path.relpath(file_path, self.photo_dir)
+        entry = self._stored.get(relpath)
+        hit = entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns)
+        if not hit:
+            photo_time, source = _read_exif_datetime(file_path)
+            entry = (st.st_size, st.st_mtime_ns, photo_time.isoformat() if photo_time else None, source)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._seen[relpath] = entry
+        taken, source = entry[2], entry[3]
+        return (datetime.fromisoformat(taken) if taken else None), source
+    
+    def save(self):
+        """Persist this scan's entries; returns False if the cache could not be written."""
+        stale = [(relpath,) for relpath in self._stored if relpath not in self._seen]
+        changed = [(relpath,) + entry for relpath, entry in self._seen.items()
+                   if self._stored.get(relpath) != entry]
+        if not stale and not changed and os.path.exists(self.path):
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with closing(sqlite3.connect(self.path)) as conn, conn:
+                if conn.execute('PRAGMA user_version').fetchone()[0] != EXIF_CACHE_VERSION:
+                    conn.execute('DROP TABLE IF EXISTS exif')
+                    conn.execute(f'PRAGMA user_version = {EXIF_CACHE_VERSION}')
+                    changed = [(relpath,) + entry for relpath, entry in self._seen.items()]
+                conn.execute('CREATE TABLE IF NOT EXISTS exif (relpath TEXT PRIMARY KEY, size INTEGER, '
+                             'mtime_ns INTEGER, taken TEXT, source TEXT)')
+                conn.executemany('DELETE FROM exif WHERE relpath = ?', stale)
+                conn.executemany('INSERT OR REPLACE INTO exif VALUES (?, ?, ?, ?, ?)', changed)
+        except (sqlite3.Error, OSError):
+            return False
+        self._stored = dict(self._seen)
+        self._seen = {}
+        return True
+
+THUMB_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.photo_matcher', 'thumb_cache')
+THUMB_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+def thumbnail_cache_path(file_path, size=(200, 200), cache_dir=None):
+    """Content-addressed cache file for a thumbnail, keyed by path, size, mtime and thumbnail size."""
+    st = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}|{size[0]}x{size[1]}"
+    return os.path.join(cache_dir or THUMB_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.jpg')
+
+def load_thumbnail_image(file_path, size=(200, 200), cache_dir=None, metrics=None):
+    """Return a PIL thumbnail of a photo, from the disk cache when possible; None on failure.
+    
+    Failures are recorded as skipped files in metrics (a RunMetrics), which also
+    counts cache hits and the time spent decoding. Safe to call from worker threads;
+    only the ImageTk conversion must happen on the Tk thread.
+    """
+    metrics = metrics or RunMetrics()
+    try:
+        cache_path = thumbnail_cache_path(file_path, size, cache_dir)
+    except OSError as e:
+        metrics.skip(file_path, f"thumbnail failed: {e}", 'thumbnails_failed')
+        return None
+    try:
+        with Image.open(cache_path) as cached:
+            cached.load()
+        os.utime(cache_path)  # Mark as recently used for LRU eviction
+        metrics.count('thumbnails_cached')
+        return cached
+    except OSError:
+        pass
+    
+    start = time.perf_counter()
+    try:
+        with Image.open(file_path) as img:
+            # Let the JPEG decoder scale down by up to 8x instead of decoding full resolution
+            img.draft('RGB', size)
+            img.load()  # thumbnail() skips loading photos already within size
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+    except Exception as e:
+        metrics.skip(file_path, f"thumbnail failed: {type(e).__name__}: {e}", 'thumbnails_failed')
+        return None
+    metrics.count('thumbnails_made')
+    metrics.count('thumbnail_decode_s', time.perf_counter() - start)
+    
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, 'JPEG', quality=85)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # An unwritable cache only costs speed
+    return img
+
+def prune_thumbnail_cache(max_bytes=THUMB_CACHE_MAX_BYTES, cache_dir=None):
+    """Evict least recently used thumbnails until the cache fits in max_bytes."""
+    cache_dir = cache_dir or THUMB_CACHE_DIR
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.name.endswith('.jpg') and e.is_file()]
+    except OSError:
+        return 0
+    entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+def default_worker_count():
+    return os.cpu_count() or 1
+
+def iter_photo_files(photo_dir, stop=None):
+    """Yield (directory, filename, stat) for every JPEG under photo_dir in one scandir pass.
+    
+    Directories are visited in the same order as os.walk and unreadable ones are
+    skipped. Iteration ends early once the optional stop event is set.
+    """
+    pending = [photo_dir]
+    while pending:
+        directory = pending.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if stop is not None and stop.is_set():
+                        return
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(('.jpg', '.jpeg')) and entry.is_file():
+                            yield directory, entry.name, entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        pending.extend(reversed(subdirs))
+
+def read_photo_record(photo_dir, root, file, cache=None, st=None):
+    """EXIF time and location of one photo: (time, subfolder, file, source, full_path)."""
+    full_path = os.path.join(root, file)
+    photo_time, source = get_exif_datetime(full_path, cache, st)
+    subfolder = os.path.relpath(root, photo_dir)
+    if subfolder == '.':
+        subfolder = ''
+    return photo_time, subfolder, file, source, full_path
+
+def to_epoch_ns(times):
+    """Convert a sequence of datetimes to an int64 array of nanoseconds since the epoch."""
+    values = pd.to_datetime(pd.Series(list(times), dtype=object))
+    return values.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+def nearest_indices(sorted_ns, query_ns):
+    """Find the closest entry of a sorted int64 time index for every query time.
+    
+    Returns (indices, distances in seconds). Ties resolve to the earliest entry in
+    the index, the same result as a first-wins linear scan over time-sorted photos.
+    """
+    sorted_ns = np.asarray(sorted_ns, dtype=np.int64)
+    query_ns = np.asarray(query_ns, dtype=np.int64)
+    n = len(sorted_ns)
+    if n == 0:
+        return np.full(len(query_ns), -1, dtype=np.int64), np.full(len(query_ns), np.inf)
+    
+    right = np.searchsorted(sorted_ns, query_ns, side='left')
+    left = right - 1
+    right_c = np.minimum(right, n - 1)
+    left_c = np.maximum(left, 0)
+    
+    no_diff = np.iinfo(np.int64).max
+    right_diff = np.where(right < n, sorted_ns[right_c] - query_ns, no_diff)
+    left_diff = np.where(left >= 0, query_ns - sorted_ns[left_c], no_diff)
+    
+    # The left neighbour comes first in scan order, so it also wins exact ties;
+    # step back to the first photo sharing its timestamp.
+    use_left = left_diff <= right_diff
+    left_first = np.searchsorted(sorted_ns, sorted_ns[left_c], side='left')
+    best = np.where(use_left, left_first, right_c)
+    diff_seconds = np.minimum(left_diff, right_diff) / 1e9
+    return best, diff_seconds
+
+class PhotoCatalog:
+    """Columnar, time-sorted table of one camera's photos.
+    
+    Times are int64 nanoseconds, subfolders and EXIF source tags are stored as
+    small integer codes into shared tables, and full paths are derived from the
+    camera root on demand. Row i means the same photo everywhere: selection,
+    matching and thumbnails all index into the same catalog.
+    """
+    
+    __slots__ = ('root', 'times', 'subfolder_ids', 'subfolders', 'filenames', 'source_ids')
+    
+    SOURCES = [tag_name for _, tag_name in EXIF_DATETIME_TAGS]
+    
+    def __init__(self, root, times, subfolder_ids, subfolders, filenames, source_ids):
+        self.root = root
+        self.times = times
+        self.subfolder_ids = subfolder_ids
+        self.subfolders = subfolders
+        self.filenames = filenames
+        self.source_ids = source_ids
+    
+    @classmethod
+    def from_records(cls, root, records):
+        """Build a catalog from (datetime, subfolder, filename, source) records, sorted by time."""
+        records = list(records)
+        subfolder_codes = {}
+        times = to_epoch_ns(r[0] for r in records) if records else np.zeros(0, dtype=np.int64)
+        subfolder_ids = np.fromiter((subfolder_codes.setdefault(r[1], len(subfolder_codes)) for r in records),
+                                    dtype=np.int32, count=len(records))
+        source_ids = np.fromiter((cls.SOURCES.index(r[3]) for r in records), dtype=np.int8, count=len(records))
+        filenames = np.array([r[2] for r in records], dtype=object)
+        order = np.argsort(times, kind='stable')
+        return cls(root, times[order], subfolder_ids[order], list(subfolder_codes),
+                   filenames[order], source_ids[order])
+    
+    @classmethod
+    def empty(cls, root=''):
+        return cls.from_records(root, [])
+    
+    def __len__(self):
+        return len(self.times)
+    
+    def take(self, indices):
+        """Sub-catalog of the given rows (kept in time order if indices are sorted)."""
+        return PhotoCatalog(self.root, self.times[indices], self.subfolder_ids[indices], self.subfolders,
+                            self.filenames[indices], self.source_ids[indices])
+    
+    def datetime(self, i):
+        return pd.Timestamp(int(self.times[i])).to_pydatetime()
+    
+    def subfolder(self, i):
+        return self.subfolders[self.subfolder_ids[i]]
+    
+    def filename(self, i):
+        return self.filenames[i]
+    
+    def source(self, i):
+        return self.SOURCES[self.source_ids[i]]
+    
+    def path(self, i):
+        return os.path.join(self.root, self.subfolder(i), self.filenames[i])
+    
+    def subfolder_array(self, indices=slice(None)):
+        return np.array(self.subfolders, dtype=object)[self.subfolder_ids[indices]]
+    
+    def keys(self):
+        """photo_key of every row, as an object array."""
+        return np.array([photo_key(self.subfolders[s], f) for s, f in zip(self.subfolder_ids, self.filenames)],
+                        dtype=object)
+    
+    def paths(self):
+        return [os.path.join(self.root, self.subfolders[s], f) for s, f in zip(self.subfolder_ids, self.filenames)]
+    
+    def find(self, subfolder, filename):
+        """Index of a photo, or -1 if it is not in the catalog."""
+        if subfolder not in self.subfolders:
+            return -1
+        hits = np.flatnonzero((self.filenames == filename) & (self.subfolder_ids == self.subfolders.index(subfolder)))
+        return int(hits[0]) if len(hits) else -1
+    
+    def insert(self, other):
+        """Merge in another catalog of the same root; returns (merged catalog, positions of other's rows).
+        
+        other's photos go after existing photos with the same time, as if discovered
+        last. Only the arrays are copied; nothing is sorted again.
+        """
+        codes = {name: i for i, name in enumerate(self.subfolders)}
+        remap = np.array([codes.setdefault(name, len(codes)) for name in other.subfolders], dtype=np.int32)
+        at = np.searchsorted(self.times, other.times, side='right')
+        merged = PhotoCatalog(self.root, np.insert(self.times, at, other.times),
+                              np.insert(self.subfolder_ids, at, remap[other.subfolder_ids]), list(codes),
+                              np.insert(self.filenames, at, other.filenames),
+                              np.insert(self.source_ids, at, other.source_ids))
+        return merged, at + np.arange(len(other))
+
+class PhotoSelection:
+    """Selection state of a PhotoCatalog as a NumPy boolean mask.
+    
+    Indexing reads and writes single photos (the grid checkboxes); the bulk
+    operations work on the whole mask at once.
+    """
+    
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.mask = np.zeros(len(catalog), dtype=bool)
+        self._keys = catalog.keys()
+    
+    def __len__(self):
+        return len(self.mask)
+    
+    def __getitem__(self, i):
+        return bool(self.mask[i])
+    
+    def __setitem__(self, i, value):
+        self.mask[i] = value
+    
+    def count(self):
+        return int(self.mask.sum())
+    
+    def set_all(self, value=True):
+        self.mask[:] = value
+    
+    def invert(self):
+        np.logical_not(self.mask, out=self.mask)
+    
+    def set_time_range(self, start, end, value=True):
+        """Set every photo taken between start and end (inclusive); returns how many."""
+        start_ns, end_ns = to_epoch_ns([start, end])
+        # Times are sorted, so the range is one contiguous slice
+        lo = np.searchsorted(self.catalog.times, start_ns, side='left')
+        hi = np.searchsorted(self.catalog.times, end_ns, side='right')
+        self.mask[lo:hi] = value
+        return max(hi - lo, 0)
+    
+    def set_subfolder(self, subfolder, value=True):
+        if subfolder not in self.catalog.subfolders:
+            return 0
+        hits = self.catalog.subfolder_ids == self.catalog.subfolders.index(subfolder)
+        self.mask[hits] = value
+        return int(hits.sum())
+    
+    def set_glob(self, pattern, value=True):
+        """Set photos whose filename (or subfolder/filename) matches a shell-style pattern."""
+        regex = re.compile(fnmatch.translate(os.path.normcase(pattern)))
+        hits = np.fromiter((regex.match(os.path.normcase(k)) is not None or
+                            regex.match(os.path.normcase(k.rsplit('/', 1)[-1])) is not None
+                            for k in self._keys), dtype=bool, count=len(self._keys))
+        self.mask[hits] = value
+        return int(hits.sum())
+    
+    def to_session(self):
+        """Compact form for a session file: whichever of the selected/unselected sets is smaller."""
+        if self.count() * 2 > len(self.mask):
+            return {'mode': 'excluded', 'photos': self._keys[~self.mask].tolist()}
+        return {'mode': 'selected', 'photos': self._keys[self.mask].tolist()}
+    
+    def apply_session(self, entry):
+        """Restore a to_session() entry. In 'excluded' mode every photo not listed is selected."""
+        listed = np.isin(self._keys, list(entry.get('photos', [])))
+        self.mask[:] = ~listed if entry.get('mode') == 'excluded' else listed
+        return self.count()
+    
+    def insert(self, catalog, positions, value=True):
+        """Follow the catalog returned by PhotoCatalog.insert(); the new photos at positions get value."""
+        at = positions - np.arange(len(positions))
+        self.mask = np.insert(self.mask, at, value)
+        self._keys = np.insert(self._keys, at, [photo_key(catalog.subfolder(i), catalog.filename(i)) for i in positions])
+        self.catalog = catalog
+
+def photo_key(subfolder, filename):
+    """Stable identifier of a photo relative to its camera directory."""
+    return f"{subfolder.replace(os.sep, '/')}/{filename}" if subfolder else filename
+
+SESSION_VERSION = 1
+
+def save_selection_session(path, selections, dirs=None):
+    """Write {color: PhotoSelection} to a JSON session file."""
+    session = {'version': SESSION_VERSION, 'cameras': {}}
+    for color, selection in selections.items():
+        entry = selection.to_session()
+        if dirs and dirs.get(color):
+            entry['directory'] = dirs[color]
+        session['cameras'][color] = entry
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(session, f)
+
+def load_selection_session(path, selections):
+    """Apply a session file to {color: PhotoSelection}; returns the selected count per camera."""
+    with open(path, encoding='utf-8') as f:
+        session = json.load(f)
+    if session.get('version') != SESSION_VERSION:
+        raise ValueError(f"Unsupported selection file version: {session.get('version')}")
+    counts = {}
+    for color, entry in session.get('cameras', {}).items():
+        if color in selections:
+            counts[color] = selections[color].apply_session(entry)
+    return counts
+
+class TaskCancelled(Exception):
+    """Raised inside a long-running step once its task has been cancelled."""
+
+class TaskProgress:
+    """Progress and cancellation hooks for long-running steps; this base class ignores both."""
+    
+    def report(self, done, total, text=None):
+        pass
+    
+    def check_cancelled(self):
+        pass
+
+RUN_REPORT_VERSION = 1
+PROFILE_TOP_FUNCTIONS = 25
+SUMMARY_COUNTERS = [('files_scanned', 'files'), ('files_skipped', 'skipped'), ('exif_fallback_tags', 'EXIF fallbacks'),
+                    ('parse_errors', 'parse errors'), ('rows_matched', 'matched'), ('thumbnails_failed', 'thumbnail failures')]
+
+class RunMetrics:
+    """Per-stage wall/CPU timers, counters and skipped files collected over one run.
+    
+    CPU time is process-wide, so a stage includes the work of the pool threads it
+    starts. Counters and skips may be recorded from any thread. With profile=True,
+    code inside profiled() is also captured with cProfile (calling thread only).
+    """
+    
+    def __init__(self, profile=False):
+        self.started = datetime.now()
+        self.stages = {}  # name -> {'wall_s', 'cpu_s', 'calls'}, in first-entered order
+        self.counters = {}
+        self.skipped = {}  # (path, counter) -> reason
+        self.profiler = cProfile.Profile() if profile else None
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                entry = self.stages.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0})
+                entry['wall_s'] += wall
+                entry['cpu_s'] += cpu
+                entry['calls'] += 1
+    
+    @contextmanager
+    def profiled(self):
+        if self.profiler is None:
+            yield
+            return
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+    
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+    
+    def skip(self, path, reason, counter='files_skipped'):
+        """Record a file left out of the run, with a reason starting with its category.
+        
+        A file skipped again under the same counter only has its reason updated.
+        """
+        with self._lock:
+            if (path, counter) not in self.skipped:
+                self.counters[counter] = self.counters.get(counter, 0) + 1
+            self.skipped[path, counter] = reason
+    
+    def skipped_files(self):
+        """(path, reason) of every skipped file."""
+        with self._lock:
+            return [(path, reason) for (path, _), reason in self.skipped.items()]
+    
+    def skip_reasons(self):
+        """{category: count} of the skipped files; the category is the reason up to its first colon."""
+        reasons = {}
+        for _, reason in self.skipped_files():
+            category = reason.split(':', 1)[0]
+            reasons[category] = reasons.get(category, 0) + 1
+        return reasons
+    
+    def summary(self):
+        """One-line summary of stage times and the main counters, for status bars and consoles."""
+        parts = [f"{name} {entry['wall_s']:.2f}s" for name, entry in self.stages.items()]
+        parts += [f"{self.counters[key]:,} {label}" for key, label in SUMMARY_COUNTERS if self.counters.get(key)]
+        return " | ".join(parts)
+    
+    def report(self, **fields):
+        """The run as a JSON-serialisable dict; fields (inputs, results) are added at the top level."""
+        with self._lock:
+            report = {
+                'version': RUN_REPORT_VERSION,
+                'started': self.started.isoformat(timespec='seconds'),
+                'finished': datetime.now().isoformat(timespec='seconds'),
+                **fields,
+                'stages': {name: {'wall_s': round(entry['wall_s'], 6), 'cpu_s': round(entry['cpu_s'], 6),
+                                  'calls': entry['calls']} for name, entry in self.stages.items()},
+                'counters': {name: round(value, 6) if isinstance(value, float) else value
+                             for name, value in self.counters.items()},
+            }
+        report['skip_reasons'] = self.skip_reasons()
+        report['skipped'] = [{'file': path, 'reason': reason} for path, reason in self.skipped_files()]
+        return report
+    
+    def write_report(self, path, **fields):
+        """Write report() to path: pretty JSON, or one appended line when path ends in .jsonl.
+        
+        With profiling on, the cProfile stats are saved next to it as <path>.prof and the
+        functions with the most cumulative time are listed in the report.
+        """
+        report = self.report(**fields)
+        if self.profiler is not None:
+            profile_file = os.path.splitext(path)[0] + '.prof'
+            self.profiler.dump_stats(profile_file)
+            stats = pstats.Stats(self.profiler)
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+            report['profile'] = {
+                'file': profile_file,
+                'top_cumulative': [{'function': f"{filename}:{line}({name})", 'calls': calls,
+                                    'tottime_s': round(tottime, 6), 'cumtime_s': round(cumtime, 6)}
+                                   for (filename, line, name), (_, calls, tottime, cumtime, _) in top],
+            }
+        if path.lower().endswith('.jsonl'):
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report, default=str) + '\n')
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, default=str)
+        return path
+
+def run_report_path(output_file):
+    return os.path.splitext(output_file)[0] + '_run_report.json'
+
+LOG_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.photo_matcher', 'log_cache')
+LOG_CACHE_VERSION = 2  # Bump when reading or time parsing changes what load_log() returns
+LOG_CACHE_MAX_FILES = 20
+REQUIRED_LOG_COLUMNS = ['Time', 'Camera']
+
+def _wanted_columns(header, columns):
+    """Header names to load: all of them, or Time, Camera and the requested extras in file order."""
+    if columns is None:
+        return list(header)
+    wanted = set(REQUIRED_LOG_COLUMNS) | set(columns)
+    return [name for name in header if name in wanted]
+
+def _dedup_header(header):
+    """Rename repeated column names the way pandas does: Lat, Lat.1, Lat.2, ...
+    
+    Names already in the header are skipped, so ['Lat', 'Lat', 'Lat.1'] becomes
+    ['Lat', 'Lat.2', 'Lat.1'].
+    """
+    names = list(header)
+    counts = {}
+    for i, name in enumerate(header):
+        base, count = name, counts.get(name, 0)
+        while count > 0:
+            counts[base] = count + 1
+            name = f"{base}.{count}"
+            count = count + 1 if name in names else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+def read_xlsx_columns(xlsx_file, columns=None):
+    """Read the first sheet of an XLSX log, keeping only Time, Camera and the given columns.
+    
+    Uses the calamine engine when python-calamine is installed and pandas is 2.2 or
+    newer (the first to support it); otherwise rows are streamed from openpyxl in
+    read-only mode and only the wanted cells are kept.
+    Rows with none of the wanted cells filled are dropped. columns=None keeps every column.
+    Repeated header names are renamed as pandas does (Lat, Lat.1).
+    """
+    pandas_version = tuple(int(part) for part in re.findall(r'\d+', pd.__version__)[:2])
+    if pandas_version >= (2, 2) and importlib.util.find_spec('python_calamine') is not None:
+        df = pd.read_excel(xlsx_file, sheet_name=0, engine='calamine',
+                           usecols=None if columns is None else lambda name: name in _wanted_columns([name], columns))
+        return df.dropna(how='all').reset_index(drop=True)
+    
+    from openpyxl import load_workbook
+    workbook = load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = _dedup_header([str(name) if name is not None else f"Unnamed: {i}"
+                                for i, name in enumerate(next(rows, ()))])
+        names = _wanted_columns(header, columns)
+        wanted = set(names)
+        positions = [i for i, name in enumerate(header) if name in wanted]
+        data = [[] for _ in names]
+        for row in rows:
+            values = [row[i] if i < len(row) else None for i in positions]
+            if all(v is None for v in values):
+                continue
+            for column, value in zip(data, values):
+                # Same as pandas: whole-number floats come back as ints
+                column.append(int(value) if isinstance(value, float) and value.is_integer() else value)
+    finally:
+        workbook.close()
+    return pd.DataFrame(dict(zip(names, data)), columns=names)
+
+def read_log_table(log_file, columns=None):
+    """Read a log from XLSX, CSV or Parquet (by extension) without any parsing."""
+    ext = os.path.splitext(log_file)[1].lower()
+    if ext == '.csv':
+        usecols = None if columns is None else lambda name: name in _wanted_columns([name], columns)
+        return pd.read_csv(log_file, usecols=usecols)
+    if ext in ('.parquet', '.pq'):
+        if columns is None:
+            return pd.read_parquet(log_file)
+        import pyarrow.parquet
+        header = pyarrow.parquet.read_schema(log_file).names
+        return pd.read_parquet(log_file, columns=_wanted_columns(header, columns))
+    return read_xlsx_columns(log_file, columns)
+
+def log_cache_path(log_file, columns=None, cache_dir=None):
+    """Cache file of a log: keyed by its content, the loaded columns and LOG_CACHE_VERSION."""
+    digest = hashlib.sha1(f"{LOG_CACHE_VERSION}|{columns and sorted(columns)}|".encode('utf-8'))
+    with open(log_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return os.path.join(cache_dir or LOG_CACHE_DIR, digest.hexdigest() + '.pkl')
+
+def clear_log_cache(cache_dir=None):
+    """Delete every cached log; returns the number of files removed."""
+    cache_dir = cache_dir or LOG_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return 0
+    paths = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.pkl')]
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+def _save_log_cache(df, path):
+    """Write the parsed log atomically and keep only the LOG_CACHE_MAX_FILES newest entries."""
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    entries = sorted((os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.pkl')),
+                     key=os.path.getmtime, reverse=True)
+    for old in entries[LOG_CACHE_MAX_FILES:]:
+        os.remove(old)
+
+def load_log(xlsx_file, camera_map, task=None, columns=None, use_cache=True, cache_dir=None, metrics=None):
+    """Read the log, parse its Time column and validate its Camera column.
+    
+    xlsx_file may also be a .csv or .parquet log. columns limits loading to Time,
+    Camera and those columns (None loads them all). The parsed table is cached under
+    LOG_CACHE_DIR by file content, so reopening an unchanged log skips reading and
+    time parsing altogether. Reading and time parsing are timed as separate stages
+    in metrics.
+    """
+    task = task or TaskProgress()
+    metrics = metrics or RunMetrics()
+    cache_path = log_cache_path(xlsx_file, columns, cache_dir) if use_cache else None
+    df = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with metrics.stage('read_log'):
+                df = pd.read_pickle(cache_path)
+            os.utime(cache_path)
+            metrics.count('log_cache_hits')
+        except Exception:
+            df = None  # Unreadable entry: read the log again and overwrite it
+    
+    if df is None:
+        task.report(0, 1, f"Reading {os.path.splitext(xlsx_file)[1].lstrip('.').upper() or 'log'}...")
+        with metrics.stage('read_log'):
+            df = read_log_table(xlsx_file, columns)
+        if 'Time' not in df.columns or 'Camera' not in df.columns:
+            raise ValueError("Column 'Time' or 'Camera' not found in the log file.")
+        
+        # Strip whitespace from Camera column
+        df['Camera'] = df['Camera'].astype(str).str.strip()
+        
+        task.check_cancelled()
+        task.report(0, 1, "Parsing times...")
+        with metrics.stage('parse_times'):
+            df['Time'], df['Parse_Error'] = parse_time_column(df['Time'])
+            df.attrs['time_zone'] = df['Time'].attrs.get('time_zone')
+        if cache_path:
+            try:
+                _save_log_cache(df, cache_path)
+            except OSError:
+                pass  # Caching is an optimisation only
+    metrics.count('log_rows', len(df))
+    metrics.count('parse_errors', int((df['Parse_Error'] != '').sum()))
+    
+    cameras = df['Camera'].dropna().unique()
+    invalid_cameras = [cam for cam in cameras if cam not in camera_map]
+    if invalid_cameras:
+        raise ValueError(f"Unknown cameras found: {invalid_cameras}. Expected PDP1, PDP2, PDP3.")
+    return df
+
+def scan_photo_dirs(dirs, workers=None, task=None, metrics=None):
+    """Read the EXIF times of every JPEG under each {color: directory}.
+    
+    Each directory is walked once, all of them concurrently, and files are handed
+    to the EXIF pool as they are discovered. Results are consumed per camera in
+    discovery order. Files without a usable EXIF time are recorded in metrics with
+    the reason, along with cache hits and the EXIF tag each time came from.
+    Returns ({color: PhotoCatalog}, photo counts, skipped counts).
+    """
+    task = task or TaskProgress()
+    metrics = metrics or RunMetrics()
+    task.report(0, 1, "Loading photos...")
+    
+    pool = ThreadPoolExecutor(max_workers=workers or default_worker_count())
+    stop = threading.Event()
+    discovered = {color: queue.Queue() for color in dirs}  # Futures in walk order, then None
+    caches = {color: ExifCache(photo_dir) for color, photo_dir in dirs.items()}
+    found = {color: 0 for color in dirs}
+    walk_errors = {}
+    
+    def discover(color, photo_dir):
+        try:
+            for root, file, st in iter_photo_files(photo_dir, stop):
+                discovered[color].put(pool.submit(read_photo_record, photo_dir, root, file, caches[color], st))
+                found[color] += 1
+        except RuntimeError:
+            pass  # Pool shut down after a cancel
+        except Exception as e:
+            walk_errors[color] = e
+        finally:
+            discovered[color].put(None)
+    
+    walkers = [threading.Thread(target=discover, args=(color, photo_dir), daemon=True)
+               for color, photo_dir in dirs.items()]
+    for walker in walkers:
+        walker.start()
+    
+    processed = 0
+    catalogs = {}
+    photo_count = {color: 0 for color in dirs}
+    skipped_count = {color: 0 for color in dirs}
+    try:
+        for color, photo_dir in dirs.items():
+            records = []
+            while True:
+                future = discovered[color].get()
+                if future is None:
+                    break
+                photo_time, subfolder, file, source, full_path = future.result()
+                if photo_time:
+                    records.append((photo_time, subfolder, file, source))
+                    photo_count[color] += 1
+                else:
+                    skipped_count[color] += 1
+                    metrics.skip(full_path, source or "no EXIF time")
+                
+                processed += 1
+                # Running estimate: until every walk is done, keep some headroom past what was found
+                total = sum(found.values())
+                if any(walker.is_alive() for walker in walkers):
+                    total = int(total * 1.1) + 1
+                task.report(processed, total)
+                task.check_cancelled()
+            if color in walk_errors:
+                raise walk_errors[color]
+            caches[color].save()
+            catalogs[color] = PhotoCatalog.from_records(photo_dir, records)
+            sources = np.bincount(catalogs[color].source_ids, minlength=len(PhotoCatalog.SOURCES))
+            for tag_name, n in zip(PhotoCatalog.SOURCES, sources):
+                metrics.count('exif_' + tag_name, int(n))
+            metrics.count('exif_fallback_tags', int(sources[1:].sum()))
+            metrics.count('exif_cache_hits', caches[color].hits)
+            metrics.count('exif_cache_misses', caches[color].misses)
+        metrics.count('files_scanned', processed)
+    finally:
+        stop.set()
+        for pending in discovered.values():
+            while not pending.empty():
+                future = pending.get_nowait()
+                if future is not None:
+                    future.cancel()
+        pool.shutdown()
+    return catalogs, photo_count, skipped_count
+
+WATCH_INTERVAL_S = 10.0
+WATCH_SETTLE_S = 2.0  # A new file must be this old, and unchanged since the last poll, before it is read
+
+class PhotoWatcher:
+    """Polls photo directories for JPEGs that were not there before.
+    
+    known holds the paths already accounted for (see watch_known_paths). Only
+    directories whose mtime changed since the last poll are listed again; the rest
+    cost one stat each. A new file is reported once its size and mtime are unchanged
+    between two polls and it is at least settle seconds old, so photos still being
+    copied off a card are not read half-written. Deleted files are ignored.
+    """
+    
+    def __init__(self, dirs, known=(), settle=WATCH_SETTLE_S):
+        self.dirs = dirs
+        self.settle = settle
+        self._known = set(known)
+        self._listed = {}  # directory -> (mtime_ns, subdirectories) as of its last listing
+        self._pending = {color: {} for color in dirs}  # path -> (size, mtime_ns) seen at the last poll
+    
+    def _new_files(self, photo_dir):
+        pending = [photo_dir]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._listed.pop(directory, None)
+                continue
+            listed = self._listed.get(directory)
+            if listed is not None and listed[0] == mtime_ns:
+                pending.extend(listed[1])
+                continue
+            subdirs = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir():
+                                subdirs.append(entry.path)
+                            elif (entry.name.lower().endswith(('.jpg', '.jpeg')) and entry.path not in self._known
+                                  and entry.is_file()):
+                                yield entry.path
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            # A listing in the same mtime tick as a later change would hide it, so recent ones are redone
+            recent = time.time_ns() - mtime_ns < self.settle * 1e9
+            self._listed[directory] = (None if recent else mtime_ns, subdirs)
+            pending.extend(subdirs)
+    
+    def poll(self):
+        """{color: [(directory, filename, stat)]} of the new files that have settled since the last poll."""
+        now = time.time()
+        ready = {}
+        for color, photo_dir in self.dirs.items():
+            waiting = self._pending[color]
+            for path in self._new_files(photo_dir):
+                waiting.setdefault(path, None)
+            ready[color] = []
+            for path, last in list(waiting.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del waiting[path]
+                    continue
+                signature = (st.st_size, st.st_mtime_ns)
+                if signature == last and now - st.st_mtime >= self.settle:
+                    ready[color].append((os.path.dirname(path), os.path.basename(path), st))
+                    self._known.add(path)
+                    del waiting[path]
+                else:
+                    waiting[path] = signature
+        return ready
+
+def watch_known_paths(catalogs, metrics=None):
+    """Paths a PhotoWatcher should not report: every catalogued photo and the files skipped
+    while scanning, except unreadable ones, which may have been caught mid-copy."""
+    known = set()
+    for catalog in catalogs.values():
+        known.update(catalog.paths())
+    if metrics is not None:
+        known.update(path for path, reason in metrics.skipped_files() if not reason.startswith('unreadable'))
+    return known
+
+def read_new_photos(photo_dir, files, workers=None, metrics=None):
+    """PhotoCatalog of (directory, filename, stat) files under photo_dir, as reported by PhotoWatcher.poll().
+    
+    Files without a usable EXIF time are recorded in metrics. The EXIF cache is not
+    used, since saving it after a partial scan would drop the other entries.
+    """
+    metrics = metrics or RunMetrics()
+    with ThreadPoolExecutor(max_workers=workers or default_worker_count()) as pool:
+        results = list(pool.map(lambda f: read_photo_record(photo_dir, f[0], f[1]), files))
+    records = []
+    for photo_time, subfolder, file, source, full_path in results:
+        if photo_time:
+            records.append((photo_time, subfolder, file, source))
+        else:
+            metrics.skip(full_path, source or "no EXIF time")
+    return PhotoCatalog.from_records(photo_dir, records)
+
+def assign_one_to_one(row_ns, photo_ns, threshold):
+    """Give each row at most one photo and each photo at most one row, all within threshold seconds.
+    
+    The assignment matches as many rows as possible and, among those, minimises the
+    total time error. Since both sides are points on one time axis an optimal
+    assignment never crosses, so a dynamic program over the rows in time order only
+    has to look at the photos inside each row's threshold window: O(rows x window)
+    instead of a dense rows x photos cost matrix. photo_ns must be sorted; row_ns may
+    be in any order. Returns the photo index per row, -1 where the row stays unmatched.
+    """
+    row_ns = np.asarray(row_ns, dtype=np.int64)
+    photo_ns = np.asarray(photo_ns, dtype=np.int64)
+    assigned = np.full(len(row_ns), -1, dtype=np.int64)
+    if len(row_ns) == 0 or len(photo_ns) == 0:
+        return assigned
+    
+    order = np.argsort(row_ns, kind='stable')
+    times = row_ns[order]
+    tol_ns = int(round(threshold * 1e9))
+    los = np.searchsorted(photo_ns, times - tol_ns, side='left').tolist()
+    his = np.searchsorted(photo_ns, times + tol_ns, side='right').tolist()
+    times = times.tolist()
+    photos = photo_ns.tolist()
+    # Scores are exact ints: a match is worth more than any possible total error
+    match_value = len(times) * tol_ns + 1
+    
+    # best[j - lo] is the best score of the rows so far using only photos[:j], for j in
+    # [lo, hi]; it stays at tail for every j >= hi. choices[i][j - lo] is the photo row i
+    # takes in the best solution over photos[:j], or -1.
+    lo, hi, best, tail = 0, 0, [0], 0
+    choices = []
+    for i, t in enumerate(times):
+        prev_lo, prev_hi, prev_best, prev_tail = lo, hi, best, tail
+        lo, hi = los[i], his[i]
+        best, choice = [], []
+        running, running_k = None, -1
+        for j in range(lo, hi + 1):
+            prev = prev_best[j - prev_lo] if j <= prev_hi else prev_tail
+            if running is not None and running > prev:
+                best.append(running)
+                choice.append(running_k)
+            else:
+                best.append(prev)
+                choice.append(-1)
+            if j < hi:
+                score = prev + match_value - abs(photos[j] - t)
+                if running is None or score > running:
+                    running, running_k = score, j
+        tail = best[-1]
+        choices.append((lo, hi, choice))
+    
+    # Walk back from the full photo range
+    j = len(photos)
+    for i in range(len(times) - 1, -1, -1):
+        lo, hi, choice = choices[i]
+        j = min(j, hi)
+        if j >= lo and choice[j - lo] >= 0:
+            assigned[order[i]] = choice[j - lo]
+            j = choice[j - lo]
+    return assigned
+
+CLOCK_OFFSET_RANGE = 600.0  # Seconds searched either side of zero
+CLOCK_OFFSET_STEP = 1.0
+
+def estimate_clock_offset(gps_ns, photo_ns, tolerance, search_range=CLOCK_OFFSET_RANGE, step=CLOCK_OFFSET_STEP):
+    """Find the camera clock offset that lines the most GPS times up with a photo.
+    
+    Every candidate offset in [-search_range, search_range] is scored by the number of
+    rows with a photo within tolerance seconds, two binary searches per row. Ties go to
+    the smaller mean residual, then the smaller offset; the winner is refined to the
+    median residual of its matches. Returns (offset in seconds, matched rows).
+    """
+    gps_ns = np.asarray(gps_ns, dtype=np.int64)
+    photo_ns = np.asarray(photo_ns, dtype=np.int64)
+    if len(gps_ns) == 0 or len(photo_ns) == 0:
+        return 0.0, 0
+    
+    tol_ns = int(tolerance * 1e9)
+    candidates = np.arange(-search_range, search_range + step / 2, step)
+    candidates = candidates[np.argsort(np.abs(candidates), kind='stable')]
+    counts = np.empty(len(candidates), dtype=np.int64)
+    for i, offset in enumerate(candidates):
+        query = gps_ns + int(round(offset * 1e9))
+        hi = np.searchsorted(photo_ns, query + tol_ns, side='right')
+        lo = np.searchsorted(photo_ns, query - tol_ns, side='left')
+        counts[i] = np.count_nonzero(hi > lo)
+    if counts.max() == 0:
+        return 0.0, 0
+    
+    def residuals(offset):
+        query = gps_ns + int(round(offset * 1e9))
+        best, _ = nearest_indices(photo_ns, query)
+        residual = (photo_ns[best] - query) / 1e9
+        return residual[np.abs(residual) <= tolerance]
+    
+    tied = candidates[counts == counts.max()]
+    offset = min(tied, key=lambda o: np.abs(residuals(o)).mean())
+    within = residuals(offset)
+    refined = offset + float(np.median(within))
+    if len(residuals(refined)) >= len(within):
+        offset = refined
+    return round(float(offset), 3) + 0.0, len(residuals(offset))
+
+def estimate_clock_offsets(df, catalogs, camera_map, threshold=0.0, search_range=CLOCK_OFFSET_RANGE,
+                           step=CLOCK_OFFSET_STEP, task=None):
+    """Estimate a clock offset per camera color; see estimate_clock_offset().
+    
+    Rows count as matched within max(threshold, step) seconds. Returns {color: (offset, matched rows)}.
+    """
+    task = task or TaskProgress()
+    row_colors = df['Camera'].astype(str).str.strip().map(camera_map)
+    valid_time = df['Time'].notna()
+    offsets = {}
+    for i, (color, catalog) in enumerate(catalogs.items()):
+        task.check_cancelled()
+        task.report(i, len(catalogs), f"Estimating {color} clock offset...")
+        rows = df.index[(row_colors == color) & valid_time]
+        gps_ns = df.loc[rows, 'Time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        offsets[color] = estimate_clock_offset(gps_ns, catalog.times, max(threshold, step), search_range, step)
+    task.report(len(catalogs), len(catalogs))
+    return offsets
+
+def nearest_photos(df, catalogs, camera_map, task=None, offsets=None, one_to_one=None):
+    """Nearest selected photo of every row, independent of any threshold.
+    
+    catalogs maps each color to the PhotoCatalog of its selected photos. offsets
+    optionally maps colors to camera clock offsets in seconds (camera minus GPS time),
+    which are applied before matching and recorded in a Clock_Offset_s column. With
+    one_to_one set to a threshold, photos come from assign_one_to_one() instead, so no
+    photo is given to two rows. Returns a DataFrame on df's index with Subfolder,
+    Filename and Match_Offset_s (photo time minus corrected row time in seconds, NaN
+    where the row has no candidate photo).
+    """
+    task = task or TaskProgress()
+    nearest = pd.DataFrame({'Subfolder': '', 'Filename': '', 'Match_Offset_s': np.nan}, index=df.index)
+    if offsets is not None:
+        nearest['Clock_Offset_s'] = 0.0
+    
+    # Resolve all rows of a camera at once against its sorted time index
+    row_colors = df['Camera'].astype(str).str.strip().map(camera_map)
+    valid_time = df['Time'].notna()
+    done = 0
+    for color, catalog in catalogs.items():
+        task.check_cancelled()
+        rows = df.index[(row_colors == color) & valid_time]
+        if len(rows) and len(catalog):
+            gps_ns = df.loc[rows, 'Time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            if offsets is not None:
+                offset = offsets.get(color, 0.0)
+                nearest.loc[rows, 'Clock_Offset_s'] = offset
+                gps_ns = gps_ns + int(round(offset * 1e9))
+            matched = rows
+            if one_to_one is None:
+                best, _ = nearest_indices(catalog.times, gps_ns)
+            else:
+                best = assign_one_to_one(gps_ns, catalog.times, one_to_one)
+                assigned = best >= 0
+                matched, gps_ns, best = rows[assigned], gps_ns[assigned], best[assigned]
+            nearest.loc[matched, 'Subfolder'] = catalog.subfolder_array(best)
+            nearest.loc[matched, 'Filename'] = catalog.filenames[best]
+            nearest.loc[matched, 'Match_Offset_s'] = (catalog.times[best] - gps_ns) / 1e9
+        done += len(rows)
+        task.report(done, len(df))
+    return nearest
+
+def apply_threshold(df, nearest, threshold):
+    """Fill df's Subfolder/Filename from nearest_photos() where |offset| <= threshold; returns the match count.
+    
+    Match_Distance_s keeps every row's distance to its nearest photo for all-rows exports;
+    matched_rows() leaves it out.
+    """
+    within = nearest['Match_Offset_s'].abs() <= threshold
+    df['Subfolder'] = nearest['Subfolder'].where(within, '')
+    df['Filename'] = nearest['Filename'].where(within, '')
+    df['Match_Distance_s'] = nearest['Match_Offset_s'].abs()
+    if 'Clock_Offset_s' in nearest:
+        df['Clock_Offset_s'] = nearest['Clock_Offset_s']
+    else:
+        df.drop(columns='Clock_Offset_s', errors='ignore', inplace=True)
+    return int(within.sum())
+
+def matched_rows(df, distances=False):
+    """Copy of the matched rows of a df filled by match_log(), as exported.
+    
+    distances=True keeps their Match_Distance_s (see write_gps_tags).
+    """
+    rows = df[df['Filename'] != '']
+    return rows if distances else rows.drop(columns='Match_Distance_s', errors='ignore')
+
+def view_rows(df, rows=None, camera=None, max_distance=None, contains=None, sort_by=None, ascending=True):
+    """Positions of the rows of df to show, filtered and sorted on whole columns at once.
+    
+    rows limits the candidates to those positions (default: every row). camera keeps
+    rows with that Camera value, max_distance those with Match_Distance_s at most that
+    many seconds, and contains those whose Filename contains the text (ignoring case).
+    sort_by names a column to sort on; the sort is stable and puts missing values last.
+    """
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+    keep = np.ones(len(rows), dtype=bool)
+    if camera:
+        keep &= df['Camera'].iloc[rows].astype(str).str.strip().to_numpy() == camera
+    if max_distance is not None:
+        keep &= df['Match_Distance_s'].to_numpy(dtype=float)[rows] <= max_distance
+    if contains:
+        keep &= df['Filename'].iloc[rows].astype(str).str.contains(contains, case=False, regex=False).to_numpy(dtype=bool)
+    rows = rows[keep]
+    if sort_by is not None:
+        values = df[sort_by].iloc[rows].reset_index(drop=True)
+        try:
+            order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index
+        except TypeError:  # Mixed types, e.g. numbers and text in one log column
+            order = values.astype(str).sort_values(ascending=ascending, kind='stable').index
+        rows = rows[order.to_numpy()]
+    return rows
+
+def matches_at(df, nearest, threshold):
+    """Copy of the rows of df matched at threshold, with Subfolder/Filename filled in."""
+    within = nearest['Match_Offset_s'].abs() <= threshold
+    matched = df[within].drop(columns='Match_Distance_s', errors='ignore')
+    matched['Subfolder'] = nearest.loc[within, 'Subfolder']
+    matched['Filename'] = nearest.loc[within, 'Filename']
+    if 'Clock_Offset_s' in nearest:
+        matched['Clock_Offset_s'] = nearest.loc[within, 'Clock_Offset_s']
+    return matched
+
+def match_log(df, catalogs, camera_map, threshold, task=None, offsets=None, one_to_one=False):
+    """Fill df's Subfolder/Filename columns with the nearest selected photo within threshold seconds.
+    
+    catalogs maps each color to the PhotoCatalog of its selected photos; offsets are
+    per-color clock offsets as in nearest_photos(). With one_to_one every photo is used
+    at most once (see assign_one_to_one). Returns the number of matched rows.
+    """
+    nearest = nearest_photos(df, catalogs, camera_map, task, offsets, threshold if one_to_one else None)
+    return apply_threshold(df, nearest, threshold)
+
+def _union_of_ranges(starts, ends):
+    """Sorted indices covered by the ranges [start, end) whose starts and ends are both non-decreasing."""
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return np.zeros(0, dtype=np.int64)
+    first = np.r_[True, starts[1:] > ends[:-1]]  # Ranges that do not overlap the one before
+    group_starts = starts[first]
+    group_ends = ends[np.r_[first[1:], True]]
+    lengths = group_ends - group_starts
+    return np.arange(lengths.sum()) + np.repeat(group_starts - np.cumsum(lengths) + lengths, lengths)
+
+class IncrementalMatcher:
+    """Keeps a match_log() result in df current while new photos are added.
+    
+    df must already be matched with the same catalogs and settings. Each camera's
+    rows are sorted by corrected time once. A new photo can only become the nearest
+    photo of rows lying between the old photos on either side of it, so only those
+    rows are matched again and the cost follows the new photos, not the session.
+    One-to-one assignments are global, so with one_to_one all rows of the camera
+    are assigned again instead.
+    """
+    
+    def __init__(self, df, catalogs, camera_map, threshold, offsets=None, one_to_one=False):
+        self.df = df
+        self.catalogs = dict(catalogs)
+        self.camera_map = camera_map
+        self.threshold = threshold
+        self.offsets = offsets
+        self.one_to_one = one_to_one
+        row_colors = df['Camera'].astype(str).str.strip().map(camera_map)
+        valid_time = df['Time'].notna()
+        self._rows = {}  # color -> (row labels, corrected int64 times), sorted by time
+        for color in self.catalogs:
+            rows = df.index[(row_colors == color) & valid_time]
+            gps_ns = df.loc[rows, 'Time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            if offsets is not None:
+                gps_ns = gps_ns + int(round(offsets.get(color, 0.0) * 1e9))
+            order = np.argsort(gps_ns, kind='stable')
+            self._rows[color] = (rows[order], gps_ns[order])
+    
+    def affected_rows(self, color, old, positions):
+        """Labels of the rows of color whose nearest photo may differ after inserting photos at positions."""
+        rows, gps_ns = self._rows[color]
+        if self.one_to_one or not len(old):
+            return rows
+        at = positions - np.arange(len(positions))  # Insertion points among the old photos
+        low = np.where(at > 0, old.times[np.maximum(at - 1, 0)], np.iinfo(np.int64).min)
+        high = np.where(at < len(old), old.times[np.minimum(at, len(old) - 1)], np.iinfo(np.int64).max)
+        starts = np.searchsorted(gps_ns, low, side='left')
+        ends = np.searchsorted(gps_ns, high, side='right')
+        return rows[_union_of_ranges(starts, ends)]
+    
+    def add_photos(self, color, photos):
+        """Merge a catalog of new photos of one camera and re-match the rows they can affect.
+        
+        Returns (merged catalog, positions of the new photos in it, labels of the rows
+        whose matched photo changed).
+        """
+        old = self.catalogs[color]
+        merged, positions = old.insert(photos)
+        self.catalogs[color] = merged
+        affected = self.affected_rows(color, old, positions) if len(photos) else self._rows[color][0][:0]
+        if not len(affected):
+            return merged, positions, affected
+        
+        nearest = nearest_photos(self.df.loc[affected], {color: merged}, self.camera_map, offsets=self.offsets,
+                                 one_to_one=self.threshold if self.one_to_one else None)
+        within = nearest['Match_Offset_s'].abs() <= self.threshold
+        subfolders = nearest['Subfolder'].where(within, '')
+        filenames = nearest['Filename'].where(within, '')
+        changed = ((self.df.loc[affected, 'Subfolder'] != subfolders) |
+                   (self.df.loc[affected, 'Filename'] != filenames)).to_numpy()
+        self.df.loc[affected, 'Subfolder'] = subfolders
+        self.df.loc[affected, 'Filename'] = filenames
+        self.df.loc[affected, 'Match_Distance_s'] = nearest['Match_Offset_s'].abs()
+        return merged, positions, affected[changed]
+
+def parse_thresholds(text):
+    """Parse a comma/space separated list of thresholds in seconds into sorted unique floats."""
+    values = sorted({float(part) for part in re.split(r'[,\s]+', text.strip()) if part})
+    if not values or any(v < 0 for v in values):
+        raise ValueError("Thresholds must be a list of non-negative numbers, e.g. 0, 5, 10, 30, 60.")
+    return values
+
+def threshold_sweep(nearest, thresholds):
+    """Match-rate-vs-threshold table from one nearest_photos() result."""
+    offsets = nearest['Match_Offset_s'].abs().to_numpy()
+    offsets = np.sort(offsets[~np.isnan(offsets)])
+    thresholds = np.asarray(thresholds, dtype=float)
+    matched = np.searchsorted(offsets, thresholds, side='right')
+    rows = len(nearest)
+    return pd.DataFrame({
+        'Threshold_s': thresholds,
+        'Matched': matched,
+        'Unmatched': rows - matched,
+        'Match_Rate': matched / rows if rows else np.zeros(len(thresholds)),
+    })
+
+def export_sweep(df, nearest, thresholds, xlsx_file, output_base=None, workbook=False, fmt=None):
+    """Export the matches of every threshold; returns the written paths.
+    
+    By default each threshold gets its own file named as a normal export (thresholds
+    without matches are skipped), in fmt if given. With workbook=True a single
+    <base>_threshold_sweep.xlsx gets one sheet per threshold plus a Summary sheet.
+    """
+    if not workbook:
+        paths = []
+        for threshold in thresholds:
+            matched = matches_at(df, nearest, threshold)
+            if len(matched):
+                paths.append(export_matches(matched, default_output_path(xlsx_file, output_base, threshold, fmt)))
+        return paths
+    
+    path = export_path(xlsx_file, output_base, '_threshold_sweep', 'xlsx')
+    sheets = [('Summary', threshold_sweep(nearest, thresholds))]
+    sheets += [(f"threshold_{threshold}s", matches_at(df, nearest, threshold)) for threshold in thresholds]
+    return [write_xlsx(path, sheets)]
+
+MAX_FIX_GAP = 60.0  # Seconds between bracketing fixes beyond which a position is flagged
+
+def interpolate_photo_positions(df, catalogs, camera_map, max_gap=MAX_FIX_GAP, offsets=None, task=None):
+    """Interpolate the log's numeric columns (latitude, longitude, ...) at every photo's time.
+    
+    Each photo is placed between the two log rows of its camera that bracket it, with
+    one searchsorted per camera and np.interp per column. Only rows with a fix (both
+    latitude and longitude, when the log has them) count, so Gap_s and max_gap measure
+    the gap the position is actually interpolated across; any other missing values are
+    skipped per column. offsets are per-color clock offsets as in nearest_photos().
+    Gap_s is the time between the bracketing fixes; Position_Flag is 'ok', 'gap' (more
+    than max_gap seconds) or 'outside' (before the first or after the last fix, values
+    left empty). Returns one row per photo.
+    """
+    task = task or TaskProgress()
+    value_columns = [col for col in df.select_dtypes('number').columns
+                     if col not in ('Match_Offset_s', 'Match_Distance_s', 'Clock_Offset_s')]
+    try:
+        has_fix = df[list(find_position_columns(df.columns))].notna().all(axis=1)
+    except ValueError:  # No position columns: every timed row brackets
+        has_fix = pd.Series(True, index=df.index)
+    row_colors = df['Camera'].astype(str).str.strip().map(camera_map)
+    codes = {color: cam for cam, color in camera_map.items()}
+    
+    tables = []
+    done, total = 0, sum(len(catalog) for catalog in catalogs.values())
+    for color, catalog in catalogs.items():
+        task.check_cancelled()
+        log = df[(row_colors == color) & df['Time'].notna() & has_fix].sort_values('Time', kind='stable')
+        log_ns = log['Time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        offset = (offsets or {}).get(color, 0.0)
+        photo_ns = catalog.times - int(round(offset * 1e9))  # Photo times on the GPS clock
+        
+        table = pd.DataFrame({
+            'Camera': codes.get(color, color),
+            'Subfolder': catalog.subfolder_array(),
+            'Filename': catalog.filenames,
+            'Photo_Time': catalog.times.astype('datetime64[ns]'),
+            'GPS_Time': photo_ns.astype('datetime64[ns]'),
+        })
+        if len(log_ns):
+            before = np.searchsorted(log_ns, photo_ns, side='right') - 1
+            after = np.searchsorted(log_ns, photo_ns, side='left')
+            outside = (before < 0) | (after >= len(log_ns))
+            gap = (log_ns[np.minimum(after, len(log_ns) - 1)] - log_ns[np.maximum(before, 0)]) / 1e9
+            gap[outside] = np.nan
+        else:
+            outside = np.ones(len(photo_ns), dtype=bool)
+            gap = np.full(len(photo_ns), np.nan)
+        
+        for col in value_columns:
+            known = log[col].notna().to_numpy()
+            if known.any():
+                values = np.interp(photo_ns, log_ns[known], log[col].to_numpy(dtype=float)[known])
+            else:
+                values = np.full(len(photo_ns), np.nan)
+            values[outside] = np.nan
+            table[col] = values
+        table['Gap_s'] = gap
+        table['Position_Flag'] = np.where(outside, 'outside', np.where(gap > max_gap, 'gap', 'ok'))
+        if offsets is not None:
+            table['Clock_Offset_s'] = offset
+        tables.append(table)
+        done += len(catalog)
+        task.report(done, total)
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+def default_positions_path(xlsx_file, output_base, fmt=None):
+    """Per-photo export path next to the XLSX: <base>_photo_positions.xlsx."""
+    return export_path(xlsx_file, output_base, '_photo_positions', fmt)
+
+def default_output_path(xlsx_file, output_base, threshold, fmt=None, all_rows=False):
+    """Export path next to the XLSX: <base>_threshold_<threshold>s[_all].<fmt, default xlsx>."""
+    return export_path(xlsx_file, output_base, f"_threshold_{threshold}s{'_all' if all_rows else ''}", fmt)
+
+def export_path(xlsx_file, output_base, suffix, fmt=None):
+    """Export path next to the XLSX: <base><suffix>.<fmt, default xlsx>.
+    
+    The base is output_base (its extension picks the format when fmt is not given),
+    or else the XLSX's own name.
+    """
+    input_base, input_ext = os.path.splitext(os.path.basename(xlsx_file))
+    base = output_base.strip() if output_base and output_base.strip() else input_base
+    base, ext = os.path.splitext(base)
+    ext = '.' + fmt if fmt else ext or '.xlsx'
+    return os.path.join(os.path.dirname(xlsx_file), f"{base}{suffix}{ext}")
+
+def default_watch_path(xlsx_file, output_base, threshold):
+    return os.path.splitext(default_output_path(xlsx_file, output_base, threshold))[0] + '_watch.csv'
+
+def append_watch_rows(df, rows, path, start=False):
+    """Append the rows of df at the given labels to a watch mode CSV, with their label in a Row column.
+    
+    A row is appended again whenever its match changes, so the last line for a Row
+    is current. start=True replaces the file and writes the header first.
+    """
+    table = df.loc[rows].drop(columns='Match_Distance_s', errors='ignore')
+    table.insert(0, 'Row', table.index)
+    table.insert(1, 'Updated', datetime.now().isoformat(timespec='seconds'))
+    table.to_csv(path, mode='w' if start else 'a', header=start, index=False)
+    return len(table)
+
+EXPORT_FORMATS = ['xlsx', 'csv', 'parquet']
+EXPORT_CHUNK_ROWS = 20000  # Rows converted and written per step, bounding memory and progress latency
+
+def _export_chunks(df):
+    """Yield lists of row tuples with missing values as None, EXPORT_CHUNK_ROWS at a time."""
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield list(chunk.itertuples(index=False, name=None))
+
+def write_xlsx(path, sheets, task=None):
+    """Write [(sheet name, DataFrame)] with openpyxl's write-only (streaming) workbook.
+    
+    Rows go out chunk by chunk, so memory stays flat however large the tables are.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    task = task or TaskProgress()
+    total = sum(len(df) for _, df in sheets)
+    done = 0
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+    for name, df in sheets:
+        sheet = workbook.create_sheet(title=name[:31])
+        header = []
+        for column in df.columns:
+            cell = WriteOnlyCell(sheet, value=str(column))
+            cell.font = bold
+            header.append(cell)
+        sheet.append(header)
+        for rows in _export_chunks(df):
+            for row in rows:
+                sheet.append(row)
+            done += len(rows)
+            task.report(done, total, "Exporting...")
+            task.check_cancelled()
+    workbook.save(path)
+    return path
+
+def _default_file_mode(path):
+    """Permissions a plain open() would give path: the existing file's, else 0o666 less the umask."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def export_matches(matched_df, output_file, task=None):
+    """Export a table as XLSX, CSV or Parquet, chosen by output_file's extension."""
+    task = task or TaskProgress()
+    ext = os.path.splitext(output_file)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        task.report(0, 1, "Exporting...")
+        matched_df.to_parquet(output_file, index=False)
+    elif ext == '.csv':
+        # A cancelled export must not leave half a file behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_file)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for start in range(0, max(len(matched_df), 1), EXPORT_CHUNK_ROWS):
+                    matched_df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(f, header=start == 0, index=False)
+                    task.report(min(start + EXPORT_CHUNK_ROWS, len(matched_df)), len(matched_df), "Exporting...")
+                    task.check_cancelled()
+            os.chmod(tmp_path, _default_file_mode(output_file))  # mkstemp creates the file owner-only
+            os.replace(tmp_path, output_file)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    else:
+        write_xlsx(output_file, [('Sheet1', matched_df)], task)
+    return output_file
+
+# GPS tagging: the GPS IFD is written into the existing APP1 segment, the image data is copied as is
+GPS_IFD_POINTER = _TAG_IDS['GPSInfo']
+_EMPTY_TIFF = b'II*\x00\x08\x00\x00\x00' + b'\x00\x00' + b'\x00\x00\x00\x00'
+LAT_COLUMNS = ('lat', 'latitude', 'gps_lat', 'gpslatitude')
+LON_COLUMNS = ('lon', 'lng', 'long', 'longitude', 'gps_lon', 'gpslongitude')
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+_TIFF_POINTER_TAGS = {EXIF_IFD_POINTER, 0x014A, 0xA005}  # Sub-IFD pointers, stored inline as offsets
+
+def find_position_columns(columns):
+    """Return the (latitude, longitude) column names of a log, matched case-insensitively."""
+    lower = {str(col).strip().lower(): col for col in columns}
+    lat = next((lower[name] for name in LAT_COLUMNS if name in lower), None)
+    lon = next((lower[name] for name in LON_COLUMNS if name in lower), None)
+    if lat is None or lon is None:
+        raise ValueError("No latitude/longitude columns found (expected e.g. 'Lat' and 'Lon').")
+    return lat, lon
+
+def _jpeg_header(data):
+    """Return ([(marker, start, end)] of the segments before the image data, start of the image data)."""
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("Not a JPEG file")
+    segments = []
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError("Corrupt JPEG marker")
+        code = data[pos + 1]
+        if code == 0xFF:  # Fill byte before the real marker
+            pos += 1
+            continue
+        if code in (0xDA, 0xD9):
+            return segments, pos
+        if code == 0x01 or 0xD0 <= code <= 0xD7:  # Markers without a length
+            pos += 2
+            continue
+        (length,) = struct.unpack_from('>H', data, pos + 2)
+        segments.append((code, pos, pos + 2 + length))
+        pos += 2 + length
+    raise ValueError("Truncated JPEG header")
+
+def _find_exif_segment(segments, data):
+    for code, start, end in segments:
+        if code == 0xE1 and data[start + 4:start + 10] == b'Exif\x00\x00':
+            return start, end
+    return None
+
+def _dms_rationals(value):
+    """Degrees as (d/1, m/1, s/10000) rationals, about 3 mm of resolution."""
+    total = int(round(abs(value) * 3600 * 10000))
+    degrees, rest = divmod(total, 3600 * 10000)
+    minutes, seconds = divmod(rest, 60 * 10000)
+    return [degrees, 1, minutes, 1, seconds, 10000]
+
+def _pack_ifd(entries, offset, endian):
+    """Pack [(tag, type, count, value bytes)] as an IFD at offset, followed by its out-of-line values."""
+    entries = sorted(entries)
+    data_pos = offset + 2 + 12 * len(entries) + 4
+    head = [struct.pack(endian + 'H', len(entries))]
+    tail = []
+    for tag, typ, count, value in entries:
+        if len(value) <= 4:
+            head.append(struct.pack(endian + 'HHI', tag, typ, count) + value.ljust(4, b'\x00'))
+        else:
+            head.append(struct.pack(endian + 'HHII', tag, typ, count, data_pos))
+            tail.append(value + b'\x00' * (len(value) % 2))
+            data_pos += len(tail[-1])
+    head.append(struct.pack(endian + 'I', 0))
+    return b''.join(head + tail)
+
+def _gps_entries(lat, lon, when, endian):
+    entries = [
+        (0x0000, 1, 4, bytes([2, 3, 0, 0])),  # GPSVersionID
+        (0x0001, 2, 2, b'N\x00' if lat >= 0 else b'S\x00'),
+        (0x0002, 5, 3, struct.pack(endian + '6I', *_dms_rationals(lat))),
+        (0x0003, 2, 2, b'E\x00' if lon >= 0 else b'W\x00'),
+        (0x0004, 5, 3, struct.pack(endian + '6I', *_dms_rationals(lon))),
+    ]
+    if when is not None:
+        millis = when.second * 1000 + when.microsecond // 1000
+        entries.append((0x0007, 5, 3, struct.pack(endian + '6I', when.hour, 1, when.minute, 1, millis, 1000)))
+        entries.append((0x001D, 2, 11, when.strftime('%Y:%m:%d').encode('ascii') + b'\x00'))
+    return entries
+
+def _ifd_end(tiff, offset, endian):
+    """End of the IFD at offset and its out-of-line values, as laid out by _pack_ifd()."""
+    (count,) = struct.unpack_from(endian + 'H', tiff, offset)
+    end = offset + 2 + 12 * count + 4
+    for i in range(count):
+        _, typ, n = struct.unpack_from(endian + 'HHI', tiff, offset + 2 + i * 12)
+        size = n * _TIFF_TYPE_SIZES.get(typ, 1)
+        if size > 4:
+            end += size + size % 2
+    return end
+
+def _appended_tail(tiff, endian, ifd0, raw, next_ifd):
+    """Offset of an IFD0 + GPS IFD appended by an earlier _tiff_with_gps(), or None.
+    
+    They are recognised by their layout: the GPS IFD directly follows IFD0 and ends
+    the block, and nothing IFD0 points to lies at or past IFD0. Both can then be
+    cut off and rebuilt, so tagging a photo again does not grow its EXIF.
+    """
+    gps_ifd = ifd0 + 2 + 12 * len(raw) + 4
+    offsets = [next_ifd]
+    has_gps = False
+    for entry in raw:
+        tag, typ, n, value = struct.unpack(endian + 'HHII', entry)
+        if tag == GPS_IFD_POINTER:
+            has_gps = value == gps_ifd
+        elif tag in _TIFF_POINTER_TAGS or n * _TIFF_TYPE_SIZES.get(typ, 1) > 4:
+            offsets.append(value)
+    if not has_gps or gps_ifd + 2 > len(tiff) or any(offset >= ifd0 for offset in offsets):
+        return None
+    try:
+        return ifd0 if _ifd_end(tiff, gps_ifd, endian) == len(tiff) else None
+    except struct.error:
+        return None
+
+def _tiff_with_gps(tiff, lat, lon, when):
+    """Return the TIFF block with a new GPS IFD.
+    
+    IFD0 is copied to the end of the block with the GPSInfo pointer added (or
+    replaced) and the header is pointed at the copy. Nothing else moves, so every
+    existing offset - sub-IFDs, maker notes, the thumbnail - stays valid. The first
+    write leaves the original IFD0 behind unused; later writes replace the copy and
+    GPS IFD they find at the end (see _appended_tail), so the block stops growing.
+    """
+    endian = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if endian is None:
+        raise ValueError("Unknown TIFF byte order in EXIF block")
+    magic, ifd0 = struct.unpack_from(endian + 'HI', tiff, 2)
+    if magic != 42:
+        raise ValueError("Bad TIFF header in EXIF block")
+    (count,) = struct.unpack_from(endian + 'H', tiff, ifd0)
+    raw = [tiff[ifd0 + 2 + i * 12:ifd0 + 14 + i * 12] for i in range(count)]
+    (next_ifd,) = struct.unpack_from(endian + 'I', tiff, ifd0 + 2 + count * 12)
+    entries = {struct.unpack_from(endian + 'H', entry)[0]: entry for entry in raw}
+    entries.pop(GPS_IFD_POINTER, None)
+    tail = _appended_tail(tiff, endian, ifd0, raw, next_ifd)
+    if tail is not None:
+        tiff = tiff[:tail]
+    
+    new_ifd0 = len(tiff) + len(tiff) % 2
+    gps_ifd = new_ifd0 + 2 + 12 * (len(entries) + 1) + 4
+    entries[GPS_IFD_POINTER] = struct.pack(endian + 'HHII', GPS_IFD_POINTER, 4, 1, gps_ifd)
+    ifd0_bytes = (struct.pack(endian + 'H', len(entries)) + b''.join(entries[tag] for tag in sorted(entries))
+                  + struct.pack(endian + 'I', next_ifd))
+    return b''.join([
+        tiff[:4], struct.pack(endian + 'I', new_ifd0), tiff[8:], b'\x00' * (len(tiff) % 2),
+        ifd0_bytes, _pack_ifd(_gps_entries(lat, lon, when, endian), gps_ifd, endian),
+    ])
+
+def set_jpeg_gps(data, lat, lon, when=None):
+    """Return the JPEG bytes with GPS latitude/longitude (and time stamp) in its EXIF.
+    
+    Only the Exif APP1 segment is rewritten (or a new one inserted after SOI/JFIF);
+    the compressed image data is copied byte for byte.
+    """
+    segments, _ = _jpeg_header(data)
+    exif = _find_exif_segment(segments, data)
+    if exif is not None:
+        start, end = exif
+        tiff = data[start + 10:end]
+    else:
+        start = end = 2
+        for code, seg_start, seg_end in segments:
+            if code != 0xE0 or seg_start != end:
+                break
+            start = end = seg_end  # Keep APP0 (JFIF) first
+        tiff = _EMPTY_TIFF
+    payload = b'Exif\x00\x00' + _tiff_with_gps(tiff, lat, lon, when)
+    if len(payload) + 2 > 0xFFFF:
+        raise ValueError("EXIF block would exceed the 64 KB APP1 limit")
+    return data[:start] + b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload + data[end:]
+
+def read_jpeg_gps(data):
+    """Return (lat, lon, time stamp string or None) from JPEG bytes, or None without GPS tags."""
+    segments, _ = _jpeg_header(data)
+    exif = _find_exif_segment(segments, data)
+    if exif is None:
+        return None
+    tiff = data[exif[0] + 10:exif[1]]
+    endian = {b'II': '<', b'MM': '>'}[tiff[:2]]
+    (ifd0,) = struct.unpack_from(endian + 'I', tiff, 4)
+    gps_ifd = _read_ifd_entries(tiff, ifd0, endian, {GPS_IFD_POINTER}).get(GPS_IFD_POINTER)
+    if gps_ifd is None:
+        return None
+    tags = _read_ifd_entries(tiff, gps_ifd, endian, {0x0001, 0x0002, 0x0003, 0x0004, 0x0007, 0x001D})
+    if 0x0002 not in tags or 0x0004 not in tags:
+        return None
+    def degrees(dms, ref, negative):
+        value = dms[0] + dms[1] / 60 + dms[2] / 3600
+        return -value if ref == negative else value
+    stamp = None
+    if 0x0007 in tags and 0x001D in tags:
+        h, m, sec = tags[0x0007]
+        stamp = f"{tags[0x001D]} {int(h):02d}:{int(m):02d}:{sec:06.3f}"
+    return degrees(tags[0x0002], tags.get(0x0001), 'S'), degrees(tags[0x0004], tags.get(0x0003), 'W'), stamp
+
+def _check_gps_bytes(original, written, lat, lon):
+    """Raise ValueError unless written carries the GPS position and original's image data unchanged."""
+    gps = read_jpeg_gps(written)
+    if gps is None or abs(gps[0] - lat) > 1e-6 or abs(gps[1] - lon) > 1e-6:
+        raise ValueError(f"Verification failed: read back {gps}, expected ({lat}, {lon})")
+    if original[_jpeg_header(original)[1]:] != written[_jpeg_header(written)[1]:]:
+        raise ValueError("Verification failed: image data changed")
+
+def write_photo_gps(source, target, lat, lon, when=None, dry_run=False, verify=True):
+    """Write GPS tags from source into target (which may be the same file).
+    
+    The new file is written next to the target and moved over it in one os.replace,
+    keeping the source's permissions and times; with verify it is read back first.
+    dry_run builds (and verifies) the new bytes without writing anything.
+    """
+    with open(source, 'rb') as f:
+        original = f.read()
+    updated = set_jpeg_gps(original, lat, lon, when)
+    if dry_run:
+        if verify:
+            _check_gps_bytes(original, updated, lat, lon)
+        return
+    
+    target_dir = os.path.dirname(os.path.abspath(target))
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix='.gps_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(updated)
+        if verify:
+            with open(tmp_path, 'rb') as f:
+                _check_gps_bytes(original, f.read(), lat, lon)
+        shutil.copystat(source, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def gps_utc_time(value, utc_offset=None, time_zone=None):
+    """A log time as the UTC datetime GPSTimeStamp/GPSDateStamp expect, or None if its zone is unknown.
+    
+    Times with a time zone are converted; naive log times need utc_offset, the log's
+    offset from UTC in hours (e.g. 10 for AEST), or time_zone, the zone they are in
+    (see parse_time_column), and give None without either.
+    """
+    if pd.isna(value):
+        return None
+    value = pd.Timestamp(value)
+    if value.tzinfo is None and utc_offset is None and time_zone is not None:
+        value = value.tz_localize(time_zone, ambiguous='NaT', nonexistent='NaT')
+        if pd.isna(value):
+            return None
+    if value.tzinfo is not None:
+        value = value.tz_convert('UTC').tz_localize(None)
+    elif utc_offset is None:
+        return None
+    else:
+        value = value - pd.Timedelta(hours=utc_offset)
+    return value.to_pydatetime(warn=False)
+
+def write_gps_tags(matched_df, dirs, camera_map, output_dir=None, dry_run=False, verify=True,
+                   workers=None, task=None, lat_col=None, lon_col=None, utc_offset=None):
+    """Write each matched row's position and time into its photo, across a thread pool.
+    
+    dirs maps camera colors to photo directories. Photos are changed in place, or
+    copied to output_dir/<color>/<subfolder>/<filename> when given. A photo matched by
+    several rows is written once, for the row with a position closest to it in time
+    (smallest Match_Distance_s, so pass matched_rows(df, distances=True); without that
+    column, the first such row). The GPS time stamp is in UTC, so it
+    is only written when the log's offset is known: utc_offset, or else the zone
+    load_log found in the log's times (see gps_utc_time). Returns a
+    per-photo report with a Status of 'written', 'dry run', 'skipped' or 'failed'.
+    """
+    task = task or TaskProgress()
+    if lat_col is None or lon_col is None:
+        lat_col, lon_col = find_position_columns(matched_df.columns)
+    
+    time_zone = matched_df.attrs.get('time_zone')
+    records = matched_df.to_dict('records')
+    if 'Match_Distance_s' in matched_df.columns:
+        order = np.argsort(matched_df['Match_Distance_s'].to_numpy(dtype=float), kind='stable')
+    else:
+        order = range(len(records))
+    
+    jobs, report = [], []
+    for row in records:
+        color = camera_map.get(str(row['Camera']).strip())
+        subfolder = row['Subfolder'] if isinstance(row['Subfolder'], str) else ''
+        source = os.path.join(dirs[color], subfolder, row['Filename'])
+        target = os.path.join(output_dir, color, subfolder, row['Filename']) if output_dir else source
+        report.append({'Source': source, 'Target': target, 'Latitude': row[lat_col], 'Longitude': row[lon_col],
+                       'Status': '', 'Error': ''})
+    seen = set()
+    for i in order:
+        entry = report[i]
+        if pd.isna(entry['Latitude']) or pd.isna(entry['Longitude']):
+            entry.update(Status='skipped', Error="Row has no position")
+        elif entry['Source'] in seen:
+            entry.update(Status='skipped', Error="Photo written for another row")
+        else:
+            seen.add(entry['Source'])
+            when = gps_utc_time(records[i]['Time'], utc_offset, time_zone)
+            jobs.append((entry, when))
+    
+    def run(entry, when):
+        write_photo_gps(entry['Source'], entry['Target'], float(entry['Latitude']), float(entry['Longitude']),
+                        when, dry_run, verify)
+    
+    with ThreadPoolExecutor(max_workers=workers or default_worker_count()) as pool:
+        futures = {pool.submit(run, entry, when): entry for entry, when in jobs}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                entry = futures[future]
+                try:
+                    future.result()
+                    entry['Status'] = 'dry run' if dry_run else 'written'
+                except Exception as e:
+                    entry.update(Status='failed', Error=f"{type(e).__name__}: {e}")
+                task.report(done, len(jobs))
+                task.check_cancelled()
+        except TaskCancelled:
+            for future in futures:
+                future.cancel()
+            raise
+    return pd.DataFrame(report, columns=['Source', 'Target', 'Latitude', 'Longitude', 'Status', 'Error'])
+
+def gps_report_path(output_file):
+    return os.path.splitext(output_file)[0] + '_gps_report.csv'
+
+def load_session(xlsx_file, dirs, selection_file=None, workers=None, camera_map=CAMERA_MAP, task=None,
+                 columns=None, metrics=None):
+    """Load the log and photos and apply a selection file (every photo when there is none).
+    
+    columns is passed on to load_log(). Returns (df, {color: PhotoCatalog of selected photos}, stats dict).
+    """
+    df, catalogs, selected, stats = load_session_catalogs(xlsx_file, dirs, selection_file, workers, camera_map, task,
+                                                          columns, metrics)
+    return df, selected, stats
+
+def load_session_catalogs(xlsx_file, dirs, selection_file=None, workers=None, camera_map=CAMERA_MAP, task=None,
+                          columns=None, metrics=None):
+    """load_session() that also returns every scanned photo: (df, all catalogs, selected catalogs, stats)."""
+    metrics = metrics or RunMetrics()
+    df = load_log(xlsx_file, camera_map, task, columns, metrics=metrics)
+    with metrics.stage('scan_photos'):
+        catalogs, photo_count, skipped_count = scan_photo_dirs(dirs, workers, task, metrics)
+    
+    with metrics.stage('select'):
+        selections = {color: PhotoSelection(catalog) for color, catalog in catalogs.items()}
+        if selection_file:
+            load_selection_session(selection_file, selections)
+        else:
+            for selection in selections.values():
+                selection.set_all(True)
+        selected = {color: catalogs[color].take(np.flatnonzero(selections[color].mask)) for color in catalogs}
+    stats = {
+        'rows': len(df),
+        'parse_errors': int((df['Parse_Error'] != '').sum()),
+        'photos': photo_count,
+        'skipped': skipped_count,
+        'selected': {color: selections[color].count() for color in catalogs},
+    }
+    return df, catalogs, selected, stats
+
+def session_clock_offsets(df, selected, camera_map, threshold, auto_offset, task, metrics=None):
+    """Per-color offsets for run_pipeline()/run_sweep(); None unless auto_offset is set."""
+    if not auto_offset:
+        return None
+    with (metrics or RunMetrics()).stage('clock_offsets'):
+        estimates = estimate_clock_offsets(df, selected, camera_map, threshold, task=task)
+    return {color: offset for color, (offset, _) in estimates.items()}
+
+def save_run_report(metrics, run_report, output_file, **fields):
+    """Write metrics' run report for run_report (a path, True for next to output_file, or False).
+    
+    Returns the path written, or None.
+    """
+    if not run_report:
+        return None
+    path = run_report if isinstance(run_report, str) else run_report_path(output_file)
+    return metrics.write_report(path, **fields)
+
+def run_pipeline(xlsx_file, dirs, threshold=0.0, selection_file=None, output_file=None,
+                 workers=None, camera_map=CAMERA_MAP, task=None, auto_offset=False, one_to_one=False,
+                 write_gps=False, gps_output=None, dry_run=False, verify=True, columns=None,
+                 fmt=None, all_rows=False, metrics=None, run_report=True, utc_offset=None):
+    """Load the log, scan the photo directories, apply a selection, match and export.
+    
+    dirs maps each camera color to its photo directory. Without a selection file every
+    photo is used. With auto_offset each camera's clock offset is estimated and applied
+    first; one_to_one is passed on to match_log(). With write_gps the matched positions
+    are also written into the photos (see write_gps_tags, which takes utc_offset) and a
+    report CSV is saved next to the export. fmt picks the default output format; all_rows exports every
+    row with its match distance instead of the matched rows only. Stage timings and
+    counters are collected in metrics (a RunMetrics) and saved as a run report, by
+    default next to the export (see save_run_report). Returns a summary dict; nothing
+    is exported when there is nothing to write.
+    """
+    task = task or TaskProgress()
+    metrics = metrics or RunMetrics()
+    with metrics.profiled():
+        df, selected, stats = load_session(xlsx_file, dirs, selection_file, workers, camera_map, task, columns,
+                                           metrics)
+        offsets = session_clock_offsets(df, selected, camera_map, threshold, auto_offset, task, metrics)
+        
+        task.report(0, max(len(df), 1), f"Matching photos (Threshold: {threshold}s)...")
+        with metrics.stage('match'):
+            matched_count = match_log(df, selected, camera_map, threshold, task, offsets, one_to_one)
+            matched_df = matched_rows(df)
+        metrics.count('rows_matched', matched_count)
+        
+        output_file = output_file or default_output_path(xlsx_file, None, threshold, fmt, all_rows)
+        report_base = output_file
+        table = df if all_rows else matched_df
+        gps = {}
+        if len(table):
+            with metrics.stage('export'):
+                export_matches(table, output_file, task)
+            metrics.count('rows_exported', len(table))
+        else:
+            output_file = None
+        if write_gps and len(matched_df):
+            task.report(0, 1, "Writing GPS tags..." if not dry_run else "Checking GPS tags (dry run)...")
+            with metrics.stage('write_gps'):
+                report = write_gps_tags(matched_rows(df, distances=True), dirs, camera_map, gps_output, dry_run,
+                                        verify, workers, task, utc_offset=utc_offset)
+            report.to_csv(gps_report_path(output_file), index=False)
+            gps = {'gps_' + status.replace(' ', '_'): int(count)
+                   for status, count in report['Status'].value_counts().items()}
+            gps['gps_report'] = gps_report_path(output_file)
+    summary = dict(stats, matched=matched_count, unmatched=len(df) - matched_count, output_file=output_file,
+                   clock_offsets=offsets, **gps)
+    summary['run_report'] = save_run_report(
+        metrics, run_report, report_base, mode='match', inputs={'log': xlsx_file, 'dirs': dirs, 'threshold': threshold,
+        'selection': selection_file, 'auto_offset': auto_offset, 'one_to_one': one_to_one}, results=summary)
+    return summary
+
+def run_positions(xlsx_file, dirs, selection_file=None, output_file=None, max_gap=MAX_FIX_GAP,
+                  workers=None, camera_map=CAMERA_MAP, task=None, auto_offset=False, columns=None, fmt=None,
+                  metrics=None, run_report=True):
+    """Reverse mode: interpolate a position for every selected photo and export the table.
+    
+    metrics and run_report work as in run_pipeline(). Returns (per-photo table, output path).
+    """
+    task = task or TaskProgress()
+    metrics = metrics or RunMetrics()
+    with metrics.profiled():
+        df, selected, stats = load_session(xlsx_file, dirs, selection_file, workers, camera_map, task, columns,
+                                           metrics)
+        offsets = session_clock_offsets(df, selected, camera_map, 0.0, auto_offset, task, metrics)
+        task.report(0, 1, "Interpolating photo positions...")
+        with metrics.stage('interpolate'):
+            positions = interpolate_photo_positions(df, selected, camera_map, max_gap, offsets, task)
+        output_file = output_file or default_positions_path(xlsx_file, None, fmt)
+        with metrics.stage('export'):
+            export_matches(positions, output_file, task)
+        metrics.count('rows_exported', len(positions))
+    flags = positions['Position_Flag'].value_counts() if len(positions) else {}
+    save_run_report(metrics, run_report, output_file, mode='positions',
+                    inputs={'log': xlsx_file, 'dirs': dirs, 'selection': selection_file, 'max_gap': max_gap,
+                            'auto_offset': auto_offset},
+                    results=dict(stats, positions=len(positions), clock_offsets=offsets, output_file=output_file,
+                                 flags={flag: int(flags.get(flag, 0)) for flag in ('ok', 'gap', 'outside')}))
+    return positions, output_file
+
+def run_sweep(xlsx_file, dirs, thresholds, selection_file=None, export=None, output_base=None,
+              workers=None, camera_map=CAMERA_MAP, task=None, auto_offset=False, columns=None, fmt=None,
+              metrics=None, run_report=None):
+    """Find every row's nearest photo once and evaluate all thresholds from it.
+    
+    export is None, 'files' or 'workbook' (see export_sweep). A run report is only
+    written when run_report is a path. Returns (sweep table, written paths).
+    """
+    task = task or TaskProgress()
+    metrics = metrics or RunMetrics()
+    with metrics.profiled():
+        df, selected, stats = load_session(xlsx_file, dirs, selection_file, workers, camera_map, task, columns,
+                                           metrics)
+        offsets = session_clock_offsets(df, selected, camera_map, 0.0, auto_offset, task, metrics)
+        task.report(0, max(len(df), 1), "Finding nearest photos...")
+        with metrics.stage('match'):
+            nearest = nearest_photos(df, selected, camera_map, task, offsets)
+            table = threshold_sweep(nearest, thresholds)
+        paths = []
+        if export:
+            with metrics.stage('export'):
+                paths = export_sweep(df, nearest, thresholds, xlsx_file, output_base, export == 'workbook', fmt)
+    if isinstance(run_report, str):
+        save_run_report(metrics, run_report, None, mode='sweep',
+                        inputs={'log': xlsx_file, 'dirs': dirs, 'selection': selection_file,
+                                'thresholds': thresholds, 'auto_offset': auto_offset},
+                        results=dict(stats, clock_offsets=offsets, exported=paths, sweep=table.to_dict('records')))
+    return table, paths
+
+def run_watch(xlsx_file, dirs, threshold=0.0, selection_file=None, output_file=None, watch_file=None,
+              interval=WATCH_INTERVAL_S, workers=None, camera_map=CAMERA_MAP, task=None, auto_offset=False,
+              one_to_one=False, columns=None, fmt=None, all_rows=False, metrics=None, run_report=True,
+              stop=None, on_update=None):
+    """Match once, then keep matching the photos that arrive in dirs until stop is set.
+    
+    The initial matches are written to watch_file (CSV, default <output>_watch.csv).
+    Every poll reads only the new photos and re-matches only the rows they can
+    affect (see IncrementalMatcher); rows whose match changed are appended to the
+    watch file. New photos are always used, whatever the selection file says.
+    on_update(new photos per color, changed row labels, matched count) is called
+    after each poll that found photos. Once stop (a threading.Event) is set, or on
+    KeyboardInterrupt, the final matches are exported as by run_pipeline(), whose
+    summary dict is returned with the watch file and the number of new photos added.
+    """
+    task = task or TaskProgress()
+    metrics = metrics or RunMetrics()
+    stop = stop or threading.Event()
+    with metrics.profiled():
+        df, catalogs, selected, stats = load_session_catalogs(xlsx_file, dirs, selection_file, workers, camera_map,
+                                                              task, columns, metrics)
+        offsets = session_clock_offsets(df, selected, camera_map, threshold, auto_offset, task, metrics)
+        task.report(0, max(len(df), 1), f"Matching photos (Threshold: {threshold}s)...")
+        with metrics.stage('match'):
+            match_log(df, selected, camera_map, threshold, task, offsets, one_to_one)
+        matcher = IncrementalMatcher(df, selected, camera_map, threshold, offsets, one_to_one)
+        watcher = PhotoWatcher(dirs, watch_known_paths(catalogs, metrics))
+        
+        output_file = output_file or default_output_path(xlsx_file, None, threshold, fmt, all_rows)
+        watch_file = watch_file or os.path.splitext(output_file)[0] + '_watch.csv'
+        append_watch_rows(df, df.index[df['Filename'] != ''], watch_file, start=True)
+        task.report(0, 1, f"Watching for new photos every {interval:g}s...")
+        new_photos = 0
+        try:
+            while not stop.wait(interval):
+                with metrics.stage('watch_poll'):
+                    found = watcher.poll()
+                counts = {}
+                changed = []
+                for color, files in found.items():
+                    if not files:
+                        continue
+                    with metrics.stage('watch_read'):
+                        photos = read_new_photos(dirs[color], files, workers, metrics)
+                    with metrics.stage('watch_match'):
+                        _, _, rows = matcher.add_photos(color, photos)
+                    if len(photos):
+                        counts[color] = len(photos)
+                        changed.append(rows)
+                        stats['photos'][color] += len(photos)
+                        stats['selected'][color] += len(photos)
+                if not counts:
+                    continue
+                changed = changed[0].append(changed[1:])
+                append_watch_rows(df, changed, watch_file)
+                new_photos += sum(counts.values())
+                metrics.count('watch_new_photos', sum(counts.values()))
+                metrics.count('watch_rows_updated', len(changed))
+                if on_update:
+                    on_update(counts, changed, int((df['Filename'] != '').sum()))
+        except KeyboardInterrupt:
+            pass
+        
+        matched_count = int((df['Filename'] != '').sum())
+        metrics.count('rows_matched', matched_count)
+        report_base = output_file
+        table = df if all_rows else matched_rows(df)
+        if len(table):
+            with metrics.stage('export'):
+                export_matches(table, output_file, task)
+            metrics.count('rows_exported', len(table))
+        else:
+            output_file = None
+    summary = dict(stats, matched=matched_count, unmatched=len(df) - matched_count, output_file=output_file,
+                   watch_file=watch_file, new_photos=new_photos, clock_offsets=offsets)
+    summary['run_report'] = save_run_report(
+        metrics, run_report, report_base, mode='watch', inputs={'log': xlsx_file, 'dirs': dirs, 'threshold': threshold,
+        'selection': selection_file, 'interval': interval, 'auto_offset': auto_offset, 'one_to_one': one_to_one},
+        results=summary)
+    return summary
+
+class ConsoleProgress(TaskProgress):
+    """Prints phase changes and a percentage at most once per interval to stderr."""
+    
+    def __init__(self, interval=1.0, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self._last_report = 0.0
+    
+    def report(self, done, total, text=None):
+        if text:
+            print(text, file=self.stream)
+        now = time.monotonic()
+        if done and (done >= total or now - self._last_report >= self.interval):
+            self._last_report = now
+            print(f"  {done}/{total} ({100.0 * done / max(total, 1):.0f}%)", file=self.stream)
+
+MANIFEST_FIELDS = ['name', 'xlsx'] + [color.lower() for color in COLORS] + ['threshold', 'selection', 'output']
+SUMMARY_FIELDS = ['name', 'status', 'rows', 'matched', 'unmatched', 'parse_errors', 'photos', 'skipped',
+                  'wall_time_s', 'output_file', 'error']
+
+def load_manifest(path):
+    """Read batch jobs from a JSON, YAML or CSV manifest.
+    
+    Each job has an xlsx log and green/white/third photo directories, plus an optional
+    name, threshold, selection and output. JSON/YAML may be a list of jobs or
+    {"jobs": [...]}. Relative paths are resolved against the manifest's folder.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if ext == '.csv':
+            jobs = [{k: v for k, v in row.items() if v not in (None, '')} for row in csv.DictReader(f)]
+        elif ext in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required for YAML manifests (pip install pyyaml).")
+            jobs = yaml.safe_load(f)
+        else:
+            jobs = json.load(f)
+    if isinstance(jobs, dict):
+        jobs = jobs.get('jobs')
+    if not isinstance(jobs, list):
+        raise ValueError("Manifest must contain a list of jobs.")
+    
+    base_dir = os.path.dirname(os.path.abspath(path))
+    resolved = []
+    for n, job in enumerate(jobs, 1):
+        missing = [k for k in ['xlsx'] + [color.lower() for color in COLORS] if not job.get(k)]
+        if missing:
+            raise ValueError(f"Job {n} in the manifest is missing: {', '.join(missing)}")
+        job = dict(job)
+        for key in ['xlsx', 'selection', 'output'] + [color.lower() for color in COLORS]:
+            if job.get(key):
+                job[key] = os.path.join(base_dir, os.path.expanduser(str(job[key])))
+        job.setdefault('name', os.path.splitext(os.path.basename(job['xlsx']))[0])
+        resolved.append(job)
+    return resolved
+
+def run_batch_job(job, threshold=0.0, workers=None, auto_offset=False, one_to_one=False, **options):
+    """Run one manifest job; failures are reported in the summary instead of raised.
+    
+    options are passed on to run_pipeline() for every job (fmt, all_rows, columns,
+    write_gps, ...). A gps_output folder gets a subfolder per job name, so tagged
+    copies from different jobs do not overwrite each other.
+    """
+    start = time.monotonic()
+    summary = {'name': job.get('name', ''), 'status': 'ok', 'error': ''}
+    try:
+        dirs = {color: job[color.lower()] for color in COLORS}
+        if options.get('gps_output'):
+            options = dict(options, gps_output=os.path.join(options['gps_output'], summary['name']))
+        result = run_pipeline(job['xlsx'], dirs, float(job.get('threshold', threshold)),
+                              job.get('selection'), job.get('output'), workers,
+                              auto_offset=auto_offset, one_to_one=one_to_one, **options)
+        summary.update(result)
+        summary['photos'] = sum(result['photos'].values())
+        summary['skipped'] = sum(result['skipped'].values())
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['wall_time_s'] = round(time.monotonic() - start, 3)
+    return summary
+
+def run_batch(jobs, max_parallel=None, threshold=0.0, workers=None, on_job_done=None, auto_offset=False,
+              one_to_one=False, **options):
+    """Run manifest jobs across a process pool, at most max_parallel at once.
+    
+    EXIF and thumbnail caches live on disk, so jobs share them across processes.
+    options are passed to every job (see run_batch_job). Returns one summary per
+    job, in manifest order.
+    """
+    max_parallel = max(1, min(max_parallel or default_worker_count(), len(jobs) or 1))
+    workers = workers or max(1, default_worker_count() // max_parallel)
+    summaries = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=max_parallel) as pool:
+        futures = {pool.submit(run_batch_job, job, threshold, workers, auto_offset, one_to_one, **options): i
+                   for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                summaries[i] = future.result()
+            except Exception as e:  # The worker process itself died
+                summaries[i] = {'name': jobs[i].get('name', ''), 'status': 'failed',
+                                'error': f"{type(e).__name__}: {e}"}
+            if on_job_done:
+                on_job_done(summaries[i])
+    return summaries
+
+def write_batch_summary(summaries, path):
+    """Write per-job summaries as CSV, or JSON when path ends in .json."""
+    if path.lower().endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=2, default=str)
+        return path
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(summaries)
+    return path
+
+def parse_columns(text):
+    """Split a comma-separated column list; an empty list means all columns (None)."""
+    columns = [name.strip() for name in text.split(',') if name.strip()]
+    return columns or None
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Match camera photos to the rows of a GPS log without the GUI.")
+    parser.add_argument('--xlsx', help="Input log (.xlsx, .csv or .parquet) with Time and Camera columns")
+    parser.add_argument('--columns', type=parse_columns,
+                        help="Comma-separated log columns to load besides Time and Camera (default: all)")
+    for color, cam in zip(COLORS, CAMERA_MAP):
+        parser.add_argument(f'--{color.lower()}', metavar='DIR', help=f"{color} ({cam}) photo directory")
+    parser.add_argument('--threshold', type=float, default=0.0, help="Match threshold in seconds (default 0)")
+    parser.add_argument('--selection', help="Selection session file saved from the GUI (default: all photos)")
+    parser.add_argument('--output', help="Output path; .xlsx, .csv or .parquet (default: <xlsx>_threshold_<n>s.xlsx next to the input)")
+    parser.add_argument('--format', dest='fmt', choices=EXPORT_FORMATS, help="Default output format (default: xlsx)")
+    parser.add_argument('--all-rows', action='store_true',
+                        help="Export every row with its distance to the nearest photo, not just the matches")
+    parser.add_argument('--workers', type=int,
+                        help="Parallel EXIF readers (default: CPU count, shared between parallel jobs)")
+    parser.add_argument('--auto-offset', action='store_true',
+                        help="Estimate each camera's clock offset from GPS time and correct for it before matching")
+    parser.add_argument('--one-to-one', action='store_true',
+                        help="Use every photo for at most one row, minimising the total time error")
+    tagging = parser.add_argument_group("GPS tagging")
+    tagging.add_argument('--write-gps', action='store_true',
+                         help="Write each match's latitude/longitude and time into the photo's EXIF")
+    tagging.add_argument('--gps-output', metavar='DIR',
+                         help="Write tagged copies under DIR/<color>/ instead of changing the photos in place")
+    tagging.add_argument('--utc-offset', type=float, metavar='HOURS',
+                         help="The log's offset from UTC, e.g. 10 or -4.5, so the GPS time stamp can be written "
+                              "in UTC (default: no GPS time stamp for logs without a time zone)")
+    tagging.add_argument('--dry-run', action='store_true', help="Build and verify the new EXIF without writing")
+    tagging.add_argument('--no-verify', dest='verify', action='store_false',
+                         help="Skip reading each new file back before it replaces the old one")
+    sweep = parser.add_argument_group("threshold sweep")
+    sweep.add_argument('--thresholds', help="Comma-separated thresholds to compare, e.g. 0,5,10,30,60")
+    sweep.add_argument('--sweep-export', choices=['none', 'files', 'workbook'], default='none',
+                       help="Also export one file per threshold or one workbook with a sheet each")
+    reverse = parser.add_argument_group("photo positions (reverse mode)")
+    reverse.add_argument('--photo-positions', action='store_true',
+                         help="Interpolate a position for every photo instead of a photo for every row")
+    reverse.add_argument('--max-gap', type=float, default=MAX_FIX_GAP,
+                         help=f"Flag photos whose bracketing log rows are further apart (default {MAX_FIX_GAP:g}s)")
+    watch = parser.add_argument_group("watch mode")
+    watch.add_argument('--watch', action='store_true',
+                       help="Keep polling the photo directories and match new photos as they arrive (Ctrl+C to stop)")
+    watch.add_argument('--interval', type=float, default=WATCH_INTERVAL_S,
+                       help=f"Seconds between polls (default {WATCH_INTERVAL_S:g})")
+    watch.add_argument('--watch-file', metavar='PATH',
+                       help="CSV the changed rows are appended to (default: <output>_watch.csv)")
+    report = parser.add_argument_group("run report")
+    report.add_argument('--run-report', metavar='PATH',
+                        help="Stage timings and counters as .json, or appended to a .jsonl "
+                             "(default: <output>_run_report.json next to the export)")
+    report.add_argument('--no-run-report', action='store_true', help="Do not write a run report")
+    report.add_argument('--profile', action='store_true',
+                        help="Also capture a cProfile of the run, saved next to the report as .prof")
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument('--manifest', help="JSON, YAML or CSV list of jobs to run instead of a single log")
+    batch.add_argument('--jobs', type=int, help="Jobs to run at once (default: CPU count)")
+    batch.add_argument('--summary', help="Per-job summary file, .csv or .json (default: <manifest>_summary.csv)")
+    return parser
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.manifest:
+        if args.profile or args.run_report:
+            parser.error("--profile and --run-report apply to single runs; batch jobs write their own reports")
+        if args.xlsx or args.output or args.selection:
+            parser.error("--xlsx, --output and --selection are set per job in the manifest")
+        if args.thresholds or args.photo_positions or args.watch:
+            parser.error("--thresholds, --photo-positions and --watch cannot be combined with --manifest")
+        return run_batch_cli(args)
+    
+    dirs = {color: getattr(args, color.lower()) for color in COLORS}
+    if not args.xlsx or not all(dirs.values()):
+        parser.error("--xlsx and all photo directories are required (or use --manifest)")
+    if args.watch:
+        if args.thresholds or args.photo_positions or args.write_gps:
+            parser.error("--watch cannot be combined with --thresholds, --photo-positions or --write-gps")
+        if args.interval <= 0:
+            parser.error("--interval must be positive")
+        return run_watch_cli(args, dirs)
+    if args.photo_positions:
+        return run_positions_cli(args, dirs)
+    if args.thresholds:
+        if args.one_to_one:
+            parser.error("--one-to-one depends on the threshold and cannot be combined with --thresholds")
+        return run_sweep_cli(args, dirs, parser)
+    metrics = RunMetrics(args.profile)
+    try:
+        summary = run_pipeline(args.xlsx, dirs, args.threshold, args.selection, args.output,
+                               args.workers, task=ConsoleProgress(), auto_offset=args.auto_offset,
+                               one_to_one=args.one_to_one, write_gps=args.write_gps, gps_output=args.gps_output,
+                               dry_run=args.dry_run, verify=args.verify, columns=args.columns,
+                               fmt=args.fmt, all_rows=args.all_rows, metrics=metrics,
+                               run_report=cli_run_report(args), utc_offset=args.utc_offset)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if summary['clock_offsets']:
+        print("Clock offsets: " + ", ".join(f"{color} {offset:+.3f}s" for color, offset in summary['clock_offsets'].items()))
+    print(f"Rows: {summary['rows']}, matched: {summary['matched']}, unmatched: {summary['unmatched']}, "
+          f"parse errors: {summary['parse_errors']}")
+    if summary['output_file']:
+        exported = f"all {summary['rows']} rows" if args.all_rows else f"{summary['matched']} matches"
+        print(f"Exported {exported} to: {summary['output_file']}")
+        if 'gps_report' in summary:
+            print(f"GPS tags: {summary.get('gps_written', 0)} written, {summary.get('gps_dry_run', 0)} checked (dry run), "
+                  f"{summary.get('gps_skipped', 0)} skipped, {summary.get('gps_failed', 0)} failed. "
+                  f"Report: {summary['gps_report']}")
+    else:
+        print("No matches found with the selected photos and threshold.")
+    print_run_metrics(metrics, summary['run_report'])
+    return 0
+
+def cli_run_report(args, default=True):
+    """The run_report argument for run_pipeline() and friends from --run-report/--no-run-report."""
+    if args.no_run_report:
+        return False
+    return args.run_report or default
+
+def print_run_metrics(metrics, report_file):
+    print(f"Timings: {metrics.summary()}")
+    if report_file:
+        print(f"Run report: {report_file}")
+
+def run_watch_cli(args, dirs):
+    metrics = RunMetrics(args.profile)
+    
+    def on_update(counts, changed, matched):
+        added = ", ".join(f"{color} +{n}" for color, n in counts.items())
+        print(f"[{datetime.now():%H:%M:%S}] New photos: {added}; {len(changed)} rows updated, {matched} matched")
+    
+    try:
+        summary = run_watch(args.xlsx, dirs, args.threshold, args.selection, args.output, args.watch_file,
+                            args.interval, args.workers, task=ConsoleProgress(), auto_offset=args.auto_offset,
+                            one_to_one=args.one_to_one, columns=args.columns, fmt=args.fmt, all_rows=args.all_rows,
+                            metrics=metrics, run_report=cli_run_report(args), on_update=on_update)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Stopped watching after {summary['new_photos']} new photos. Rows: {summary['rows']}, "
+          f"matched: {summary['matched']}, unmatched: {summary['unmatched']}")
+    print(f"Changed rows were logged to: {summary['watch_file']}")
+    if summary['output_file']:
+        print(f"Exported final matches to: {summary['output_file']}")
+    print_run_metrics(metrics, summary['run_report'])
+    return 0
+
+def run_positions_cli(args, dirs):
+    metrics = RunMetrics(args.profile)
+    run_report = cli_run_report(args)
+    try:
+        positions, output_file = run_positions(args.xlsx, dirs, args.selection, args.output, args.max_gap,
+                                               args.workers, task=ConsoleProgress(), auto_offset=args.auto_offset,
+                                               columns=args.columns, fmt=args.fmt, metrics=metrics,
+                                               run_report=run_report)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    flags = positions['Position_Flag'].value_counts() if len(positions) else {}
+    print(f"Photos: {len(positions)}, interpolated: {flags.get('ok', 0)}, "
+          f"over max gap: {flags.get('gap', 0)}, outside the log: {flags.get('outside', 0)}")
+    print(f"Exported photo positions to: {output_file}")
+    print_run_metrics(metrics, run_report and (args.run_report or run_report_path(output_file)))
+    return 0
+
+def run_sweep_cli(args, dirs, parser):
+    try:
+        thresholds = parse_thresholds(args.thresholds)
+    except ValueError as e:
+        parser.error(str(e))
+    export = None if args.sweep_export == 'none' else args.sweep_export
+    metrics = RunMetrics(args.profile)
+    run_report = cli_run_report(args, default=None)
+    try:
+        table, paths = run_sweep(args.xlsx, dirs, thresholds, args.selection, export,
+                                 args.output and os.path.basename(args.output), args.workers, task=ConsoleProgress(),
+                                 auto_offset=args.auto_offset, columns=args.columns, fmt=args.fmt,
+                                 metrics=metrics, run_report=run_report)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(table.to_string(index=False, formatters={'Match_Rate': '{:.1%}'.format}))
+    for path in paths:
+        print(f"Exported: {path}")
+    print_run_metrics(metrics, run_report)
+    return 0
+
+def run_batch_cli(args):
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    def on_job_done(summary):
+        if summary['status'] == 'ok':
+            print(f"[ok] {summary['name']}: {summary['matched']}/{summary['rows']} rows matched "
+                  f"in {summary['wall_time_s']}s")
+        else:
+            print(f"[failed] {summary['name']}: {summary['error']}")
+    
+    summaries = run_batch(jobs, args.jobs, args.threshold, args.workers, on_job_done, args.auto_offset,
+                          args.one_to_one, write_gps=args.write_gps, gps_output=args.gps_output,
+                          dry_run=args.dry_run, verify=args.verify, utc_offset=args.utc_offset,
+                          columns=args.columns, fmt=args.fmt, all_rows=args.all_rows,
+                          run_report=not args.no_run_report)
+    summary_path = args.summary or os.path.splitext(args.manifest)[0] + '_summary.csv'
+    write_batch_summary(summaries, summary_path)
+    failed = sum(1 for summary in summaries if summary['status'] != 'ok')
+    print(f"{len(summaries) - failed} of {len(summaries)} jobs succeeded. Summary: {summary_path}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Small builders shared by the tests."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from photo_pipeline import CAMERA_MAP, PhotoCatalog
+
+BASE = datetime(2024, 3, 12, 10, 0, 0)
+
+
+def make_catalog(seconds, prefix='IMG', root='/photos'):
+    """Catalog of photos taken the given seconds after BASE, alternating between two subfolders."""
+    records = [(BASE + timedelta(seconds=float(s)), f"sub{i % 2}", f"{prefix}_{i:04d}.JPG", 'DateTimeOriginal')
+               for i, s in enumerate(seconds)]
+    return PhotoCatalog.from_records(root, records)
+
+
+def make_log(seconds, cameras):
+    """Log with a row per second offset from BASE (None for a missing time)."""
+    times = [BASE + timedelta(seconds=float(s)) if s is not None else pd.NaT for s in seconds]
+    return pd.DataFrame({'Time': pd.to_datetime(pd.Series(times)), 'Camera': cameras, 'Value': range(len(seconds))})
+
+
+def scan_nearest(photo_ns, query_ns):
+    """The original matcher: scan every photo in time order, the first strictly closer one wins."""
+    best = np.full(len(query_ns), -1)
+    dist = np.full(len(query_ns), np.inf)
+    for q, t in enumerate(query_ns):
+        for i, p in enumerate(photo_ns):
+            diff = abs(int(p) - int(t)) / 1e9
+            if diff < dist[q]:
+                best[q], dist[q] = i, diff
+    return best, dist
+
+
+def scan_match(df, catalogs, threshold, offsets=None):
+    """(Subfolder, Filename) per row from the per-row scan, with clock offsets applied."""
+    result = []
+    for _, row in df.iterrows():
+        color = CAMERA_MAP.get(str(row['Camera']).strip())
+        catalog = catalogs.get(color)
+        if pd.isna(row['Time']) or catalog is None or not len(catalog):
+            result.append(('', ''))
+            continue
+        t = pd.Timestamp(row['Time']).value + int(round((offsets or {}).get(color, 0.0) * 1e9))
+        best, dist = scan_nearest(catalog.times, [t])
+        if dist[0] <= threshold:
+            result.append((catalog.subfolder(best[0]), catalog.filename(best[0])))
+        else:
+            result.append(('', ''))
+    return result
+
+
+def matched_pairs(df):
+    return list(zip(df['Subfolder'], df['Filename']))
@@ -0,0 +1,40 @@
+"""Per-camera clock offsets: estimation and matching with corrected times."""
+import numpy as np
+import pytest
+
+from helpers import make_catalog, make_log, matched_pairs, scan_match
+from photo_pipeline import CAMERA_MAP, estimate_clock_offset, estimate_clock_offsets, match_log
+
+
+@pytest.mark.parametrize('offset', [-95.0, 0.0, 42.0])
+def test_estimate_clock_offset_recovers_shift(offset):
+    rng = np.random.default_rng(int(offset) + 100)
+    gps = np.sort(rng.choice(np.arange(0, 3600, 7), 100, replace=False)) * 10**9
+    jitter = rng.integers(-200, 200, len(gps)) * 10**6  # +-0.2 s
+    photos = np.sort(gps + int(offset * 1e9) + jitter)
+    estimate, matched = estimate_clock_offset(gps, photos, 1.0)
+    assert abs(estimate - offset) <= 0.25
+    assert matched == len(gps)
+
+
+def test_estimate_clock_offset_without_data():
+    assert estimate_clock_offset(np.zeros(0, dtype=np.int64), np.array([1]) * 10**9, 1.0) == (0.0, 0)
+    assert estimate_clock_offset(np.array([1]) * 10**9, np.zeros(0, dtype=np.int64), 1.0) == (0.0, 0)
+
+
+def test_estimate_clock_offsets_per_camera():
+    seconds = list(range(0, 600, 13))
+    df = make_log(seconds * 2, ['PDP1'] * len(seconds) + ['PDP2'] * len(seconds))
+    catalogs = {'Green': make_catalog([s + 30 for s in seconds]), 'White': make_catalog([s - 7 for s in seconds])}
+    offsets = estimate_clock_offsets(df, catalogs, CAMERA_MAP)
+    assert offsets == {'Green': (30.0, len(seconds)), 'White': (-7.0, len(seconds))}
+
+
+def test_match_log_with_clock_offsets_matches_scan():
+    rng = np.random.default_rng(7)
+    catalogs = {'Green': make_catalog(rng.integers(0, 200, 40), 'G'), 'White': make_catalog(rng.integers(0, 200, 40), 'W')}
+    df = make_log([int(s) for s in rng.integers(0, 200, 80)], list(rng.choice(['PDP1', 'PDP2'], 80)))
+    offsets = {'Green': 12.5, 'White': -30.0}
+    match_log(df, catalogs, CAMERA_MAP, 3, offsets=offsets)
+    assert matched_pairs(df) == scan_match(df, catalogs, 3, offsets)
+    assert (df['Clock_Offset_s'] == df['Camera'].map(lambda cam: offsets[CAMERA_MAP[cam]])).all()
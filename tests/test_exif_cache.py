@@ -0,0 +1,93 @@
+"""ExifCache: reuse, invalidation, pruning and clearing."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from photo_pipeline import ExifCache, clear_exif_cache, exif_cache_path
+
+
+def save_photo(path, taken, size=(8, 8)):
+    exif = Image.Exif()
+    exif.get_ifd(0x8769)[0x9003] = taken
+    Image.new('RGB', size, 'blue').save(path, 'JPEG', exif=exif.tobytes())
+
+
+@pytest.fixture
+def photo_dir(tmp_path):
+    root = tmp_path / 'photos'
+    (root / 'sub').mkdir(parents=True)
+    for i in range(3):
+        save_photo(root / 'sub' / f'IMG_{i}.JPG', f'2024:03:12 10:00:0{i}')
+    return str(root)
+
+
+def scan(photo_dir, cache_dir):
+    cache = ExifCache(photo_dir, cache_dir)
+    times = {}
+    for name in sorted(os.listdir(os.path.join(photo_dir, 'sub'))):
+        times[name] = cache.get_exif_datetime(os.path.join(photo_dir, 'sub', name))
+    assert cache.save()
+    return cache, times
+
+
+def test_unchanged_files_are_hits(photo_dir, tmp_path):
+    first, times = scan(photo_dir, str(tmp_path / 'cache'))
+    assert (first.hits, first.misses) == (0, 3)
+    assert times['IMG_1.JPG'] == (datetime(2024, 3, 12, 10, 0, 1), 'DateTimeOriginal')
+    second, again = scan(photo_dir, str(tmp_path / 'cache'))
+    assert (second.hits, second.misses) == (3, 0)
+    assert again == times
+
+
+def test_size_or_mtime_change_rereads(photo_dir, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    scan(photo_dir, cache_dir)
+    resized = os.path.join(photo_dir, 'sub', 'IMG_0.JPG')
+    save_photo(resized, '2024:03:12 11:00:00', size=(64, 64))
+    touched = os.path.join(photo_dir, 'sub', 'IMG_1.JPG')
+    st = os.stat(touched)
+    save_photo(touched, '2024:03:12 12:00:00')
+    os.utime(touched, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert os.path.getsize(touched) == st.st_size
+
+    cache, times = scan(photo_dir, cache_dir)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert times['IMG_0.JPG'][0] == datetime(2024, 3, 12, 11)
+    assert times['IMG_1.JPG'][0] == datetime(2024, 3, 12, 12)
+
+
+def test_save_prunes_files_not_seen(photo_dir, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    scan(photo_dir, cache_dir)
+    os.remove(os.path.join(photo_dir, 'sub', 'IMG_2.JPG'))
+    scan(photo_dir, cache_dir)
+    cache = ExifCache(photo_dir, cache_dir)
+    assert sorted(cache._stored) == [os.path.join('sub', 'IMG_0.JPG'), os.path.join('sub', 'IMG_1.JPG')]
+
+
+def test_clear(photo_dir, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    other = tmp_path / 'other'
+    (other / 'sub').mkdir(parents=True)
+    save_photo(other / 'sub' / 'IMG_9.JPG', '2024:03:12 10:00:09')
+    scan(photo_dir, cache_dir)
+    scan(str(other), cache_dir)
+    assert clear_exif_cache(photo_dir, cache_dir) == 1
+    assert not os.path.exists(exif_cache_path(photo_dir, cache_dir))
+    assert os.path.exists(exif_cache_path(str(other), cache_dir))
+    assert clear_exif_cache(cache_dir=cache_dir) == 1
+    assert clear_exif_cache(cache_dir=cache_dir) == 0
+    assert scan(photo_dir, cache_dir)[0].misses == 3
+
+
+def test_counts_every_lookup_across_threads(photo_dir, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    scan(photo_dir, cache_dir)
+    cache = ExifCache(photo_dir, cache_dir)
+    paths = [os.path.join(photo_dir, 'sub', f'IMG_{i % 3}.JPG') for i in range(3000)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(cache.get_exif_datetime, paths))
+    assert (cache.hits, cache.misses) == (3000, 0)
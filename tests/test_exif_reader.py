@@ -0,0 +1,120 @@
+"""The header-only EXIF reader against PIL, on small generated JPEGs."""
+import io
+import struct
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from photo_pipeline import _get_exif_datetime_pil, _read_exif_datetime, read_exif_datetime_values
+
+DATETIME, DATETIME_ORIGINAL, DATETIME_DIGITIZED = 0x0132, 0x9003, 0x9004
+EXIF_IFD = 0x8769
+
+
+def jpeg_bytes(ifd0=None, exif_ifd=None, endian='<', app1_first=()):
+    """JPEG with the given IFD0 and Exif sub-IFD tags, optionally after other APP1 segments."""
+    exif = Image.Exif()
+    exif.endian = endian
+    for tag, value in (ifd0 or {}).items():
+        exif[tag] = value
+    for tag, value in (exif_ifd or {}).items():
+        exif.get_ifd(EXIF_IFD)[tag] = value
+    buf = io.BytesIO()
+    kwargs = {'exif': exif.tobytes()} if ifd0 is not None or exif_ifd is not None else {}
+    Image.new('RGB', (16, 16), 'green').save(buf, 'JPEG', **kwargs)
+    data = buf.getvalue()
+    for payload in app1_first:
+        data = data[:2] + b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload + data[2:]
+    return data
+
+
+CASES = {
+    'original': ({0x010F: 'Camera'}, {DATETIME_ORIGINAL: '2024:03:12 10:00:05'}),
+    'original wins': ({DATETIME: '2024:03:12 11:00:00'},
+                      {DATETIME_ORIGINAL: '2024:03:12 10:00:05', DATETIME_DIGITIZED: '2024:03:12 10:30:00'}),
+    'digitized fallback': ({DATETIME: '2024:03:12 11:00:00'}, {DATETIME_DIGITIZED: '2024:03:12 10:30:00'}),
+    'datetime fallback': ({DATETIME: '2024:03:12 11:00:00'}, None),
+    'date only': ({DATETIME: '2024:03:12'}, None),
+    'padded': ({DATETIME: '  2024:03:12 11:00:00 '}, None),
+    'invalid': (None, {DATETIME_ORIGINAL: '2024-03-12T10:00:05'}),
+    'empty original': ({DATETIME: '2024:03:12 11:00:00'}, {DATETIME_ORIGINAL: ''}),
+    'no time tag': ({0x010F: 'Camera'}, {0x829A: 0.01}),
+    'no exif': (None, None),
+}
+
+
+@pytest.mark.parametrize('endian', ['<', '>'], ids=['little endian', 'big endian'])
+@pytest.mark.parametrize('case', list(CASES))
+def test_header_reader_matches_pil(tmp_path, case, endian):
+    ifd0, exif_ifd = CASES[case]
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(jpeg_bytes(ifd0, exif_ifd, endian))
+    read_exif_datetime_values(str(path))  # The header reader handles it without a PIL fallback
+    assert _read_exif_datetime(str(path)) == _get_exif_datetime_pil(str(path))
+
+
+def test_header_reader_values(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(jpeg_bytes({DATETIME: '2024:03:12 11:00:00'}, {DATETIME_ORIGINAL: '2024:03:12 10:00:05'}, '>'))
+    assert read_exif_datetime_values(str(path)) == {DATETIME: '2024:03:12 11:00:00',
+                                                    DATETIME_ORIGINAL: '2024:03:12 10:00:05'}
+    path.write_bytes(jpeg_bytes())
+    assert read_exif_datetime_values(str(path)) is None
+
+
+def test_skips_xmp_segment(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    xmp = b'http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>'
+    path.write_bytes(jpeg_bytes(None, {DATETIME_ORIGINAL: '2024:03:12 10:00:05'}, app1_first=[xmp]))
+    assert read_exif_datetime_values(str(path)) == {DATETIME_ORIGINAL: '2024:03:12 10:00:05'}
+    assert _read_exif_datetime(str(path)) == _get_exif_datetime_pil(str(path))
+
+
+def test_truncated_files_never_raise(tmp_path):
+    data = jpeg_bytes({DATETIME: '2024:03:12 11:00:00'}, {DATETIME_ORIGINAL: '2024:03:12 10:00:05'})
+    full = (datetime(2024, 3, 12, 10, 0, 5), 'DateTimeOriginal')
+    path = tmp_path / 'photo.jpg'
+    header_end = data.index(b'\xff\xdb')  # First segment after the Exif block
+    for cut in range(header_end + 8):
+        path.write_bytes(data[:cut])
+        result = _read_exif_datetime(str(path))
+        # Once the Exif block is complete the header reader no longer needs the rest of the file
+        assert result == (full if cut >= header_end else _get_exif_datetime_pil(str(path))), cut
+        if cut < header_end:
+            assert result[0] is None and result[1].startswith(('unreadable', 'no EXIF data'))
+
+
+@pytest.mark.filterwarnings('ignore:Corrupt EXIF data')
+@pytest.mark.filterwarnings('ignore:Truncated File Read')
+@pytest.mark.parametrize('corrupt', ['byte order', 'magic', 'ifd0 offset', 'exif ifd offset', 'string offset'])
+def test_malformed_exif_falls_back_to_pil(tmp_path, corrupt):
+    data = bytearray(jpeg_bytes(None, {DATETIME_ORIGINAL: '2024:03:12 10:00:05'}))
+    tiff = data.index(b'Exif\x00\x00') + 6
+    if corrupt == 'byte order':
+        data[tiff:tiff + 2] = b'XX'
+    elif corrupt == 'magic':
+        data[tiff + 2:tiff + 4] = struct.pack('<H', 43)
+    elif corrupt == 'ifd0 offset':
+        data[tiff + 4:tiff + 8] = struct.pack('<I', 0xFFFF)
+    else:
+        pointer = data.index(struct.pack('<HHI', EXIF_IFD, 4, 1), tiff)
+        exif_ifd = tiff + struct.unpack_from('<I', data, pointer + 8)[0]
+        if corrupt == 'exif ifd offset':
+            data[pointer + 8:pointer + 12] = struct.pack('<I', 0xFFFF)
+        else:
+            entry = data.index(struct.pack('<HHI', DATETIME_ORIGINAL, 2, 20), exif_ifd)
+            data[entry + 8:entry + 12] = struct.pack('<I', 0xFFFF)
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(bytes(data))
+    with pytest.raises((ValueError, struct.error)):
+        read_exif_datetime_values(str(path))
+    assert _read_exif_datetime(str(path)) == _get_exif_datetime_pil(str(path))
+
+
+@pytest.mark.parametrize('content', [b'', b'not a jpeg', b'\xff\xd8', b'\xff\xd8\xff\xe1\x00'])
+def test_not_a_jpeg(tmp_path, content):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(content)
+    photo_time, reason = _read_exif_datetime(str(path))
+    assert photo_time is None and reason.startswith('unreadable')
@@ -0,0 +1,64 @@
+"""Exports in every format read back against the tables they were written from."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import make_catalog, make_log
+from photo_pipeline import CAMERA_MAP, EXPORT_FORMATS, default_output_path, export_matches, match_log, matched_rows
+
+TEXT_COLUMNS = ['Camera', 'Subfolder', 'Filename', 'Note']
+
+
+@pytest.fixture
+def matched_log():
+    rng = np.random.default_rng(3)
+    seconds = np.round(rng.uniform(0, 300, 150), 3).tolist()
+    seconds[::41] = [None] * len(seconds[::41])
+    df = make_log(seconds, rng.choice(list(CAMERA_MAP), 150).tolist())
+    df['Lat'] = np.round(rng.uniform(-40, -30, 150), 6)
+    df['Note'] = [f'row {i}, "quoted" – ü' if i % 3 == 0 else None for i in range(150)]
+    catalogs = {color: make_catalog(np.round(rng.uniform(0, 300, 50), 3), prefix=color) for color in CAMERA_MAP.values()}
+    assert 0 < match_log(df, catalogs, CAMERA_MAP, 2, offsets={'Green': 0.5}) < len(df)
+    return df
+
+
+def read_back(path):
+    ext = os.path.splitext(path)[1]
+    if ext == '.csv':
+        return pd.read_csv(path)
+    if ext == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+
+def normalized(table):
+    table = table.reset_index(drop=True).copy()
+    table['Time'] = pd.to_datetime(table['Time']).astype('datetime64[ns]')
+    for column in TEXT_COLUMNS:
+        table[column] = table[column].fillna('').astype(str)
+    return table
+
+
+@pytest.mark.parametrize('fmt', EXPORT_FORMATS)
+@pytest.mark.parametrize('all_rows', [False, True], ids=['matched', 'all rows'])
+def test_export_reads_back(tmp_path, matched_log, fmt, all_rows):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    table = matched_log if all_rows else matched_rows(matched_log)
+    assert ('Match_Distance_s' in table) == all_rows
+    path = export_matches(table, default_output_path(str(tmp_path / 'log.xlsx'), None, 2, fmt, all_rows))
+    assert os.path.basename(path) == f"log_threshold_2s{'_all' if all_rows else ''}.{fmt}"
+    result = read_back(path)
+    assert list(result.columns) == list(table.columns)
+    pd.testing.assert_frame_equal(normalized(result), normalized(table), check_dtype=False)
+
+
+@pytest.mark.parametrize('fmt', EXPORT_FORMATS)
+def test_empty_export_keeps_header(tmp_path, matched_log, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    empty = matched_rows(matched_log).iloc[:0]
+    result = read_back(export_matches(empty, str(tmp_path / f'empty.{fmt}')))
+    assert list(result.columns) == list(empty.columns) and len(result) == 0
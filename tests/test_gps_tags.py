@@ -0,0 +1,71 @@
+"""GPS tags written into JPEG bytes and read back."""
+import io
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from photo_pipeline import _check_gps_bytes, gps_utc_time, read_jpeg_gps, set_jpeg_gps, write_gps_tags
+
+
+def jpeg_bytes(exif=None):
+    buf = io.BytesIO()
+    kwargs = {'exif': exif.tobytes()} if exif is not None else {}
+    Image.new('RGB', (16, 16), 'red').save(buf, 'JPEG', **kwargs)
+    return buf.getvalue()
+
+
+def camera_exif():
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    exif[0x0132] = '2024:03:12 10:00:00'
+    exif.get_ifd(0x8769)[0x9003] = '2024:03:12 10:00:00'
+    return exif
+
+
+@pytest.mark.parametrize('exif', [None, camera_exif()], ids=['no exif', 'camera exif'])
+def test_rewrite_replaces_gps_without_growing(exif):
+    original = jpeg_bytes(exif)
+    first = set_jpeg_gps(original, -33.86, 151.21, datetime(2024, 3, 12, 0, 0, 3))
+    second = set_jpeg_gps(first, 40.5, -74.25, datetime(2024, 3, 12, 0, 0, 4, 500000))
+    _check_gps_bytes(original, second, 40.5, -74.25)
+    assert len(second) == len(first)
+    lat, lon, stamp = read_jpeg_gps(second)
+    assert lat == pytest.approx(40.5) and lon == pytest.approx(-74.25)
+    assert stamp == '2024:03:12 00:00:04.500'
+    if exif is not None:
+        tags = Image.open(io.BytesIO(second)).getexif()
+        assert tags[0x010F] == 'Camera' and tags[0x0132] == '2024:03:12 10:00:00'
+        assert tags.get_ifd(0x8769)[0x9003] == '2024:03:12 10:00:00'
+
+
+def test_gps_time_stamp_is_utc():
+    local = pd.Timestamp('2024-03-12 10:00:03')
+    assert gps_utc_time(local) is None
+    assert gps_utc_time(local, 10) == datetime(2024, 3, 12, 0, 0, 3)
+    assert gps_utc_time(local, -4.5) == datetime(2024, 3, 12, 14, 30, 3)
+    assert gps_utc_time(pd.Timestamp('2024-03-12 10:00:03', tz='Australia/Sydney')) == datetime(2024, 3, 11, 23, 0, 3)
+    assert gps_utc_time(pd.NaT, 10) is None
+    
+    untimed = set_jpeg_gps(jpeg_bytes(), 1.0, 2.0, gps_utc_time(local))
+    assert read_jpeg_gps(untimed)[2] is None
+
+
+def test_photo_matched_by_several_rows_gets_the_closest(tmp_path):
+    (tmp_path / 'Green').mkdir()
+    for name in ('A.JPG', 'B.JPG'):
+        (tmp_path / 'Green' / name).write_bytes(jpeg_bytes())
+    matched = pd.DataFrame({
+        'Time': pd.to_datetime(['2024-03-12 10:00:00', '2024-03-12 10:00:01', '2024-03-12 10:00:02',
+                                '2024-03-12 10:00:03']),
+        'Camera': 'PDP1', 'Lat': [1.0, 2.0, None, 4.0], 'Lon': [1.5, 2.5, 3.5, 4.5],
+        'Subfolder': '', 'Filename': ['A.JPG', 'A.JPG', 'A.JPG', 'B.JPG'],
+        'Match_Distance_s': [3.0, 1.0, 0.5, 2.0]})
+    dirs = {'Green': str(tmp_path / 'Green')}
+    report = write_gps_tags(matched, dirs, {'PDP1': 'Green'}, dry_run=True)
+    assert list(report['Status']) == ['skipped', 'dry run', 'skipped', 'dry run']
+    assert list(report['Error']) == ["Photo written for another row", '', "Row has no position", '']
+    
+    first = write_gps_tags(matched.drop(columns='Match_Distance_s'), dirs, {'PDP1': 'Green'}, dry_run=True)
+    assert list(first['Status']) == ['dry run', 'skipped', 'skipped', 'dry run']
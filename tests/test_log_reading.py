@@ -0,0 +1,54 @@
+"""read_xlsx_columns against pd.read_excel, with both the calamine and openpyxl readers."""
+import importlib.util
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from photo_pipeline import read_xlsx_columns
+
+HEADER = ['Time', 'Camera', 'Lat', 'Lon', 'Lat', None, 'Lat.1', 'Lat', 'Note']
+ROWS = [
+    ['12/03/2024 10:00', 'PDP1', -33.5, 151.0, 2, 4, 3, 5.5, 'first'],
+    [None] * 9,
+    ['12/03/2024 10:01', 'PDP2', 1, 151.25, 2.0, None, None, None, None],
+    [None, None, None, None, None, 7, None, None, 'only unwanted'],
+]
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    workbook = Workbook()
+    for row in [HEADER] + ROWS:
+        workbook.active.append(row)
+    path = str(tmp_path / 'log.xlsx')
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture(params=['openpyxl', 'calamine'])
+def reader(request, monkeypatch):
+    find_spec = importlib.util.find_spec
+    if request.param == 'calamine':
+        pytest.importorskip('python_calamine')
+        if tuple(int(part) for part in pd.__version__.split('.')[:2]) < (2, 2):
+            pytest.skip("pandas is too old for the calamine engine")
+    else:
+        monkeypatch.setattr(importlib.util, 'find_spec',
+                            lambda name, *args: None if name == 'python_calamine' else find_spec(name, *args))
+    return request.param
+
+
+@pytest.mark.parametrize('columns', [None, ['Lat'], ['Lat.1', 'Lat.2', 'Note'], ['Unnamed: 5', 'Missing']])
+def test_matches_read_excel(log_file, reader, columns):
+    usecols = None if columns is None else lambda name: name in {'Time', 'Camera', *columns}
+    expected = pd.read_excel(log_file, usecols=usecols).dropna(how='all').reset_index(drop=True)
+    df = read_xlsx_columns(log_file, columns)
+    assert list(df.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_duplicate_headers_keep_their_own_cells(log_file, reader):
+    df = read_xlsx_columns(log_file)
+    assert list(df.columns) == ['Time', 'Camera', 'Lat', 'Lon', 'Lat.2', 'Unnamed: 5', 'Lat.1', 'Lat.3', 'Note']
+    assert list(df.iloc[0, 2:8]) == [-33.5, 151.0, 2, 4, 3, 5.5]
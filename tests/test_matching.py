@@ -0,0 +1,46 @@
+"""Vectorised matching against the original per-row scan of every selected photo."""
+import numpy as np
+import pytest
+
+from helpers import make_catalog, make_log, matched_pairs, scan_match, scan_nearest
+from photo_pipeline import CAMERA_MAP, match_log, nearest_indices
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_nearest_indices_matches_scan(seed):
+    rng = np.random.default_rng(seed)
+    # Whole seconds on a small range give many duplicate photo times and exact ties
+    photos = np.sort(rng.integers(0, 30, rng.integers(1, 15))) * 10**9
+    queries = rng.integers(-10, 40, 50) * 10**9  # Includes times before the first and after the last photo
+    best, dist = nearest_indices(photos, queries)
+    expected_best, expected_dist = scan_nearest(photos, queries)
+    np.testing.assert_array_equal(best, expected_best)
+    np.testing.assert_allclose(dist, expected_dist)
+
+
+def test_nearest_indices_exact_tie_takes_earlier_photo():
+    photos = np.array([0, 10, 10, 20]) * 10**9
+    best, dist = nearest_indices(photos, np.array([5, 10, 15, -3, 25]) * 10**9)
+    assert best.tolist() == [0, 1, 1, 0, 3]
+    assert dist.tolist() == [5, 0, 5, 3, 5]
+
+
+def test_nearest_indices_empty_catalog():
+    best, dist = nearest_indices(np.zeros(0, dtype=np.int64), np.array([1, 2]) * 10**9)
+    assert best.tolist() == [-1, -1]
+    assert np.isinf(dist).all()
+
+
+@pytest.mark.parametrize('threshold', [0, 2, 5, 100])
+def test_match_log_matches_scan(threshold):
+    rng = np.random.default_rng(threshold)
+    catalogs = {'Green': make_catalog(rng.integers(0, 60, 25), 'G'),
+                'White': make_catalog(rng.integers(0, 60, 10), 'W'),
+                'Third': make_catalog([])}
+    seconds = [int(s) for s in rng.integers(-20, 80, 60)] + [None, 30]
+    cameras = list(rng.choice(['PDP1', ' PDP2 ', 'PDP3', 'PDP9'], 60)) + ['PDP1', 'PDP9']
+    df = make_log(seconds, cameras)
+    count = match_log(df, catalogs, CAMERA_MAP, threshold)
+    expected = scan_match(df, catalogs, threshold)
+    assert matched_pairs(df) == expected
+    assert count == sum(1 for pair in expected if pair[1])
@@ -0,0 +1,59 @@
+"""Optimal one-to-one assignment against an exhaustive search."""
+import itertools
+
+import numpy as np
+import pytest
+
+from helpers import make_catalog, make_log
+from photo_pipeline import CAMERA_MAP, TaskProgress, assign_one_to_one, match_log, nearest_photos
+
+
+def brute_force_one_to_one(row_ns, photo_ns, threshold):
+    """(matches, total error) of the best assignment, by trying every one."""
+    tol = threshold * 1e9
+    best = (0, 0)
+    for choice in itertools.product(range(-1, len(photo_ns)), repeat=len(row_ns)):
+        used = [j for j in choice if j >= 0]
+        if len(used) != len(set(used)):
+            continue
+        errors = [abs(int(photo_ns[j]) - int(t)) for t, j in zip(row_ns, choice) if j >= 0]
+        if any(error > tol for error in errors):
+            continue
+        score = (len(errors), -sum(errors))
+        if score > best:
+            best = score
+    return best[0], -best[1]
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_assign_one_to_one_is_optimal(seed):
+    rng = np.random.default_rng(seed)
+    row_ns = rng.integers(0, 20, rng.integers(1, 6)) * 10**9
+    photo_ns = np.sort(rng.integers(0, 20, rng.integers(0, 6))) * 10**9
+    threshold = float(rng.choice([0, 1, 3, 10]))
+    assigned = assign_one_to_one(row_ns, photo_ns, threshold)
+    used = assigned[assigned >= 0]
+    assert len(used) == len(set(used.tolist()))
+    errors = np.abs(photo_ns[used] - row_ns[assigned >= 0])
+    assert (errors <= threshold * 1e9).all()
+    assert (len(used), int(errors.sum())) == brute_force_one_to_one(row_ns, photo_ns, threshold)
+
+
+def test_match_log_one_to_one_uses_each_photo_once():
+    catalogs = {'Green': make_catalog([0, 10])}
+    df = make_log([0, 1, 9, 11], ['PDP1'] * 4)
+    assert match_log(df, catalogs, CAMERA_MAP, 2, one_to_one=True) == 2
+    # Row 1 loses photo 0 to the exact match at 0; rows 9 and 11 tie for photo 10
+    assert df['Filename'].tolist()[:2] == ['IMG_0000.JPG', '']
+    assert sorted(df['Filename'].tolist()[2:]) == ['', 'IMG_0001.JPG']
+
+
+def test_one_to_one_progress_reaches_every_row():
+    class Recorder(TaskProgress):
+        def report(self, done, total, text=None):
+            self.last = (done, total)
+    
+    task = Recorder()
+    df = make_log([0, 1, 2, 50], ['PDP1'] * 4)
+    nearest_photos(df, {'Green': make_catalog([0])}, CAMERA_MAP, task, one_to_one=5)
+    assert task.last == (4, 4)
@@ -0,0 +1,40 @@
+"""Reverse mode: positions interpolated at photo times."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from photo_pipeline import CAMERA_MAP, PhotoCatalog, interpolate_photo_positions
+
+BASE = datetime(2024, 3, 12, 10, 0, 0)
+
+
+def catalog(seconds):
+    return PhotoCatalog.from_records('/photos', [(BASE + timedelta(seconds=s), '', f"IMG_{i}.JPG", 'DateTimeOriginal')
+                                                 for i, s in enumerate(seconds)])
+
+
+def test_gap_is_measured_between_fixes():
+    df = pd.DataFrame({
+        'Time': [BASE + timedelta(seconds=s) for s in (0, 10, 20, 30)],
+        'Camera': 'PDP1',
+        'Lat': [0.0, np.nan, np.nan, 3.0],
+        'Lon': [10.0, 11.0, np.nan, 13.0],
+        'Speed': [1.0, 2.0, 3.0, 4.0],
+    })
+    positions = interpolate_photo_positions(df, {'Green': catalog([15, 40])}, CAMERA_MAP, max_gap=20)
+    inside, after = positions.iloc[0], positions.iloc[1]
+    # Rows at 10 s and 20 s have no fix, so the photo at 15 s is bridged from 0 s to 30 s
+    assert inside['Gap_s'] == 30
+    assert inside['Position_Flag'] == 'gap'
+    assert inside['Lat'] == pytest.approx(1.5) and inside['Lon'] == pytest.approx(11.5)
+    assert inside['Speed'] == pytest.approx(2.5)
+    assert after['Position_Flag'] == 'outside' and np.isnan(after['Lat'])
+
+
+def test_every_timed_row_brackets_without_position_columns():
+    df = pd.DataFrame({'Time': [BASE, BASE + timedelta(seconds=10)], 'Camera': 'PDP1', 'Depth': [1.0, 3.0]})
+    positions = interpolate_photo_positions(df, {'Green': catalog([5])}, CAMERA_MAP)
+    assert positions['Gap_s'].tolist() == [10]
+    assert positions['Depth'].tolist() == [2.0]
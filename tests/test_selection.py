@@ -0,0 +1,106 @@
+"""PhotoSelection bulk operations and selection session files."""
+import json
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from helpers import BASE, make_catalog
+from photo_pipeline import PhotoSelection, load_selection_session, save_selection_session
+
+
+@pytest.fixture
+def selection():
+    # Photos i taken i*10 seconds after BASE, in sub0 (even i) or sub1 (odd i)
+    return PhotoSelection(make_catalog([i * 10 for i in range(10)]))
+
+
+def selected(selection):
+    return list(np.flatnonzero(selection.mask))
+
+
+def test_single_photos_and_invert(selection):
+    selection[2] = True
+    selection[5] = True
+    assert selection[2] and not selection[3] and selection.count() == 2
+    selection.invert()
+    assert selected(selection) == [0, 1, 3, 4, 6, 7, 8, 9]
+    selection.set_all(False)
+    selection.invert()
+    assert selection.count() == len(selection) == 10
+
+
+def test_time_range_is_inclusive(selection):
+    assert selection.set_time_range(BASE + timedelta(seconds=20), BASE + timedelta(seconds=50)) == 4
+    assert selected(selection) == [2, 3, 4, 5]
+    assert selection.set_time_range(BASE + timedelta(seconds=25), BASE + timedelta(seconds=35), False) == 1
+    assert selected(selection) == [2, 4, 5]
+    assert selection.set_time_range(BASE - timedelta(hours=1), BASE - timedelta(seconds=1)) == 0
+    assert selection.set_time_range(BASE + timedelta(seconds=50), BASE + timedelta(seconds=20)) == 0
+    assert selected(selection) == [2, 4, 5]
+
+
+def test_subfolder(selection):
+    assert selection.set_subfolder('sub1') == 5
+    assert selected(selection) == [1, 3, 5, 7, 9]
+    assert selection.set_subfolder('missing') == 0
+    selection.set_all()
+    assert selection.set_subfolder('sub0', False) == 5
+    assert selected(selection) == [1, 3, 5, 7, 9]
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('IMG_000[1-3].JPG', [1, 2, 3]),
+    ('IMG_0009.JPG', [9]),
+    ('sub0/*', [0, 2, 4, 6, 8]),
+    ('*/IMG_0004.JPG', [4]),
+    ('*.PNG', []),
+])
+def test_glob_matches_filename_or_relative_path(selection, pattern, expected):
+    assert selection.set_glob(pattern) == len(expected)
+    assert selected(selection) == expected
+
+
+@pytest.mark.parametrize('chosen, mode', [([1, 4], 'selected'), ([0, 1, 2, 3, 5, 6, 7, 8, 9], 'excluded')])
+def test_session_round_trip(tmp_path, selection, chosen, mode):
+    other = PhotoSelection(make_catalog([i * 10 for i in range(3)], prefix='DSC'))
+    other.set_all()
+    for i in chosen:
+        selection[i] = True
+    path = tmp_path / 'session.json'
+    save_selection_session(str(path), {'Green': selection, 'White': other}, {'Green': '/photos/green'})
+
+    session = json.loads(path.read_text())
+    assert session['cameras']['Green']['mode'] == mode
+    assert session['cameras']['Green']['directory'] == '/photos/green'
+    assert len(session['cameras']['Green']['photos']) == min(len(chosen), 10 - len(chosen))
+    assert session['cameras']['White'] == {'mode': 'excluded', 'photos': []}
+
+    restored = PhotoSelection(selection.catalog)
+    restored_other = PhotoSelection(other.catalog)
+    counts = load_selection_session(str(path), {'Green': restored, 'White': restored_other, 'Third': selection})
+    assert counts == {'Green': len(chosen), 'White': 3}
+    assert selected(restored) == chosen
+    assert restored_other.count() == 3
+
+
+def test_excluded_mode_selects_new_photos(tmp_path, selection):
+    selection.set_all()
+    selection[3] = False
+    path = tmp_path / 'session.json'
+    save_selection_session(str(path), {'Green': selection})
+    grown = PhotoSelection(make_catalog([i * 10 for i in range(12)]))
+    assert load_selection_session(str(path), {'Green': grown}) == {'Green': 11}
+    assert not grown[3]
+
+
+@pytest.mark.parametrize('version', [None, 0, 2, '1'])
+def test_unknown_version_is_rejected(tmp_path, selection, version):
+    path = tmp_path / 'session.json'
+    session = {'cameras': {'Green': {'mode': 'selected', 'photos': ['sub0/IMG_0000.JPG']}}}
+    if version is not None:
+        session['version'] = version
+    path.write_text(json.dumps(session))
+    with pytest.raises(ValueError, match='Unsupported selection file version'):
+        load_selection_session(str(path), {'Green': selection})
+    assert selection.count() == 0
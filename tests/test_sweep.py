@@ -0,0 +1,65 @@
+"""Threshold sweeps against one match_log() run per threshold."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import make_catalog, make_log
+from photo_pipeline import (
+    CAMERA_MAP, default_output_path, export_sweep, match_log, matched_rows, matches_at, nearest_photos,
+    threshold_sweep,
+)
+
+THRESHOLDS = [0, 0.5, 2, 5, 30]
+
+
+@pytest.fixture(params=[None, {'Green': 1.5, 'White': -0.75}], ids=['no offsets', 'offsets'])
+def session(request):
+    rng = np.random.default_rng(7)
+    cameras = rng.choice(list(CAMERA_MAP), 200).tolist()
+    seconds = np.round(rng.uniform(0, 600, 200), 1).tolist()
+    seconds[::37] = [None] * len(seconds[::37])
+    df = make_log(seconds, cameras)
+    catalogs = {color: make_catalog(np.round(rng.uniform(0, 600, 60), 1), prefix=color)
+                for color in ('Green', 'White')}
+    catalogs['Third'] = make_catalog([])
+    return df, catalogs, request.param
+
+
+def test_sweep_matches_single_runs(session):
+    df, catalogs, offsets = session
+    nearest = nearest_photos(df, catalogs, CAMERA_MAP, offsets=offsets)
+    sweep = threshold_sweep(nearest, THRESHOLDS)
+    assert list(sweep['Threshold_s']) == THRESHOLDS
+    for threshold, row in zip(THRESHOLDS, sweep.itertuples()):
+        single = df.copy()
+        count = match_log(single, catalogs, CAMERA_MAP, threshold, offsets=offsets)
+        assert (row.Matched, row.Unmatched) == (count, len(df) - count)
+        assert row.Match_Rate == pytest.approx(count / len(df))
+        pd.testing.assert_frame_equal(matches_at(df, nearest, threshold), matched_rows(single))
+    assert sweep['Matched'].is_monotonic_increasing
+    assert 0 < sweep['Matched'].iloc[2] < sweep['Matched'].iloc[-1] < len(df)
+
+
+def test_sweep_files_and_workbook(tmp_path, session):
+    df, catalogs, offsets = session
+    nearest = nearest_photos(df, catalogs, CAMERA_MAP, offsets=offsets)
+    folder = tmp_path / 'day_threshold_0s'
+    folder.mkdir()
+    xlsx_file = str(folder / 'log_threshold_0s.xlsx')
+
+    paths = export_sweep(df, nearest, THRESHOLDS, xlsx_file, fmt='csv')
+    expected = [default_output_path(xlsx_file, None, t, 'csv') for t in THRESHOLDS if len(matches_at(df, nearest, t))]
+    assert paths == expected and all(os.path.exists(p) for p in paths)
+
+    [path] = export_sweep(df, nearest, THRESHOLDS, xlsx_file, 'run', workbook=True)
+    assert path == str(folder / 'run_threshold_sweep.xlsx')
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == ['Summary'] + [f"threshold_{t}s" for t in THRESHOLDS]
+    pd.testing.assert_frame_equal(sheets['Summary'], threshold_sweep(nearest, THRESHOLDS), check_dtype=False)
+    for threshold in THRESHOLDS:
+        assert len(sheets[f"threshold_{threshold}s"]) == len(matches_at(df, nearest, threshold))
+
+    [path] = export_sweep(df, nearest, THRESHOLDS, xlsx_file, workbook=True)
+    assert path == str(folder / 'log_threshold_0s_threshold_sweep.xlsx')
@@ -0,0 +1,93 @@
+"""parse_time_column against the per-value parse_time_robust."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from photo_pipeline import gps_utc_time, parse_time_column, parse_time_robust
+
+NAIVE = [
+    '12/03/2024 10:00:05', '12/03/2024 10:00:05 PM', '12/03/2024 10:00', '12/03/2024 10:00 am',
+    '12/03/2024 10:00:05.250', '12/03/2024', '12/03/24 10:00:05', '12/03/24 10:00',
+    '2024-03-12 10:00:00', '2024-03-12T10:00:00', '2024-3-5 9:30', '12 March 2024 10:00',
+    45363.5, '45363.5', 45363, '  12/03/2024 10:00:05  ',
+    datetime(2024, 3, 12, 10, 0, 5), pd.Timestamp('2024-03-12 10:00:05'),
+    1710237600, '1710237600', -1e9, 'garbage', '', '31/02/2024 10:00', None, float('nan'),
+]
+
+AWARE = [
+    '2024-03-12T10:00:00Z', '2024-03-12 10:00:00+10:00', '2024-03-12T10:00:00.5-04:00',
+    '12/03/2024 10:00 +10:00',
+]
+
+
+def test_matches_per_value_parser():
+    parsed, errors = parse_time_column(pd.Series(NAIVE, dtype=object))
+    for i, value in enumerate(NAIVE):
+        expected, error = parse_time_robust(value)
+        if expected is None:
+            assert pd.isna(parsed[i]), value
+        else:
+            assert parsed[i] == pd.Timestamp(expected), value
+        assert errors[i] == (error or ''), value
+    assert parsed.attrs['time_zone'] is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-03-12 10:00:00', datetime(2024, 3, 12, 10)),
+    ('2024-03-05', datetime(2024, 3, 5)),
+    ('05/03/2024 10:00:00', datetime(2024, 3, 5, 10)),
+    ('05-03-2024 10:00', datetime(2024, 3, 5, 10)),
+])
+def test_iso_dates_are_not_day_first(value, expected):
+    parsed, errors = parse_time_column(pd.Series([value], dtype=object))
+    assert parsed[0] == expected and errors[0] == ''
+    assert parse_time_robust(value) == (pd.Timestamp(expected), None)
+
+
+@pytest.mark.parametrize('values', [
+    pd.Series([45363.5, 1710237600, 1e20]),
+    pd.Series([45363, 1710237600]),
+    pd.Series(['45363.5', '1710237600', '-1e9'], dtype=object),
+], ids=['float', 'int', 'str'])
+def test_numbers_outside_datetime_range_fail_per_row(values):
+    parsed, errors = parse_time_column(values)
+    first, *rest = values
+    assert parsed[0] == pd.Timestamp(parse_time_robust(first)[0])
+    assert errors[0] == ''
+    for i, value in enumerate(rest, 1):
+        assert pd.isna(parsed[i])
+        assert errors[i] == parse_time_robust(value)[1]
+        assert errors[i].startswith('Failed all parses')
+
+
+def test_time_zones_convert_to_first_zone():
+    values = pd.Series(['12/03/2024 09:00'] + AWARE, dtype=object)
+    parsed, errors = parse_time_column(values)
+    zone = parsed.attrs['time_zone']
+    assert zone.utcoffset(None) == pd.Timedelta(0)
+    assert (errors == '').all()
+    assert parsed.dtype == 'datetime64[ns]'
+    assert parsed[0] == datetime(2024, 3, 12, 9)
+    for i, value in enumerate(AWARE, 1):
+        expected, _ = parse_time_robust(value)
+        assert parsed[i].tz_localize(zone) == expected, value
+    assert list(parsed[1:]) == [pd.Timestamp('2024-03-12 10:00'), pd.Timestamp('2024-03-12 00:00'),
+                                pd.Timestamp('2024-03-12 14:00:00.5'), pd.Timestamp('2024-03-12 00:00')]
+
+
+def test_time_zone_kept_for_gps_time_stamp():
+    parsed, _ = parse_time_column(pd.Series(['2024-03-12 10:00:03+10:00', '2024-03-12 11:00:03+10:00']))
+    zone = parsed.attrs['time_zone']
+    assert parsed[0] == datetime(2024, 3, 12, 10, 0, 3)
+    assert gps_utc_time(parsed[0], time_zone=zone) == datetime(2024, 3, 12, 0, 0, 3)
+    assert gps_utc_time(parsed[1], 0, zone) == datetime(2024, 3, 12, 11, 0, 3)
+    assert gps_utc_time(parsed[0]) is None
+
+
+def test_time_zone_aware_column():
+    values = pd.Series(pd.to_datetime(['2024-03-12 10:00:03', None]).tz_localize('Australia/Sydney'))
+    parsed, errors = parse_time_column(values)
+    assert parsed[0] == datetime(2024, 3, 12, 10, 0, 3) and pd.isna(parsed[1])
+    assert list(errors) == ['', 'Empty/NaN value']
+    assert gps_utc_time(parsed[0], time_zone=parsed.attrs['time_zone']) == datetime(2024, 3, 11, 23, 0, 3)
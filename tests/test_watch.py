@@ -0,0 +1,41 @@
+"""Watch mode: incremental re-matching as new photos arrive."""
+import numpy as np
+import pytest
+
+from helpers import make_catalog, make_log, matched_pairs
+from photo_pipeline import CAMERA_MAP, IncrementalMatcher, match_log
+
+
+@pytest.mark.parametrize('one_to_one', [False, True])
+@pytest.mark.parametrize('seed', range(10))
+def test_incremental_matcher_equals_full_rematch(seed, one_to_one):
+    rng = np.random.default_rng(seed)
+    start = rng.integers(0, 500, 30)
+    added = rng.integers(-50, 550, 8)  # New photos before, between and after the old ones
+    df = make_log([int(s) for s in rng.integers(0, 500, 120)], list(rng.choice(['PDP1', 'PDP2'], 120)))
+    catalogs = {'Green': make_catalog(start, 'G'), 'White': make_catalog(rng.integers(0, 500, 10), 'W')}
+    offsets = {'Green': 2.0, 'White': 0.0}
+    match_log(df, catalogs, CAMERA_MAP, 4, offsets=offsets, one_to_one=one_to_one)
+    before = df.copy()
+    
+    matcher = IncrementalMatcher(df, catalogs, CAMERA_MAP, 4, offsets, one_to_one)
+    merged, positions, changed = matcher.add_photos('Green', make_catalog(added, 'N'))
+    assert len(merged) == len(start) + len(added)
+    assert sorted(merged.filenames[positions]) == sorted(f"N_{i:04d}.JPG" for i in range(len(added)))
+    
+    full = before.copy()
+    match_log(full, dict(catalogs, Green=merged), CAMERA_MAP, 4, offsets=offsets, one_to_one=one_to_one)
+    assert matched_pairs(df) == matched_pairs(full)
+    np.testing.assert_allclose(df['Match_Distance_s'], full['Match_Distance_s'])
+    differs = (before['Filename'] != full['Filename']) | (before['Subfolder'] != full['Subfolder'])
+    assert sorted(changed) == sorted(full.index[differs])
+
+
+def test_incremental_matcher_into_empty_catalog():
+    df = make_log([0, 10, 20], ['PDP1'] * 3)
+    catalogs = {'Green': make_catalog([])}
+    match_log(df, catalogs, CAMERA_MAP, 1)
+    matcher = IncrementalMatcher(df, catalogs, CAMERA_MAP, 1)
+    _, _, changed = matcher.add_photos('Green', make_catalog([10]))
+    assert changed.tolist() == [1]
+    assert df['Filename'].tolist() == ['', 'IMG_0000.JPG', '']